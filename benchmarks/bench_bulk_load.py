@@ -0,0 +1,50 @@
+""" Benchmark bulk loading of panels against the local stand-in server
+
+Usage:
+    python -m benchmarks.bench_bulk_load
+    python -m benchmarks.bench_bulk_load --processes 4  # Parse the panels in 4 processes
+"""
+
+import argparse
+import time
+
+from panelapp import api, queries
+
+from .mock_server import MockPanelapp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panels", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--processes", type=int, help="Processes parsing the panels")
+    args = parser.parse_args()
+
+    with MockPanelapp(nb_panels=args.panels, latency=args.latency) as server:
+        api.BASE_URL = server.url
+        baseline = None
+
+        print("workers\tseconds\tpanels/s\tspeedup")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            panels = queries.get_all_panels(
+                max_workers=workers, processes=args.processes
+            )
+            elapsed = time.perf_counter() - start
+
+            assert len(panels) == args.panels
+
+            if baseline is None:
+                baseline = elapsed
+
+            print("{}\t{:.2f}\t{:.1f}\t{:.1f}x".format(
+                workers, elapsed, len(panels) / elapsed, baseline / elapsed
+            ))
+
+
+if __name__ == "__main__":
+    main()
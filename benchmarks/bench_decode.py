@@ -0,0 +1,89 @@
+""" Benchmark parsing of a superpanel payload with each decoder
+
+Usage:
+    python -m benchmarks.bench_decode
+    python -m benchmarks.bench_decode --payload superpanel.json
+"""
+
+import argparse
+import json
+import timeit
+import tracemalloc
+
+from panelapp import decode
+
+from .mock_server import make_panel
+
+
+def get_payload(path: str = None, nb_genes: int = 3000):
+    """ Return body of a superpanel response, recorded or synthetic
+
+    Args:
+        path (str, optional): File with a response recorded from the API. Defaults to None.
+        nb_genes (int, optional): Number of genes of the synthetic superpanel. Defaults to 3000.
+
+    Returns:
+        bytes: Body of the response
+    """
+
+    if path:
+        with open(path, "rb") as f:
+            return f.read()
+
+    subpanels = [make_panel(panel_id, nb_genes=0) for panel_id in range(1, 21)]
+    superpanel = make_panel(
+        1000, nb_genes=nb_genes, nb_strs=50, nb_regions=50, subpanels=subpanels
+    )
+
+    return json.dumps(superpanel).encode("utf-8")
+
+
+def get_peak(function, content: bytes):
+    """ Return peak memory allocated while parsing
+
+    Args:
+        function (function): Function parsing bytes
+        content (bytes): Body of the response
+
+    Returns:
+        int: Peak memory in bytes
+    """
+
+    tracemalloc.start()
+    function(content)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payload", help="Response recorded from the API")
+    parser.add_argument("--genes", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    content = get_payload(args.payload, args.genes)
+    decoders = {
+        "json (str)": lambda content: json.loads(content.decode("utf-8")),
+    }
+    decoders.update(decode.DECODERS)
+    # with msgspec the unused fields are skipped, otherwise they are dropped
+    decoders["typed panel"] = decode.decode_panel
+
+    print("payload\t{:.1f} MiB".format(len(content) / 1024 ** 2))
+    print("decoder\tms\tpeak MiB")
+
+    for name, function in decoders.items():
+        seconds = min(timeit.repeat(
+            lambda: function(content), number=1, repeat=args.repeat
+        ))
+
+        print("{}\t{:.1f}\t{:.1f}".format(
+            name, seconds * 1000, get_peak(function, content) / 1024 ** 2
+        ))
+
+
+if __name__ == "__main__":
+    main()
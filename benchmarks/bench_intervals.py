@@ -0,0 +1,109 @@
+""" Benchmark overlap queries of millions of positions against panel regions
+
+Usage:
+    python -m benchmarks.bench_intervals --positions 5000000
+    python -m benchmarks.bench_intervals --long-regions 1  # Add a region covering each chromosome
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from panelapp.intervals import IntervalIndex
+from panelapp.Panelapp import Panel
+
+from .mock_server import make_panel
+
+
+def scan(panels: list, chromosome: str, position: int):
+    """ Return the entities containing the position by going through all of them
+
+    Args:
+        panels (list): Panel objects
+        chromosome (str): Chromosome
+        position (int): Position
+
+    Returns:
+        list: List of (panel_id, entity_name, confidence_level)
+    """
+
+    return [
+        (panel.get_id(), entity.entity_name, entity.confidence_level)
+        for panel in panels
+        for entity in panel.get_strs() + panel.get_cnvs()
+        if entity.chromosome == chromosome and
+        entity.grch38_start <= position <= entity.grch38_end
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panels", type=int, default=300)
+    parser.add_argument("--entities", type=int, default=20)
+    parser.add_argument("--positions", type=int, default=5000000)
+    parser.add_argument("--scanned", type=int, default=1000)
+    parser.add_argument("--long-regions", type=int, default=0, help="Regions covering the whole chromosome, added to each chromosome")
+    args = parser.parse_args()
+
+    panels = [
+        Panel(panel_id, data=make_panel(
+            panel_id, nb_genes=0, nb_strs=args.entities,
+            nb_regions=args.entities
+        ))
+        for panel_id in range(1, args.panels + 1)
+    ]
+
+    for i in range(args.long_regions):
+        panel = Panel(args.panels + i + 1, data=make_panel(
+            args.panels + i + 1, nb_genes=0, nb_strs=0, nb_regions=22
+        ))
+
+        for chromosome, region in enumerate(panel.get_cnvs(), 1):
+            region.chromosome = str(chromosome)
+            region.grch38_start, region.grch38_end = 1, 250000000
+
+        panels.append(panel)
+
+    start = time.perf_counter()
+    index = IntervalIndex.build(panels)
+    index.get_chromosomes()
+    print("index of {} entities built in {:.3f}s".format(
+        len(index), time.perf_counter() - start
+    ))
+
+    rng = np.random.default_rng(0)
+    chromosomes = rng.choice([str(i) for i in range(1, 23)], args.positions)
+    positions = rng.integers(1, 60000000, args.positions)
+
+    start = time.perf_counter()
+    query_ids, entity_ids = index.query_points(chromosomes, positions)
+    elapsed = time.perf_counter() - start
+    print("{} positions, {} overlaps in {:.3f}s ({:.1f}M positions/s)".format(
+        args.positions, len(query_ids), elapsed,
+        args.positions / elapsed / 1e6
+    ))
+
+    # positions of a VCF come by chromosome
+    start = time.perf_counter()
+
+    for chromosome in np.unique(chromosomes):
+        index.query_points(chromosome, positions[chromosomes == chromosome])
+
+    elapsed = time.perf_counter() - start
+    print("same by chromosome in {:.3f}s".format(elapsed))
+
+    start = time.perf_counter()
+
+    for position_id in range(args.scanned):
+        scan(panels, chromosomes[position_id], positions[position_id])
+
+    elapsed = time.perf_counter() - start
+    print("linear scan: {:.1f} positions/s, {:.0f}s estimated for {} positions".format(
+        args.scanned / elapsed, elapsed / args.scanned * args.positions,
+        args.positions
+    ))
+
+
+if __name__ == "__main__":
+    main()
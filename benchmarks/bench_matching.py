@@ -0,0 +1,86 @@
+""" Benchmark ranking of panels for many gene lists
+
+Usage:
+    python -m benchmarks.bench_matching --queries 10000
+"""
+
+import argparse
+import random
+import time
+
+from panelapp.matching import GeneMatcher
+from panelapp.Panelapp import Panel
+
+from .mock_server import make_panel
+
+
+def rank(panels: list, genes: list, k: int):
+    """ Return the panels with the best coverage by going through all of them
+
+    Args:
+        panels (list): Panel objects
+        genes (list): Hgnc ids
+        k (int): Number of panels
+
+    Returns:
+        list: List of (panel_id, coverage)
+    """
+
+    genes = set(genes)
+    scores = [
+        (panel.get_id(), len(genes & panel.get_hgnc_id_set(3)) / len(genes))
+        for panel in panels
+    ]
+
+    return sorted(
+        (score for score in scores if score[1]), key=lambda score: -score[1]
+    )[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panels", type=int, default=400)
+    parser.add_argument("--genes", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--query-genes", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--scanned", type=int, default=500)
+    args = parser.parse_args()
+
+    panels = [
+        Panel(panel_id, data=make_panel(panel_id, nb_genes=args.genes))
+        for panel_id in range(1, args.panels + 1)
+    ]
+
+    start = time.perf_counter()
+    matcher = GeneMatcher.build(panels)
+    matcher.get_matrix((3,))
+    print("matrix of {} panels x {} genes built in {:.3f}s".format(
+        len(matcher), len(matcher.hgnc_ids), time.perf_counter() - start
+    ))
+
+    rng = random.Random(0)
+    queries = [
+        rng.sample(matcher.hgnc_ids, args.query_genes)
+        for i in range(args.queries)
+    ]
+
+    for method in ("coverage", "jaccard", "weighted"):
+        start = time.perf_counter()
+        matcher.top_k(queries, k=args.k, method=method)
+        elapsed = time.perf_counter() - start
+        print("{}: {} queries in {:.3f}s ({:.0f} queries/s)".format(
+            method, args.queries, elapsed, args.queries / elapsed
+        ))
+
+    start = time.perf_counter()
+
+    for genes in queries[:args.scanned]:
+        rank(panels, genes, args.k)
+
+    elapsed = time.perf_counter() - start
+    print("set intersections: {:.0f} queries/s".format(args.scanned / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+""" Benchmark memory held by all the signedoff panels once loaded
+
+Usage:
+    python -m benchmarks.bench_memory
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from panelapp import api, queries
+from panelapp.Panelapp import Panel
+
+from .mock_server import MockPanelapp
+
+
+def measure(load):
+    """ Return memory allocated by the objects kept by the load function
+
+    Args:
+        load (function): Function returning the objects to measure
+
+    Returns:
+        tuple: Objects returned and memory in bytes
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    objects = load()
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return objects, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panels", type=int, default=300)
+    parser.add_argument("--genes", type=int, default=300)
+    args = parser.parse_args()
+
+    with MockPanelapp(nb_panels=args.panels, nb_genes=args.genes) as server:
+        api.BASE_URL = server.url
+        ids = list(server.panels)
+
+        raw, raw_size = measure(lambda: [
+            api.get_panelapp_response("panels/{}".format(panel_id))
+            for panel_id in ids
+        ])
+        del raw
+
+        print("raw API data\t{:.1f} MiB".format(raw_size / 1024 ** 2))
+
+        for keep_data in (True, False):
+            Panel.keep_data = keep_data
+            panels, size = measure(
+                lambda: queries.get_all_signedoff_panels(max_workers=8)
+            )
+            assert len(panels) == args.panels
+            del panels
+
+            print("panels, keep_data={}\t{:.1f} MiB".format(
+                keep_data, size / 1024 ** 2
+            ))
+
+        Panel.keep_data = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+""" Local stand-in for the Panelapp API serving synthetic or recorded panels
+
+The server mimics the endpoints used by the package (panel listings with
+pagination, signedoff listings, panel bodies, superpanels and panel
+versions) so that benchmarks can run repeatably without hitting the real
+API. Latency and transient errors can be injected to measure retries.
+
+Panels recorded from the real API with record_panels are replayed with:
+
+    MockPanelapp(panels=load_recording("recording.json.gz"))
+"""
+
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+PAGE_SIZE = 100
+
+
+class Server(ThreadingHTTPServer):
+    # the default backlog of 5 drops connections under concurrent load
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_gene(index: int, confidence_level: str, subpanel: dict = None):
+    """ Return gene data shaped like the Panelapp API output
+
+    Args:
+        index (int): Number used to build the gene symbol and ids
+        confidence_level (str): Confidence level of the gene
+        subpanel (dict, optional): Panel data for genes of superpanels. Defaults to None.
+
+    Returns:
+        dict: Gene data
+    """
+
+    symbol = "GENE{}".format(index)
+    gene = {
+        "gene_data": {
+            "hgnc_symbol": symbol,
+            "hgnc_id": "HGNC:{}".format(index),
+            "gene_symbol": symbol,
+            "gene_name": "synthetic gene {}".format(index),
+            "omim_gene": [str(100000 + index)],
+            "ensembl_genes": {
+                "GRch37": {
+                    "82": {
+                        "location": "1:{}-{}".format(index * 1000, index * 1000 + 500),
+                        "ensembl_id": "ENSG{:011d}".format(index)
+                    }
+                },
+                "GRch38": {
+                    "90": {
+                        "location": "1:{}-{}".format(index * 1000, index * 1000 + 500),
+                        "ensembl_id": "ENSG{:011d}".format(index)
+                    }
+                }
+            },
+        },
+        "entity_type": "gene",
+        "entity_name": symbol,
+        "confidence_level": confidence_level,
+        "penetrance": "Complete",
+        "mode_of_pathogenicity": "",
+        "publications": ["{}".format(20000000 + index)],
+        "evidence": ["Expert Review Green", "Literature"],
+        "phenotypes": ["Synthetic disorder {}".format(index)],
+        "mode_of_inheritance": "MONOALLELIC, autosomal or pseudoautosomal",
+        "tags": [],
+        "transcript": None,
+    }
+
+    if subpanel:
+        gene["panel"] = subpanel
+
+    return gene
+
+
+def make_str(index: int, confidence_level: str, subpanel: dict = None):
+    """ Return STR data shaped like the Panelapp API output
+
+    Args:
+        index (int): Number used to build the STR name and coordinates
+        confidence_level (str): Confidence level of the STR
+        subpanel (dict, optional): Panel data for STRs of superpanels. Defaults to None.
+
+    Returns:
+        dict: STR data
+    """
+
+    start = 1000000 + index * 10000
+    str_entity = {
+        "gene_data": {
+            "hgnc_symbol": "GENE{}".format(index),
+            "hgnc_id": "HGNC:{}".format(index),
+        },
+        "entity_type": "str",
+        "entity_name": "GENE{}_CAG".format(index),
+        "confidence_level": confidence_level,
+        "repeated_sequence": "CAG",
+        "normal_repeats": 35,
+        "pathogenic_repeats": 40,
+        "chromosome": str(index % 22 + 1),
+        "grch37_coordinates": [start, start + 90],
+        "grch38_coordinates": [start + 50, start + 140],
+        "mode_of_inheritance": "MONOALLELIC, autosomal or pseudoautosomal",
+        "phenotypes": ["Synthetic repeat disorder {}".format(index)],
+        "evidence": ["Expert Review Green"],
+    }
+
+    if subpanel:
+        str_entity["panel"] = subpanel
+
+    return str_entity
+
+
+def make_region(index: int, confidence_level: str, subpanel: dict = None):
+    """ Return region data shaped like the Panelapp API output
+
+    Args:
+        index (int): Number used to build the region name and coordinates
+        confidence_level (str): Confidence level of the region
+        subpanel (dict, optional): Panel data for regions of superpanels. Defaults to None.
+
+    Returns:
+        dict: Region data
+    """
+
+    start = 5000000 + index * 100000
+    region = {
+        "entity_type": "region",
+        "entity_name": "ISCA-{}-Loss".format(index),
+        "verbose_name": "Synthetic region {}".format(index),
+        "confidence_level": confidence_level,
+        "chromosome": str(index % 22 + 1),
+        "grch37_coordinates": [start, start + 50000],
+        "grch38_coordinates": [start + 1000, start + 51000],
+        "type_of_variants": "cnv_loss",
+        "haploinsufficiency_score": "3",
+        "triplosensitivity_score": "",
+        "required_overlap_percentage": 60,
+        "phenotypes": ["Synthetic deletion syndrome {}".format(index)],
+        "evidence": ["Expert Review Green"],
+    }
+
+    if subpanel:
+        region["panel"] = subpanel
+
+    return region
+
+
+def make_panel(
+    panel_id: int, version: str = "1.0", nb_genes: int = 50,
+    nb_strs: int = 2, nb_regions: int = 2, subpanels: list = None
+):
+    """ Return panel data shaped like the Panelapp API output
+
+    Args:
+        panel_id (int): Panel id
+        version (str, optional): Version of the panel. Defaults to "1.0".
+        nb_genes (int, optional): Number of genes. Defaults to 50.
+        nb_strs (int, optional): Number of STRs. Defaults to 2.
+        nb_regions (int, optional): Number of regions. Defaults to 2.
+        subpanels (list, optional): Panel data of the subpanels, makes a superpanel. Defaults to None.
+
+    Returns:
+        dict: Panel data
+    """
+
+    rng = random.Random("{}-{}".format(panel_id, version))
+    levels = ["3", "3", "3", "2", "1", "0"]
+    genes, strs, regions = [], [], []
+
+    for i in range(nb_genes):
+        subpanel = subpanels[i % len(subpanels)] if subpanels else None
+        genes.append(
+            make_gene(rng.randint(1, 40000), rng.choice(levels), subpanel)
+        )
+
+    for i in range(nb_strs):
+        subpanel = subpanels[i % len(subpanels)] if subpanels else None
+        strs.append(make_str(rng.randint(1, 500), rng.choice(levels), subpanel))
+
+    for i in range(nb_regions):
+        subpanel = subpanels[i % len(subpanels)] if subpanels else None
+        regions.append(
+            make_region(rng.randint(1, 500), rng.choice(levels), subpanel)
+        )
+
+    return {
+        "id": panel_id,
+        "hash_id": "{:024x}".format(panel_id),
+        "name": "Synthetic panel {}".format(panel_id),
+        "disease_group": "Synthetic disorders",
+        "disease_sub_group": "",
+        "status": "public",
+        "version": version,
+        "version_created": "2023-01-01T00:00:00.000000Z",
+        "relevant_disorders": ["R{}".format(panel_id)],
+        "stats": {
+            "number_of_genes": nb_genes,
+            "number_of_strs": nb_strs,
+            "number_of_regions": nb_regions,
+        },
+        "types": [],
+        "genes": genes,
+        "strs": strs,
+        "regions": regions,
+        "signed_off": "2023-01-01",
+    }
+
+
+def make_version(panel: dict, version: str):
+    """ Return an other version of the panel with some genes changed
+
+    Args:
+        panel (dict): Panel data
+        version (str): Version to create
+
+    Returns:
+        dict: Panel data for the version
+    """
+
+    rng = random.Random("{}-{}".format(panel["id"], version))
+    genes = []
+
+    for gene in panel["genes"]:
+        draw = rng.random()
+
+        if draw < 0.1:
+            continue
+        elif draw < 0.2:
+            gene = dict(gene, confidence_level=rng.choice(["0", "1", "2", "3"]))
+
+        genes.append(gene)
+
+    return dict(panel, version=version, genes=genes)
+
+
+def listing_entry(panel: dict):
+    """ Return the data of a panel as shown in the panel listings
+
+    Args:
+        panel (dict): Panel data
+
+    Returns:
+        dict: Panel data without the entities
+    """
+
+    return {
+        key: value
+        for key, value in panel.items()
+        if key not in ("genes", "strs", "regions")
+    }
+
+
+def make_superpanel(panel_id: int, subpanels: list, nb_genes: int = 50):
+    """ Return superpanel data with the entities spread over the subpanels
+
+    Args:
+        panel_id (int): Panel id of the superpanel
+        subpanels (list): Panel data of the subpanels
+        nb_genes (int, optional): Number of genes of the superpanel. Defaults to 50.
+
+    Returns:
+        dict: Panel data
+    """
+
+    return make_panel(
+        panel_id, nb_genes=nb_genes, nb_strs=len(subpanels),
+        nb_regions=len(subpanels),
+        subpanels=[listing_entry(subpanel) for subpanel in subpanels]
+    )
+
+
+def record_panels(path: str, panel_ids: list):
+    """ Fetch panels from the real API and save them for load_recording
+
+    Args:
+        path (str): Path of the gzipped JSON file to write
+        panel_ids (list): Ids of the panels to record
+    """
+
+    from panelapp.api import get_panelapp_response
+
+    panels = {
+        str(panel_id): get_panelapp_response(
+            "panels/{}".format(panel_id), raise_errors=True
+        )
+        for panel_id in panel_ids
+    }
+
+    with gzip.open(path, "wt") as f:
+        json.dump(panels, f)
+
+
+def load_recording(path: str):
+    """ Return panels saved by record_panels
+
+    Args:
+        path (str): Path of the gzipped JSON file
+
+    Returns:
+        dict: Dict {panel_id: panel data}
+    """
+
+    with gzip.open(path, "rt") as f:
+        return json.load(f)
+
+
+class MockPanelapp():
+    def __init__(
+        self, nb_panels: int = 50, nb_genes: int = 50, latency: float = 0.0,
+        nb_superpanels: int = 0, error_rate: float = 0.0,
+        error_status: int = 503, panels: dict = None,
+        cache_responses: bool = False
+    ):
+        """ Initialise the stand-in server with synthetic panels
+
+        Args:
+            nb_panels (int, optional): Number of panels to serve. Defaults to 50.
+            nb_genes (int, optional): Number of genes per panel. Defaults to 50.
+            latency (float, optional): Seconds to wait before answering each request. Defaults to 0.0.
+            nb_superpanels (int, optional): Number of superpanels made of 10 of the panels, added after the panels. Defaults to 0.
+            error_rate (float, optional): Fraction of the requests answered with error_status. Defaults to 0.0.
+            error_status (int, optional): Status of the injected errors. Defaults to 503.
+            panels (dict, optional): Dict {panel_id: panel data} to serve instead of synthetic panels, i.e. from load_recording. Defaults to None.
+            cache_responses (bool, optional): Serialise each response once so that the server takes less time from the client, the panels can't be changed afterwards. Defaults to False.
+        """
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.cache_responses = cache_responses
+        self.random = random.Random(0)
+
+        if panels is not None:
+            self.panels = {str(panel_id): panel for panel_id, panel in panels.items()}
+        else:
+            self.panels = {
+                str(panel_id): make_panel(panel_id, nb_genes=nb_genes)
+                for panel_id in range(1, nb_panels + 1)
+            }
+
+        subpanels = list(self.panels.values())[:10]
+
+        for index in range(nb_superpanels):
+            panel_id = nb_panels + index + 1
+            self.panels[str(panel_id)] = make_superpanel(
+                panel_id, subpanels, nb_genes * len(subpanels)
+            )
+
+        # older versions listed in the activities of every panel
+        self.history = ["0.1", "0.2", "0.10"]
+        self.nb_requests = 0
+        # {path: (status, content)} if cache_responses
+        self.responses = {}
+        self.lock = threading.Lock()
+        self.server = Server(("127.0.0.1", 0), self.handler())
+        self.url = "http://127.0.0.1:{}/api/v1/".format(
+            self.server.server_address[1]
+        )
+
+    def handler(self):
+        """ Return request handler class bound to this server
+
+        Returns:
+            class: BaseHTTPRequestHandler subclass
+        """
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with mock.lock:
+                    mock.nb_requests += 1
+                    failed = mock.random.random() < mock.error_rate
+
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                if failed:
+                    status, content = mock.error_status, b'{"detail": "Injected error"}'
+                else:
+                    status, content = mock.get_response(self.path)
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def get_response(self, path: str):
+        """ Return status and serialised body for the requested path
+
+        Args:
+            path (str): Path of the request
+
+        Returns:
+            tuple: HTTP status and JSON bytes
+        """
+
+        response = self.responses.get(path)
+
+        if response is None:
+            status, body = self.route(path)
+            response = (status, json.dumps(body).encode("utf-8"))
+
+            if self.cache_responses:
+                self.responses[path] = response
+
+        return response
+
+    def route(self, path: str):
+        """ Return status and body for the requested path
+
+        Args:
+            path (str): Path of the request
+
+        Returns:
+            tuple: HTTP status and JSON body
+        """
+
+        parsed = urlparse(path)
+        params = {key: val[0] for key, val in parse_qs(parsed.query).items()}
+        parts = [
+            part for part in parsed.path.split("/")[3:] if part
+        ]
+
+        if parts == ["panels"] or parts == ["panels", "signedoff"]:
+            panels = [
+                listing_entry(panel)
+                for panel in self.panels.values()
+                if parts == ["panels"] or panel.get("signed_off")
+            ]
+
+            if "panel_id" in params:
+                panels = [
+                    panel for panel in panels
+                    if str(panel["id"]) == params["panel_id"]
+                ]
+
+            return 200, self.paginate(
+                panels, "/".join(parts), int(params.get("page", 1))
+            )
+
+        if len(parts) == 2 and parts[0] == "panels":
+            panel = self.panels.get(parts[1])
+
+            if panel is None:
+                return 404, {"detail": "Not found."}
+
+            if "version" in params and params["version"] != panel["version"]:
+                panel = make_version(panel, params["version"])
+
+            return 200, panel
+
+        if len(parts) == 3 and parts[0] == "panels" and parts[2] == "activities":
+            panel = self.panels.get(parts[1])
+
+            if panel is None:
+                return 404, {"detail": "Not found."}
+
+            return 200, [
+                {
+                    "panel_id": panel["id"],
+                    "panel_name": panel["name"],
+                    "panel_version": version,
+                    "text": "Panel promoted to version {}".format(version),
+                }
+                for version in reversed(self.history + [panel["version"]])
+            ]
+
+        return 404, {"detail": "Not found."}
+
+    def paginate(self, results: list, path: str, page: int):
+        """ Return one page of results with the url to the next page
+
+        Args:
+            results (list): All the results
+            path (str): Path of the listing endpoint
+            page (int): Page number starting at 1
+
+        Returns:
+            dict: Page data
+        """
+
+        start = (page - 1) * PAGE_SIZE
+        end = start + PAGE_SIZE
+        next_url = None
+
+        if end < len(results):
+            next_url = "{}{}?page={}".format(self.url, path, page + 1)
+
+        return {
+            "count": len(results),
+            "next": next_url,
+            "previous": None,
+            "results": results[start:end],
+        }
+
+    def __enter__(self):
+        thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
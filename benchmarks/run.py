@@ -0,0 +1,279 @@
+""" Benchmark suite against the local stand-in of the Panelapp API
+
+Usage:
+    python -m benchmarks.run                        # Run and print the results
+    python -m benchmarks.run --save                 # Store the results as baselines
+    python -m benchmarks.run --check                # Exit with 1 if a benchmark regressed
+    python -m benchmarks.run --recording panels.json.gz  # Replay panels recorded with benchmarks.mock_server.record_panels
+"""
+
+import argparse
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from panelapp import api, queries
+from panelapp.cache import PanelCache
+from panelapp.Panelapp import Panel, set_panel_cache
+
+from .mock_server import MockPanelapp, load_recording
+
+
+BASELINES = Path(__file__).parent / "baselines.json"
+# a benchmark regresses if it is this much slower or bigger than its baseline,
+# timings of shared machines easily vary by half
+TOLERANCE = 1.0
+# differences below this are noise whatever the ratio
+MIN_DIFFERENCE_MS = 0.5
+MIN_DIFFERENCE_MIB = 0.5
+
+
+class Benchmark():
+    def __init__(self, name: str, function, number: int, base_url: str):
+        """ Initialise benchmark of a function
+
+        Args:
+            name (str): Name of the benchmark
+            function (function): Function to time, called without arguments
+            number (int): Number of timed calls
+            base_url (str): URL of the stand-in server used by the function
+        """
+
+        self.name = name
+        self.function = function
+        self.number = number
+        self.base_url = base_url
+
+    def run(self):
+        """ Time the calls to the function and measure its peak memory
+
+        Returns:
+            dict: Dict with ops_per_s, p50_ms, p95_ms, p99_ms and peak_mib
+        """
+
+        api.BASE_URL = self.base_url
+        # warm up connections and caches of the interpreter
+        self.function()
+
+        timings = []
+
+        for i in range(self.number):
+            start = time.perf_counter()
+            self.function()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        self.function()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "ops_per_s": round(len(timings) / sum(timings), 2),
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+            "p99_ms": round(percentile(timings, 99) * 1000, 3),
+            "peak_mib": round(peak / 1024 ** 2, 3),
+        }
+
+
+def percentile(values: list, percent: float):
+    """ Return percentile of the values, by nearest rank
+
+    Args:
+        values (list): Values
+        percent (float): Percentile between 0 and 100
+
+    Returns:
+        float: Value at the percentile
+    """
+
+    values = sorted(values)
+    rank = max(0, int(round(percent / 100 * len(values))) - 1)
+
+    return values[min(rank, len(values) - 1)]
+
+
+def get_benchmarks(server: MockPanelapp, error_server: MockPanelapp, tmp: str):
+    """ Return the benchmarks of the suite
+
+    Args:
+        server (MockPanelapp): Server to use
+        error_server (MockPanelapp): Server injecting errors
+        tmp (str): Folder where panels are written
+
+    Returns:
+        list: List of Benchmark
+    """
+
+    api.BASE_URL = server.url
+    panel_ids = list(server.panels)
+    superpanel_id = max(
+        panel_ids, key=lambda panel_id: len(server.panels[panel_id]["genes"])
+    )
+    data = api.get_panelapp_response("panels/{}".format(panel_ids[0]))
+    superpanel_data = api.get_panelapp_response(
+        "panels/{}".format(superpanel_id)
+    )
+    panel = Panel(panel_ids[0], data=data)
+    cache = PanelCache()
+    hgnc_ids = panel.get_hgnc_ids(0, 1, 2, 3)
+
+    def use_accessors():
+        panel.get_genes(3, 2)
+        panel.get_gene_symbols()
+        panel.get_hgnc_ids(3, 2, 1)
+        panel.get_ensembl_ids("GRCh38")
+        panel.get_hgnc_id_set(3, 2)
+        panel.get_strs()
+        panel.get_cnvs()
+
+        for hgnc_id in hgnc_ids:
+            panel.contains_hgnc(hgnc_id)
+
+    def paginate():
+        api.get_full_results_from_API(api.get_panelapp_response("panels"))
+
+    def compare_versions_cached():
+        set_panel_cache(cache)
+        queries.compare_versions(panel, "0.2")
+        set_panel_cache(None)
+
+    return [
+        Benchmark(
+            "panel_construction",
+            lambda: Panel(panel_ids[0], data=data), 200, server.url
+        ),
+        Benchmark(
+            "superpanel_construction",
+            lambda: Panel(superpanel_id, data=superpanel_data), 50, server.url
+        ),
+        Benchmark("accessors", use_accessors, 500, server.url),
+        Benchmark(
+            "compare_versions",
+            lambda: queries.compare_versions(panel, "0.2"), 50, server.url
+        ),
+        Benchmark(
+            "compare_versions_cached", compare_versions_cached, 50, server.url
+        ),
+        Benchmark("pagination", paginate, 20, server.url),
+        Benchmark(
+            "get_all_panels",
+            lambda: queries.get_all_panels(max_workers=8), 3, server.url
+        ),
+        Benchmark(
+            "get_all_panels_with_errors",
+            lambda: queries.get_all_panels(max_workers=8), 3, error_server.url
+        ),
+        Benchmark("panel_write", lambda: panel.write(tmp), 100, server.url),
+    ]
+
+
+def compare(results: dict, baselines: dict, tolerance: float = TOLERANCE):
+    """ Return the regressions of the results against the baselines
+
+    Args:
+        results (dict): Dict {benchmark: results}
+        baselines (dict): Dict {benchmark: results} stored with --save
+        tolerance (float, optional): Allowed slowdown or growth, 1.0 for twice slower. Defaults to TOLERANCE.
+
+    Returns:
+        list: Descriptions of the regressions
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        baseline = baselines.get(name)
+
+        if baseline is None:
+            continue
+
+        # tail latencies are reported but too noisy to fail on
+        for metric, min_difference in (
+            ("p50_ms", MIN_DIFFERENCE_MS), ("peak_mib", MIN_DIFFERENCE_MIB)
+        ):
+            value, reference = result[metric], baseline[metric]
+
+            if (
+                value > reference * (1 + tolerance) and
+                value - reference > min_difference
+            ):
+                regressions.append("{} {}: {} > {} (baseline)".format(
+                    name, metric, value, reference
+                ))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panels", type=int, default=150)
+    parser.add_argument("--genes", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--recording", help="Panels saved by record_panels")
+    parser.add_argument("--only", nargs="+", help="Benchmarks to run")
+    parser.add_argument("--save", action="store_true", help="Store results as baselines")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--baselines", default=str(BASELINES))
+    args = parser.parse_args()
+
+    config = {
+        "panels": args.panels, "genes": args.genes, "latency": args.latency,
+        "error_rate": args.error_rate, "recording": args.recording,
+    }
+    panels = load_recording(args.recording) if args.recording else None
+    # retries of the injected errors shouldn't wait for seconds
+    api.BACKOFF_FACTOR = 0.01
+
+    with MockPanelapp(
+        nb_panels=args.panels, nb_genes=args.genes, latency=args.latency,
+        nb_superpanels=2, panels=panels, cache_responses=True
+    ) as server, MockPanelapp(
+        nb_panels=args.panels, nb_genes=args.genes, latency=args.latency,
+        error_rate=args.error_rate, panels=panels, cache_responses=True
+    ) as error_server, tempfile.TemporaryDirectory() as tmp:
+        results = {}
+
+        print("benchmark\tops/s\tp50 ms\tp95 ms\tp99 ms\tpeak MiB")
+
+        for benchmark in get_benchmarks(server, error_server, tmp):
+            if args.only and benchmark.name not in args.only:
+                continue
+
+            results[benchmark.name] = result = benchmark.run()
+            print("{}\t{ops_per_s}\t{p50_ms}\t{p95_ms}\t{p99_ms}\t{peak_mib}".format(
+                benchmark.name, **result
+            ))
+
+    if args.save:
+        with open(args.baselines, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=4)
+            f.write("\n")
+
+    if args.check:
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+        if baselines["config"] != config:
+            sys.exit("Baselines were stored with {}, run with the same options".format(
+                baselines["config"]
+            ))
+
+        regressions = compare(results, baselines["results"], args.tolerance)
+
+        for regression in regressions:
+            print("REGRESSION {}".format(regression))
+
+        if regressions:
+            sys.exit(1)
+
+        print("No regression against {}".format(args.baselines))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,47 @@
+from copy import deepcopy
+from itertools import chain
 from pathlib import Path
+import weakref
 
-from .api import build_url, get_panelapp_response
+from . import metrics, probe
+from .api import (
+    build_url, decode_content, get_panelapp_response, PanelappError
+)
+from .cache import PanelCache
+from .entities import Gene, Region, STR
+
+
+BUILDS = ("GRCh37", "GRCh38")
+CONFIDENCE_LEVELS = frozenset([0, 1, 2, 3])
+GENE_LEVELS = frozenset(["0", "1", "2", "3"])
+INDEXED_KEYS = frozenset(["symbol", "hgnc_id", "GRCh37", "GRCh38"])
+
+# attributes assigned by set_data, accessing them loads lazy panels
+LAZY_ATTRIBUTES = {
+    "data", "name", "hash_id", "relevant_disorders", "superpanel",
+    "subpanels", "subpanel_data", "genes", "gene_index", "genes_by_symbol", "genes_by_hgnc_id",
+    "strs", "cnvs", "signedoff"
+}
+# attributes rebuilt by index_genes, not pickled
+DERIVED_ATTRIBUTES = ("gene_index", "genes_by_symbol", "genes_by_hgnc_id")
 
 
 class Panel():
+    # keep the raw API data after parsing, can be changed for all the panels
+    keep_data = True
+    # {(panel_id, version, confidence_level): Panel} of the subpanels built
+    # from superpanels, shared while they are in use
+    subpanel_cache = weakref.WeakValueDictionary()
+    # parsed panels shared by Panel.get, not cached unless set with
+    # set_panel_cache
+    panel_cache = None
+    # set on the panels shared by Panel.get, see check_writable
+    read_only = False
+
     def __init__(
-        self, panel_id: str, version: str = None, confidence_level: str = "3"
+        self, panel_id: str, version: str = None, confidence_level: str = "3",
+        data: dict = None, lazy: bool = False, name: str = None,
+        keep_data: bool = None
     ):
         """ Initialise Panel object, call the PanelApp API to get data
 
@@ -13,12 +49,178 @@ class Panel():
             panel_id (str): Panel id
             version (str, optional): Version of the panel to get. Defaults to None.
             confidence_level (str, optional): Confidence level for the genes of the panel. Defaults to None.
+            data (dict, optional): Panel data already returned by the API, no API call is made if given. Defaults to None.
+            lazy (bool, optional): Wait for the data to be needed before calling the API. Defaults to False.
+            name (str, optional): Name of the panel, for lazy panels to not need loading to get the name. Defaults to None.
+            keep_data (bool, optional): Keep the raw API data after parsing, get_data() calls the API again if not kept. Defaults to Panel.keep_data.
         """
 
         self.id = str(panel_id)
         self.version = version
         self.confidence_level = confidence_level
-        self.query_panel_data()
+
+        if keep_data is not None:
+            self.keep_data = keep_data
+
+        if name is not None:
+            self.name = name
+
+        if data:
+            self.set_data(data)
+        elif lazy:
+            self.loaded = False
+        else:
+            self.query_panel_data()
+
+    @classmethod
+    def get(
+        cls, panel_id: str, version: str = None, confidence_level: str = "3"
+    ):
+        """ Return panel object from Panel.panel_cache, built and cached on a miss
+
+        Panels are only cached once a cache is set with set_panel_cache,
+        otherwise a new panel is built on every call. Cached panels are
+        shared with every caller asking for the same version and are
+        read-only: update_version and the other methods changing them raise,
+        use copy() to get a panel that can be changed. With a cache and
+        without version, the latest version known by panelapp.probe is used
+        if it was seen less than its ttl ago. The version fetched without
+        version is given to the probe.
+
+        Args:
+            panel_id (str): Panel id
+            version (str, optional): Version of the panel to get. Defaults to the latest one.
+            confidence_level (str, optional): Confidence level for the genes of the panel. Defaults to "3".
+
+        Raises:
+            PanelappError: If the panel couldn't be retrieved
+
+        Returns:
+            Panel: Panel object
+        """
+
+        cache = cls.panel_cache
+        requested_version = version
+
+        if cache is not None:
+            if version is None:
+                version = probe.get_known_version(panel_id)
+
+            if version is not None:
+                panel = cache.get(panel_id, version, confidence_level)
+
+                if panel is not None:
+                    return panel
+
+        url = build_url(["panels", str(panel_id)], {"version": version})
+        # the length of the body is kept as cheap estimate of the panel size
+        content = get_panelapp_response(url, raise_errors=True, raw=True)
+        panel = cls(
+            panel_id, version, confidence_level,
+            data=decode_content(url, content)
+        )
+
+        if cache is not None:
+            panel.read_only = True
+            cache.set(panel, len(content))
+
+        if requested_version is None:
+            probe.set_latest_version(panel_id, panel.get_version())
+
+        return panel
+
+    def __getattr__(self, attribute):
+        """ Load lazy panels the first time their data is accessed
+
+        Only called for attributes that aren't set yet.
+
+        Args:
+            attribute (str): Name of the attribute
+
+        Returns:
+            Value of the attribute once the panel is loaded
+        """
+
+        if attribute in LAZY_ATTRIBUTES and not self.__dict__.get("loaded", True):
+            self.load()
+            return getattr(self, attribute)
+
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(
+                type(self).__name__, attribute
+            )
+        )
+
+    def __getstate__(self):
+        """ Return the attributes to pickle, without the gene indexes
+
+        Returns:
+            dict: Attributes of the panel
+        """
+
+        return {
+            attribute: value
+            for attribute, value in self.__dict__.items()
+            if attribute not in DERIVED_ATTRIBUTES and attribute != "read_only"
+        }
+
+    def __setstate__(self, state: dict):
+        """ Restore the attributes of a pickled panel and its gene indexes
+
+        Args:
+            state (dict): Attributes returned by __getstate__
+        """
+
+        self.__dict__.update(state)
+
+        if "genes" in state:
+            self.index_genes()
+
+    def copy(self):
+        """ Return a copy of the panel that can be changed, also for the
+        read-only panels returned by Panel.get
+
+        Returns:
+            Panel: Copy of the panel
+        """
+
+        return deepcopy(self)
+
+    def check_writable(self):
+        """ Raise if the panel is shared by Panel.get
+
+        Raises:
+            TypeError: If the panel is read-only
+        """
+
+        if self.read_only:
+            raise TypeError(
+                "Panel {} version {} is shared by Panel.get and read-only, "
+                "change a copy() of it instead".format(self.id, self.version)
+            )
+
+    def load(self):
+        """ Call the API to get the data of the panel if not done already
+
+        Returns:
+            Panel: The panel itself
+        """
+
+        if not self.is_loaded():
+            # set before the call so a failed load doesn't retry on every access
+            self.loaded = True
+            self.query_panel_data()
+
+        return self
+
+    def is_loaded(self):
+        """ Return whether the data of the panel has been retrieved
+
+        Returns:
+            bool: Loading status
+        """
+
+        return "data" in self.__dict__
 
     def query_panel_data(self):
         """ Query data to Panelapp API and assign data to attributes of the panel object 
@@ -34,24 +236,49 @@ class Panel():
         data = get_panelapp_response(url)
 
         if data:
-            self.data = data
-            self.name = self.data["name"]
-            self.hash_id = self.data["hash_id"]
-            self.version = self.data["version"]
-            self.relevant_disorders = self.data["relevant_disorders"]
+            self.set_data(data)
+
+        elif data is None:
+            print("Data retrieval failed 5 times, exiting...")
+            return None
+
+    def set_data(self, data: dict):
+        """ Assign data returned by the API to attributes of the panel object
+
+        Args:
+            data (dict): Data of the panel returned by the API
+
+        Raises:
+            TypeError: If the panel is read-only, see check_writable
+        """
+
+        self.check_writable()
+        self.loaded = True
+        self.data = data
+        self.name = self.data["name"]
+        self.hash_id = self.data["hash_id"]
+        self.version = self.data["version"]
+        self.relevant_disorders = self.data["relevant_disorders"]
+
+        if metrics.hooks:
+            for stage in (
+                self.setup_superpanel, self.set_genes, self.set_strs,
+                self.set_cnvs
+            ):
+                metrics.time_stage(stage.__name__, stage, panel_id=self.id)
+        else:
             self.setup_superpanel()
             self.set_genes()
             self.set_strs()
             self.set_cnvs()
 
-            if "signed_off" in self.data:
-                self.signedoff = self.data["signed_off"]
-            else:
-                self.signedoff = False
+        if "signed_off" in self.data:
+            self.signedoff = self.data["signed_off"]
+        else:
+            self.signedoff = False
 
-        elif data is None:
-            print("Data retrieval failed 5 times, exiting...")
-            return None
+        if not self.keep_data:
+            self.data = None
 
     def update_version(self, version: str, confidence_level: str = "3"):
         """ Update the version and confidence level for the Panel object
@@ -59,8 +286,12 @@ class Panel():
         Args:
             version (str): Version to update to
             confidence_level (str, optional): Confidence level. Defaults to "3".
+
+        Raises:
+            TypeError: If the panel is read-only, see check_writable
         """
 
+        self.check_writable()
         self.version = version
         self.confidence_level = confidence_level
         self.query_panel_data()
@@ -77,56 +308,76 @@ class Panel():
         else:
             output_folder = "{}".format(path)
 
-        if not Path(output_folder).is_dir():
-            Path(output_folder).mkdir()
+        Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+        file_path = "{}/{}_{}.tsv".format(
+            output_folder, self.get_file_name(), self.version
+        )
+
+        with open(file_path, "w") as f:
+            f.writelines(
+                "\t".join(map(str, row)) + "\n" for row in self.get_rows()
+            )
+
+    def get_file_name(self):
+        """ Return the panel name cleaned to be used as file name
+
+        Returns:
+            str: Panel name without "-" and "/"
+        """
 
         panel_name = self.name.replace(" - ", " ")
         panel_name = panel_name.replace("-", " ")
         panel_name = panel_name.replace("/", " ")
         panel_name = " ".join(panel_name.split(" "))
 
-        file_path = "{}/{}_{}.tsv".format(
-            output_folder, panel_name, self.version
+        return panel_name
+
+    def get_rows(self):
+        """ Return the lines written by write(), genes at the confidence level
+        of the panel then green strs and cnvs
+
+        Returns:
+            list: List of tuples, gene, str and cnv lines have different lengths
+        """
+
+        panel = (self.name, self.id, self.version, self.signedoff)
+        rows = [
+            panel + ("gene", gene.symbol, gene.hgnc_id)
+            for gene in self.get_genes()
+        ]
+
+        rows.extend(
+            panel + (
+                "str",
+                str_entity.entity_name,
+                str_entity.gene_symbol,
+                str_entity.hgnc_id,
+                str_entity.repeated_sequence,
+                str_entity.normal_repeats,
+                str_entity.pathogenic_repeats,
+                str_entity.chromosome,
+                str_entity["grch37_coordinates"],
+                str_entity["grch38_coordinates"]
+            )
+            for str_entity in self.get_strs()
+            if str_entity.confidence_level == "3"
         )
 
-        with open(file_path, "w") as f:
-            for gene_data in self.get_genes():
-                symbol = gene_data["symbol"]
-                hgnc_id = gene_data["hgnc_id"]
-
-                f.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
-                    self.name, self.id, self.version,
-                    self.signedoff, "gene", symbol, hgnc_id
-                ))
-
-            for str_entity in self.get_strs():
-                if str_entity["confidence_level"] == "3":
-                    f.write(
-                        "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
-                            self.name, self.id, self.version, self.signedoff,
-                            "str",
-                            str_entity["entity_name"],
-                            str_entity["gene_data"]["hgnc_symbol"],
-                            str_entity["gene_data"]["hgnc_id"],
-                            str_entity["repeated_sequence"],
-                            str_entity["normal_repeats"],
-                            str_entity["pathogenic_repeats"],
-                            str_entity["chromosome"],
-                            str_entity["grch37_coordinates"],
-                            str_entity["grch38_coordinates"]
-                        )
-                    )
+        rows.extend(
+            panel + (
+                "cnv",
+                cnv.entity_name,
+                cnv.type_of_variants,
+                cnv.chromosome,
+                cnv["grch37_coordinates"],
+                cnv["grch38_coordinates"]
+            )
+            for cnv in self.get_cnvs()
+            if cnv.confidence_level == "3"
+        )
 
-            for cnv in self.get_cnvs():
-                if cnv["confidence_level"] == "3":
-                    f.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
-                        self.name, self.id, self.version, self.signedoff, "cnv",
-                        cnv["entity_name"],
-                        cnv["type_of_variants"],
-                        cnv["chromosome"],
-                        cnv["grch37_coordinates"],
-                        cnv["grch38_coordinates"]
-                    ))
+        return rows
 
     def get_name(self):
         """ Return the panel name
@@ -158,11 +409,29 @@ class Panel():
     def get_latest_version(self):
         """ Return latest possible version of current Panel object
 
+        The version seen by panelapp.probe less than its ttl ago is used,
+        from its listings or from a previous Panel.get. Otherwise the probe
+        reads the panel listings, and only panels missing from them are
+        fetched through Panel.get.
+
         Returns:
-            str: Version of the latest version
+            str: Version of the latest version, None if the listings or the panel couldn't be retrieved
         """
 
-        return Panel(panel_id=self.id).get_version()
+        version = probe.get_known_version(self.id)
+
+        try:
+            if version is None:
+                version = probe.get_latest_version(self.id)
+
+            if version is None:
+                version = Panel.get(
+                    self.id, confidence_level=self.confidence_level
+                ).get_version()
+        except PanelappError:
+            return None
+
+        return version
 
     def get_version(self):
         """ Return version of current Panel object
@@ -171,6 +440,9 @@ class Panel():
             str: Version of the current Panel object
         """
 
+        if self.version is None:
+            self.load()
+
         return self.version
 
     def get_relevant_disorders(self):
@@ -189,99 +461,110 @@ class Panel():
 
         if self.data["genes"]:
             for gene in self.data["genes"]:
-                if gene["confidence_level"] == "3":
-                    self.genes.setdefault("3", []).append(
-                        setup_gene(gene)
-                    )
-                elif gene["confidence_level"] == "2":
-                    self.genes.setdefault("2", []).append(
-                        setup_gene(gene)
-                    )
-                elif gene["confidence_level"] == "1":
-                    self.genes.setdefault("1", []).append(
-                        setup_gene(gene)
-                    )
-                elif gene["confidence_level"] == "0":
-                    self.genes.setdefault("0", []).append(
+                if gene["confidence_level"] in GENE_LEVELS:
+                    self.genes.setdefault(gene["confidence_level"], []).append(
                         setup_gene(gene)
                     )
 
-    def select_from_genes(self, key, *confidence_levels):
-        """ Select correct data to return from the self.genes dict
+        self.index_genes()
+
+    def index_genes(self):
+        """ Build the indexes used to answer the gene queries
+
+        For every confidence level, symbols, hgnc ids and ensembl ids are
+        stored in tuples (to keep the order of the panel) and frozensets (for
+        membership tests) so that queries don't have to go through the genes.
+        """
+
+        self.gene_index = {}
+        self.genes_by_symbol = {}
+        self.genes_by_hgnc_id = {}
+
+        for level, genes in self.genes.items():
+            index = {
+                "symbol": tuple(gene.symbol for gene in genes),
+                "hgnc_id": tuple(gene.hgnc_id for gene in genes),
+                "GRCh37": tuple(
+                    gene.grch37_ensembl_ids
+                    for gene in genes
+                    if gene.grch37_ensembl_ids is not None
+                ),
+                "GRCh38": tuple(
+                    gene.grch38_ensembl_ids
+                    for gene in genes
+                    if gene.grch38_ensembl_ids is not None
+                ),
+            }
+
+            index["symbol_set"] = frozenset(index["symbol"])
+            index["hgnc_id_set"] = frozenset(index["hgnc_id"])
+            self.gene_index[level] = index
+
+        # genes present at several levels (superpanels) map to the highest one
+        for level in sorted(self.genes, reverse=True):
+            for gene in self.genes[level]:
+                self.genes_by_symbol.setdefault(gene.symbol, gene)
+                self.genes_by_hgnc_id.setdefault(gene.hgnc_id, gene)
+
+    def get_levels(self, confidence_levels: tuple):
+        """ Return the keys of self.genes for the confidence levels given
 
         Args:
-            key (str): Key of data to return ("symbol", "hgnc_id", "ensembl_id")
+            confidence_levels (tuple): Confidence levels, the confidence level of the panel if empty
 
         Returns:
-            list: List of symbol or ids to return
+            list: List of confidence levels as str
         """
 
-        genes_to_return = []
+        if not confidence_levels:
+            return [str(self.confidence_level)]
 
-        if confidence_levels:
-            genes = []
-
-            for level in confidence_levels:
-                assert level in [0, 1, 2, 3], (
-                    "Choose among the following levels: 3 (green), 2 (amber), "
-                    "1 (red), 0 (the rest)"
-                )
+        for level in confidence_levels:
+            assert level in CONFIDENCE_LEVELS, (
+                "Choose among the following levels: 3 (green), 2 (amber), "
+                "1 (red), 0 (the rest)"
+            )
 
-                if str(level) in self.genes:
-                    genes.append([
-                        gene[key]
-                        for gene in self.genes[str(level)]
-                        if key in gene
-                    ])
-
-            genes_to_return = [
-                gene
-                for gene_list in genes
-                for gene in gene_list
-            ]
-        else:
-            if self.confidence_level in self.genes:
-                genes_to_return = [
-                    gene[key]
-                    for gene in self.genes[str(self.confidence_level)]
-                    if key in gene
-                ]
+        return [str(level) for level in confidence_levels]
 
-        return genes_to_return
+    def select_from_genes(self, key, *confidence_levels):
+        """ Select correct data to return from the gene indexes
 
-    def get_genes(self, *confidence_levels: str):
-        """ Return gene symbols + gene ids
+        Args:
+            key (str): Key of data to return ("symbol", "hgnc_id", "ensembl_id", "GRCh37", "GRCh38")
 
         Returns:
-            list: List of dict with all the data for the genes
+            list: List of symbol or ids to return
         """
 
-        genes_to_return = []
+        levels = self.get_levels(confidence_levels)
 
-        if confidence_levels:
-            genes = []
+        if key not in INDEXED_KEYS:
+            return [
+                gene[key]
+                for level in levels
+                for gene in self.genes.get(level, [])
+                if key in gene
+            ]
 
-            for level in confidence_levels:
-                assert level in [0, 1, 2, 3], (
-                    "Choose among the following levels: 3 (green), 2 (amber), "
-                    "1 (red), 0 (the rest)"
-                )
+        return list(chain.from_iterable(
+            self.gene_index[level][key]
+            for level in levels
+            if level in self.gene_index
+        ))
 
-                if str(level) in self.genes:
-                    genes.append(self.genes[str(level)])
+    def get_genes(self, *confidence_levels: str):
+        """ Return gene symbols + gene ids
 
-            genes_to_return = [
-                gene
-                for gene_list in genes
-                for gene in gene_list
-            ]
-        else:
-            if self.confidence_level in self.genes:
-                genes_to_return = self.genes[str(self.confidence_level)]
-            else:
-                return []
+        Returns:
+            list: List of dict with all the data for the genes
+        """
 
-        return genes_to_return
+        return list(chain.from_iterable(
+            self.genes[level]
+            for level in self.get_levels(confidence_levels)
+            if level in self.genes
+        ))
 
     def get_gene_symbols(self, *confidence_levels: str):
         """ Return list of gene symbols
@@ -314,31 +597,113 @@ class Panel():
             list: List of ensembl ids
         """
 
-        assert build in ["GRCh37", "GRCh38"], (
+        assert build in BUILDS, (
             "Choose among 'GRCh37' and 'GRCh38' and then specify the "
             "confidence levels"
         )
 
-        ensembl_ids = self.select_from_genes(
-            "ensembl_id", *confidence_levels
+        # lists built for each call, the tuples of the index are shared
+        return [
+            list(ensembl_ids)
+            for ensembl_ids in self.select_from_genes(build, *confidence_levels)
+        ]
+
+    def get_gene_set(self, key, *confidence_levels):
+        """ Return set of gene symbols or hgnc ids for the confidence levels
+
+        Args:
+            key (str): Key of data to return ("symbol", "hgnc_id")
+
+        Returns:
+            frozenset: Set of symbols or hgnc ids
+        """
+
+        sets = [
+            self.gene_index[level]["{}_set".format(key)]
+            for level in self.get_levels(confidence_levels)
+            if level in self.gene_index
+        ]
+
+        if len(sets) == 1:
+            return sets[0]
+
+        return frozenset().union(*sets)
+
+    def get_hgnc_id_set(self, *confidence_levels: str):
+        """ Return set of hgnc ids
+        Can type 0,1,2,3 to get genes with appropriate confidence level to return
+
+        Returns:
+            frozenset: Set of hgnc ids
+        """
+
+        return self.get_gene_set("hgnc_id", *confidence_levels)
+
+    def get_gene_symbol_set(self, *confidence_levels: str):
+        """ Return set of gene symbols
+        Can type 0,1,2,3 to get genes with appropriate confidence level to return
+
+        Returns:
+            frozenset: Set of gene symbols
+        """
+
+        return self.get_gene_set("symbol", *confidence_levels)
+
+    def contains_hgnc(self, hgnc_id: str, levels: tuple = ()):
+        """ Return whether the panel contains the hgnc id
+
+        Args:
+            hgnc_id (str): Hgnc id i.e. "HGNC:1234"
+            levels (tuple, optional): Confidence levels to look into. Defaults to the confidence level of the panel.
+
+        Returns:
+            bool: True if the gene is in the panel
+        """
+
+        return any(
+            hgnc_id in self.gene_index[level]["hgnc_id_set"]
+            for level in self.get_levels(levels)
+            if level in self.gene_index
         )
 
-        if build is not None:
-            ensembl_ids_to_return = [
-                ensembl_id[build]
-                for ensembl_id in ensembl_ids
-                if build in ensembl_id
-            ]
-        else:
-            ensembl_ids_to_return = ensembl_ids
+    def contains_symbol(self, symbol: str, levels: tuple = ()):
+        """ Return whether the panel contains the gene symbol
 
-        return ensembl_ids_to_return
+        Args:
+            symbol (str): Gene symbol
+            levels (tuple, optional): Confidence levels to look into. Defaults to the confidence level of the panel.
+
+        Returns:
+            bool: True if the gene is in the panel
+        """
+
+        return any(
+            symbol in self.gene_index[level]["symbol_set"]
+            for level in self.get_levels(levels)
+            if level in self.gene_index
+        )
+
+    def get_gene(self, symbol: str = None, hgnc_id: str = None):
+        """ Return the data of the gene with the symbol or hgnc id given
+
+        Args:
+            symbol (str, optional): Gene symbol. Defaults to None.
+            hgnc_id (str, optional): Hgnc id. Defaults to None.
+
+        Returns:
+            dict: Data of the gene, None if the gene isn't in the panel
+        """
+
+        if hgnc_id is not None:
+            return self.genes_by_hgnc_id.get(hgnc_id)
+
+        return self.genes_by_symbol.get(symbol)
 
     def set_cnvs(self):
         """ Setup the cnvs """
 
         if self.data["regions"]:
-            self.cnvs = self.data["regions"]
+            self.cnvs = [Region.from_api(cnv) for cnv in self.data["regions"]]
         else:
             self.cnvs = []
 
@@ -346,16 +711,19 @@ class Panel():
         """ Return cnvs
 
         Returns:
-            dict: Dict of cnvs data
+            list: List of Region records, readable like the dicts of the API, a copy for read-only panels
         """
 
+        if self.read_only:
+            return list(self.cnvs)
+
         return self.cnvs
 
     def set_strs(self):
         """ Setup the strs """
 
         if self.data["strs"]:
-            self.strs = self.data["strs"]
+            self.strs = [STR.from_api(str_entity) for str_entity in self.data["strs"]]
         else:
             self.strs = []
 
@@ -363,18 +731,34 @@ class Panel():
         """ Return strs
 
         Returns:
-            dict: Dict of strs data
+            list: List of STR records, readable like the dicts of the API, a copy for read-only panels
         """
 
+        if self.read_only:
+            return list(self.strs)
+
         return self.strs
 
     def get_data(self):
         """ Return the all the data returned by the panel query
+        Decodes the response kept by panels parsed in processes, calls the API
+        again if the data wasn't kept after parsing
 
         Returns:
-            dict: Dict of all the data of the panel
+            dict: Dict of all the data of the panel, a copy for read-only panels
         """
 
+        if self.data is None and getattr(self, "response", None):
+            self.data = decode_content(*self.response)
+            self.response = None
+
+        if self.data is None:
+            url = build_url(["panels", self.id], {"version": self.version})
+            return get_panelapp_response(url)
+
+        if self.read_only:
+            return deepcopy(self.data)
+
         return self.data
 
     def get_info(self):
@@ -385,8 +769,8 @@ class Panel():
         """
 
         info = {
-            "green_genes": len(self.symbols["3"]),
-            "entity_types": self.data["stats"]
+            "green_genes": len(self.genes.get("3", [])),
+            "entity_types": self.get_data()["stats"]
         }
 
         return info
@@ -411,56 +795,119 @@ class Panel():
         return self.superpanel
 
     def setup_superpanel(self):
-        """ Assign the subpanels and the superpanel attributes """
+        """ Assign the subpanels and the superpanel attributes
 
-        self.superpanel = False
-        self.subpanels = set()
+        Entities of superpanels carry the data of their subpanel, the
+        subpanels are collected in one pass over all the entities.
+        """
 
-        if self.data["genes"]:
-            if "panel" in self.data["genes"][0]:
-                self.superpanel = True
-                self.subpanels.update([
-                    (
-                        gene["panel"]["id"],
-                        gene["panel"]["name"],
-                        gene["panel"]["version"]
-                    )
-                    for gene in self.data["genes"]
-                ])
+        # {subpanel id: data of the subpanel from the API}
+        self.subpanel_data = {}
 
-        if self.data["strs"]:
-            if "panel" in self.data["strs"][0]:
-                self.superpanel = True
-                self.subpanels.update([
-                    (
-                        gene["panel"]["id"],
-                        gene["panel"]["name"],
-                        gene["panel"]["version"]
-                    )
-                    for gene in self.data["genes"]
-                ])
+        for entity in chain(
+            self.data["genes"] or (), self.data["strs"] or (),
+            self.data["regions"] or ()
+        ):
+            subpanel = entity.get("panel")
 
-        if self.data["regions"]:
-            if "panel" in self.data["regions"][0]:
-                self.superpanel = True
-                self.subpanels.update([
-                    (
-                        gene["panel"]["id"],
-                        gene["panel"]["name"],
-                        gene["panel"]["version"]
-                    )
-                    for gene in self.data["genes"]
-                ])
+            if subpanel and subpanel["id"] not in self.subpanel_data:
+                self.subpanel_data[subpanel["id"]] = subpanel
+
+        self.superpanel = bool(self.subpanel_data)
+        self.subpanels = {
+            (subpanel["id"], subpanel["name"], subpanel["version"])
+            for subpanel in self.subpanel_data.values()
+        }
 
     def get_subpanels(self):
         """ Return subpanels of the superpanel
 
         Returns:
-            set: Set of tuples containing panel_id, panel_name, panel_version
+            set: Set of tuples containing panel_id, panel_name, panel_version, a copy for read-only panels
         """
 
+        if self.read_only:
+            return set(self.subpanels)
+
         return self.subpanels
 
+    def get_subpanel_panels(self):
+        """ Return panel objects for the subpanels of the superpanel
+
+        The subpanels are built from the entities of the superpanel without
+        any API call. Subpanels at the same version are shared between
+        superpanels through Panel.subpanel_cache. They only have what the
+        superpanel data has: signedoff is False and get_data() calls the API.
+
+        Returns:
+            dict: Dict {panel_id: Panel}, empty if not a superpanel
+        """
+
+        # {subpanel id: (genes, strs, cnvs)}
+        entities = {}
+
+        for position, records in enumerate((
+            chain.from_iterable(self.genes.values()), self.strs, self.cnvs
+        )):
+            for record in records:
+                if record.subpanel is not None:
+                    entities.setdefault(
+                        record.subpanel[0], ([], [], [])
+                    )[position].append(record)
+
+        subpanels = {}
+
+        for panel_id, data in self.subpanel_data.items():
+            key = (str(panel_id), data["version"], self.confidence_level)
+            subpanel = self.subpanel_cache.get(key)
+
+            if subpanel is None:
+                subpanel = Panel(
+                    panel_id, data["version"], self.confidence_level,
+                    lazy=True
+                )
+                subpanel.set_entities(
+                    data, *entities.get(panel_id, ([], [], []))
+                )
+                self.subpanel_cache[key] = subpanel
+
+            subpanels[panel_id] = subpanel
+
+        return subpanels
+
+    def set_entities(self, data: dict, genes: list, strs: list, cnvs: list):
+        """ Assign records already parsed, used for the subpanels of superpanels
+
+        Args:
+            data (dict): Data of the panel as given in the entities of superpanels
+            genes (list): Gene records
+            strs (list): STR records
+            cnvs (list): Region records
+
+        Raises:
+            TypeError: If the panel is read-only, see check_writable
+        """
+
+        self.check_writable()
+        self.loaded = True
+        self.data = None
+        self.name = data["name"]
+        self.hash_id = data.get("hash_id")
+        self.version = data["version"]
+        self.relevant_disorders = data.get("relevant_disorders", [])
+        self.superpanel = False
+        self.subpanels = set()
+        self.subpanel_data = {}
+        self.signedoff = False
+        self.genes = {}
+
+        for gene in genes:
+            self.genes.setdefault(gene.confidence_level, []).append(gene)
+
+        self.index_genes()
+        self.strs = strs
+        self.cnvs = cnvs
+
     def __str__(self):
         """ Return a string with basic info on the panel
 
@@ -478,7 +925,7 @@ class Panel():
 
 
 def setup_gene(panelapp_data):
-    """ Create dict of data to be added in self.genes. Will contain symbol,
+    """ Create gene record to be added in self.genes. Will contain symbol,
     hgnc id, ensembl id (if provide by panelapp)
 
     Args:
@@ -486,35 +933,30 @@ def setup_gene(panelapp_data):
                               gene
 
     Returns:
-        dict: Dict containing gene symbol, hgnc id, ensembl id if in Panelapp
+        Gene: Gene record readable like a dict with symbol, hgnc_id and
+              ensembl_id keys
+    """
+
+    return Gene.from_api(panelapp_data)
+
+
+def set_panel_cache(cache: PanelCache = None):
+    """ Set the in-memory cache of the panels returned by Panel.get
+
+    The cache keeps the panels alive up to its limits, see PanelCache.
+
+    Args:
+        cache (PanelCache, optional): Cache to use, no caching if None. Defaults to None.
     """
-    data = {
-        "symbol": panelapp_data["gene_data"]["hgnc_symbol"],
-        "hgnc_id": panelapp_data["gene_data"]["hgnc_id"],
-    }
-
-    gene_data = panelapp_data["gene_data"]
-
-    if "ensembl_genes" in gene_data:
-        ensembl_dict = {}
-
-        if gene_data["ensembl_genes"] and isinstance(gene_data["ensembl_genes"], dict):
-            for build, ensembl_data in gene_data["ensembl_genes"].items():
-                # after the following keys
-                # ["gene_data"]["ensembl_genes"]["GRch37"], there is another
-                # key to denote the ensembl version (82 for 37 and 90 for 90)
-                if "37" in build:
-                    ensembl_dict["GRCh37"] = [
-                        ensembl_data[version]["ensembl_id"]
-                        for version in ensembl_data
-                    ]
-
-                if "38" in build:
-                    ensembl_dict["GRCh38"] = [
-                        ensembl_data[version]["ensembl_id"]
-                        for version in ensembl_data
-                    ]
-
-            data["ensembl_id"] = ensembl_dict
-
-    return data
+
+    Panel.panel_cache = cache
+
+
+def get_panel_cache():
+    """ Return the in-memory cache of the panels returned by Panel.get
+
+    Returns:
+        PanelCache: Cache in use, None if panels aren't cached
+    """
+
+    return Panel.panel_cache
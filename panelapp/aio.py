@@ -0,0 +1,445 @@
+""" Asyncio versions of the API calls and queries
+
+The calls go through the same code as api.py (session pool, retries, cache)
+in a bounded pool of threads so that they never block the event loop. A
+semaphore per event loop caps the number of calls in flight.
+
+    async with aio.AsyncClient(max_connections=16) as client:
+        panel = await client.get_panel(269)
+
+The module-level functions use a shared default client.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import weakref
+
+from . import api
+from .Panelapp import Panel
+from .queries import warn_failures
+
+
+class AsyncClient():
+    def __init__(self, max_connections: int = 10, session=None):
+        """ Initialise client sharing a connection pool between its calls
+
+        Args:
+            max_connections (int, optional): Maximum number of API calls in flight. Defaults to 10.
+            session (requests.Session, optional): Session to use, left open by close(). One with max_connections connections is created if None. Defaults to None.
+        """
+
+        self.max_connections = max_connections
+        # only the sessions created here are closed with the client
+        self.owns_session = session is None
+        self.session = session or api.create_session(pool_size=max_connections)
+        self.executor = ThreadPoolExecutor(max_workers=max_connections)
+        self.semaphores = weakref.WeakKeyDictionary()
+        # {event loop: {(url, raw): task}} of the calls in flight for single flight
+        self.pending = weakref.WeakKeyDictionary()
+
+    def get_semaphore(self):
+        """ Return the semaphore of the running event loop
+
+        Returns:
+            asyncio.Semaphore: Semaphore capping the calls in flight
+        """
+
+        loop = asyncio.get_running_loop()
+
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.max_connections)
+
+        return self.semaphores[loop]
+
+    async def run(self, function, *args, **kwargs):
+        """ Run blocking function in the pool of threads of the client
+
+        Args:
+            function (function): Function to run
+
+        Returns:
+            Value returned by the function
+        """
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            self.executor, partial(function, *args, **kwargs)
+        )
+
+    async def get_panelapp_response(
+        self, ext_url: str = None, full_url: str = None,
+        raise_errors: bool = False, raw: bool = False
+    ):
+        """ Make an API query, see api.get_panelapp_response
+
+        If single flight is enabled (api.set_single_flight), tasks asking for
+        the same URL at the same time await the same call.
+
+        Args:
+            ext_url (str, optional): External path for the URL to add to the base URL. Defaults to None.
+            full_url (str, optional): Full url to use for the API call. Defaults to None.
+            raise_errors (bool, optional): Raise PanelappError instead of printing the error and returning None. Defaults to False.
+            raw (bool, optional): Return the body of the response without parsing it. Defaults to False.
+
+        Returns:
+            dict: Data from the API call, bytes if raw
+        """
+
+        if api.get_single_flight() is None:
+            async with self.get_semaphore():
+                return await self.run(
+                    api.get_panelapp_response, ext_url=ext_url,
+                    full_url=full_url, raise_errors=raise_errors,
+                    session=self.session, raw=raw
+                )
+
+        url = api.get_url(ext_url, full_url)
+        pending = self.pending.setdefault(asyncio.get_running_loop(), {})
+        key = (url, raw)
+        task = pending.get(key)
+
+        if task is None:
+            task = pending[key] = asyncio.ensure_future(self.fetch(url, raw))
+            task.add_done_callback(lambda task: pending.pop(key, None))
+
+        try:
+            # shield so that a cancelled caller doesn't cancel the others
+            return await asyncio.shield(task)
+        except api.PanelappError as e:
+            if raise_errors:
+                raise
+
+            print(e)
+            return None
+
+    async def fetch(self, url: str, raw: bool = False):
+        """ Make an API query raising errors, used for single flight
+
+        Args:
+            url (str): Full URL of the API call
+            raw (bool, optional): Return the body of the response without parsing it. Defaults to False.
+
+        Raises:
+            PanelappError: If the call failed
+
+        Returns:
+            dict: Data from the API call
+        """
+
+        async with self.get_semaphore():
+            return await self.run(
+                api.get_panelapp_response, full_url=url, raise_errors=True,
+                session=self.session, raw=raw
+            )
+
+    async def iter_full_results_from_API(self, data: dict):
+        """ Yield the results of every page, the next page is fetched while
+        the current one is consumed
+
+        Args:
+            data (dict): Dict output from the API call
+
+        Raises:
+            PanelappError: If one of the next pages couldn't be retrieved
+
+        Yields:
+            dict: Data of each result
+        """
+
+        while True:
+            next_page = None
+
+            if data["next"]:
+                next_page = asyncio.ensure_future(self.get_panelapp_response(
+                    full_url=data["next"], raise_errors=True
+                ))
+
+            try:
+                for result in data["results"]:
+                    yield result
+            except BaseException:
+                if next_page:
+                    next_page.cancel()
+                raise
+
+            if next_page is None:
+                break
+
+            data = await next_page
+
+    async def get_full_results_from_API(self, data: dict):
+        """ Get all the results from the API call
+
+        Args:
+            data (dict): Dict output from the API call
+
+        Returns:
+            list: Data of every page
+        """
+
+        return [result async for result in self.iter_full_results_from_API(data)]
+
+    async def get_panel(
+        self, panel_id: str, version: str = None, confidence_level: str = "3"
+    ):
+        """ Return panel object, raising if the call fails
+
+        The panel is parsed in the pool of threads to not block the event loop.
+
+        Args:
+            panel_id (str): Panel id
+            version (str, optional): Version of the panel to get. Defaults to None.
+            confidence_level (str, optional): Confidence level. Defaults to "3".
+
+        Raises:
+            PanelappError: If the panel couldn't be retrieved
+
+        Returns:
+            Panel: Panel object
+        """
+
+        url = api.build_url(["panels", str(panel_id)], {"version": version})
+        data = await self.get_panelapp_response(url, raise_errors=True)
+
+        return await self.run(
+            Panel, panel_id=panel_id, version=version,
+            confidence_level=confidence_level, data=data
+        )
+
+    async def load_panels(
+        self, panels_to_load: list, confidence_level: str = "3"
+    ):
+        """ Build many panel objects concurrently
+
+        Args:
+            panels_to_load (list): Panel ids or (panel_id, version) tuples
+            confidence_level (str, optional): Confidence level. Defaults to "3".
+
+        Returns:
+            tuple: Dict {panel_id: Panel} of loaded panels and dict
+                   {panel_id: Exception} of panels that failed to load
+        """
+
+        keys = [
+            panel if isinstance(panel, tuple) else (panel, None)
+            for panel in panels_to_load
+        ]
+        results = await asyncio.gather(
+            *[
+                self.get_panel(panel_id, version, confidence_level)
+                for panel_id, version in keys
+            ],
+            return_exceptions=True
+        )
+
+        panels = {}
+        failures = {}
+
+        for (panel_id, version), result in zip(keys, results):
+            if isinstance(result, Exception):
+                failures[panel_id] = result
+            else:
+                panels[panel_id] = result
+
+        return panels, failures
+
+    async def get_all_signedoff_panels(
+        self, confidence_level: str = "3", lazy: bool = False
+    ):
+        """ Return signedoff panel objects, see queries.get_all_signedoff_panels
+
+        Args:
+            confidence_level (str, optional): Confidence level. Defaults to "3".
+            lazy (bool, optional): Only list the panels, lazy panels load synchronously when used. Defaults to False.
+
+        Returns:
+            dict: Dict of panel objects
+        """
+
+        data = await self.get_panelapp_response(ext_url="panels/signedoff")
+        res = await self.get_full_results_from_API(data)
+
+        if lazy:
+            return {
+                panel["id"]: Panel(
+                    panel_id=panel["id"], version=panel["version"],
+                    confidence_level=confidence_level, lazy=True,
+                    name=panel["name"]
+                )
+                for panel in res
+            }
+
+        panels, failures = await self.load_panels(
+            [(panel["id"], panel["version"]) for panel in res],
+            confidence_level=confidence_level
+        )
+        warn_failures(failures)
+
+        return panels
+
+    async def get_all_panels(self, lazy: bool = False):
+        """ Return all panels, see queries.get_all_panels
+
+        Args:
+            lazy (bool, optional): Only list the panels, lazy panels load synchronously when used. Defaults to False.
+
+        Returns:
+            dict: All panels in Panelapp
+        """
+
+        data = await self.get_panelapp_response(ext_url="panels")
+        res = await self.get_full_results_from_API(data)
+
+        if lazy:
+            return {
+                panel["id"]: Panel(
+                    panel_id=panel["id"], version=panel["version"], lazy=True,
+                    name=panel["name"]
+                )
+                for panel in res
+            }
+
+        panels, failures = await self.load_panels(
+            [panel["id"] for panel in res]
+        )
+        warn_failures(failures)
+
+        return panels
+
+    async def get_signedoff_panel(self, panel_id: str):
+        """ Return data for the latest version of a signedoff panel
+
+        Args:
+            panel_id (str): Panel id
+
+        Returns:
+            dict: Data of the panel
+        """
+
+        return await self.get_panelapp_response(
+            ext_url="panels/signedoff/?panel_id={}".format(panel_id)
+        )
+
+    async def compare_versions(self, original_panel: Panel, compare_version: str):
+        """ Return matches and differences in the genes in the version given
+
+        Args:
+            original_panel (Panel object): Panel object to compare
+            compare_version (str): Version of the Panel object to compare to
+
+        Returns:
+            tuple: Tuple of sets with genes matched and not matched
+        """
+
+        new_panel = await self.get_panel(
+            original_panel.id, compare_version, original_panel.confidence_level
+        )
+
+        original_genes = original_panel.get_hgnc_id_set(1, 2, 3)
+        compare_genes = new_panel.get_hgnc_id_set(1, 2, 3)
+
+        matches = set(original_genes.intersection(compare_genes))
+        difference = set(original_genes.symmetric_difference(compare_genes))
+
+        return (matches, difference)
+
+    def close(self):
+        """ Stop the threads and close the session if the client created it """
+
+        self.executor.shutdown(wait=False)
+
+        if self.owns_session:
+            self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+_client = None
+
+
+def get_client():
+    """ Return the client used by the module-level functions
+
+    Returns:
+        AsyncClient: Default client
+    """
+
+    global _client
+
+    if _client is None:
+        _client = AsyncClient()
+
+    return _client
+
+
+def set_client(client: AsyncClient = None):
+    """ Replace the client used by the module-level functions
+
+    Args:
+        client (AsyncClient, optional): Client to use, a default one is created on next call if None. Defaults to None.
+    """
+
+    global _client
+
+    _client = client
+
+
+async def get_panelapp_response(
+    ext_url: str = None, full_url: str = None, raise_errors: bool = False,
+    raw: bool = False
+):
+    """ Make an API query with the default client """
+
+    return await get_client().get_panelapp_response(
+        ext_url, full_url, raise_errors, raw
+    )
+
+
+async def get_full_results_from_API(data: dict):
+    """ Get all the results from the API call with the default client """
+
+    return await get_client().get_full_results_from_API(data)
+
+
+async def create_panel(
+    panel_id: str, version: str = None, confidence_level: str = "3"
+):
+    """ Return panel object with the default client """
+
+    return await get_client().get_panel(panel_id, version, confidence_level)
+
+
+async def load_panels(panels_to_load: list, confidence_level: str = "3"):
+    """ Build many panel objects with the default client """
+
+    return await get_client().load_panels(panels_to_load, confidence_level)
+
+
+async def get_all_signedoff_panels(confidence_level: str = "3", lazy: bool = False):
+    """ Return signedoff panel objects with the default client """
+
+    return await get_client().get_all_signedoff_panels(confidence_level, lazy)
+
+
+async def get_all_panels(lazy: bool = False):
+    """ Return all panels with the default client """
+
+    return await get_client().get_all_panels(lazy)
+
+
+async def get_signedoff_panel(panel_id: str):
+    """ Return data for the latest version of a signedoff panel with the default client """
+
+    return await get_client().get_signedoff_panel(panel_id)
+
+
+async def compare_versions(original_panel: Panel, compare_version: str):
+    """ Compare the panel with another version with the default client """
+
+    return await get_client().compare_versions(original_panel, compare_version)
@@ -1,6 +1,38 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from . import decode, metrics
+from .cache import CacheEntry, is_immutable_url
+from .ratelimit import ERROR, SUCCESS, THROTTLED
+from .singleflight import SingleFlight
+
+
+BASE_URL = "https://panelapp.genomicsengland.co.uk/api/v1/"
+
+# status codes worth retrying, any other error status is returned straight away
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRIES = 5
+BACKOFF_FACTOR = 0.5
+MAX_BACKOFF = 30
+TIMEOUT = 60
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_rate_limiter = None
+_single_flight = None
+_decoder = decode.get_decoder()
+_typed_panels = False
+
+
+class PanelappError(Exception):
+    """ Raised when a Panelapp API call fails and errors are not silenced """
 
 
 def build_url(path: list, param: dict = None):
@@ -29,38 +61,505 @@ def build_url(path: list, param: dict = None):
     return ext_url
 
 
-def get_panelapp_response(ext_url: str = None, full_url: str = None):
-    """ Make an API query
+def create_session(pool_size: int = 10):
+    """ Create a session keeping connections alive between API calls
+
+    Args:
+        pool_size (int, optional): Maximum number of connections kept open to the API. Use at least the number of threads making calls. Defaults to 10.
+
+    Returns:
+        requests.Session: Session to use for the API calls
+    """
+
+    session = requests.Session()
+    session.headers.update({"Accept": "application/json"})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def get_session():
+    """ Return the session shared by the API calls, creating it if needed
+
+    Returns:
+        requests.Session: Shared session
+    """
+
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+
+    return _session
+
+
+def set_session(session: requests.Session = None):
+    """ Replace the session shared by the API calls
+
+    Args:
+        session (requests.Session, optional): Session to use, a new one is created on next call if None. Defaults to None.
+    """
+
+    global _session
+
+    with _session_lock:
+        _session = session
+
+
+def set_cache(cache=None):
+    """ Set the cache used for the responses of the API calls
+
+    Args:
+        cache (SQLiteCache, FileCache, optional): Cache to use, no caching if None. Defaults to None.
+    """
+
+    global _cache
+
+    _cache = cache
+
+
+def get_cache():
+    """ Return the cache used for the responses of the API calls
+
+    Returns:
+        SQLiteCache, FileCache: Cache in use, None if responses aren't cached
+    """
+
+    return _cache
+
+
+def set_rate_limiter(rate_limiter=None):
+    """ Set the rate limiter shared by the API calls
+
+    Args:
+        rate_limiter (RateLimiter, optional): Rate limiter to use, no limit if None. Defaults to None.
+    """
+
+    global _rate_limiter
+
+    _rate_limiter = rate_limiter
+
+
+def get_rate_limiter():
+    """ Return the rate limiter shared by the API calls
+
+    Returns:
+        RateLimiter: Rate limiter in use, None if calls aren't limited
+    """
+
+    return _rate_limiter
+
+
+def set_single_flight(enabled: bool = True):
+    """ Enable or disable the sharing of identical calls in flight
+
+    Args:
+        enabled (bool, optional): Whether identical calls made at the same time share one API call. Defaults to True.
+    """
+
+    global _single_flight
+
+    _single_flight = SingleFlight() if enabled else None
+
+
+def get_single_flight():
+    """ Return the group of calls in flight, None if single flight is disabled
+
+    Returns:
+        SingleFlight: Group of calls in flight
+    """
+
+    return _single_flight
+
+
+def set_decoder(decoder=None, typed_panels: bool = False):
+    """ Set how the responses of the API calls are parsed
+
+    Args:
+        decoder (str, function, optional): "orjson", "msgspec", "json" or function parsing bytes. Defaults to the fastest one installed.
+        typed_panels (bool, optional): Only keep the fields of the panels that Panel uses, get_data() then returns these fields only. Defaults to False.
+    """
+
+    global _decoder, _typed_panels
+
+    if decoder is None or isinstance(decoder, str):
+        decoder = decode.get_decoder(decoder)
+
+    _decoder = decoder
+    _typed_panels = typed_panels
+
+
+def get_decoder():
+    """ Return the function parsing the responses of the API calls
+
+    Returns:
+        function: Function parsing bytes
+    """
+
+    return _decoder
+
+
+def decode_content(url: str, content: bytes):
+    """ Parse the body of the response with the decoder set
+
+    Args:
+        url (str): URL of the API call
+        content (bytes): Body of the response
+
+    Returns:
+        dict: Data from the API call
+    """
+
+    if _typed_panels and decode.is_panel_url(url):
+        function, args = decode.decode_panel, (content, _decoder)
+    else:
+        function, args = _decoder, (content,)
+
+    if metrics.hooks:
+        return metrics.time_stage("decode", function, *args)
+
+    return function(*args)
+
+
+def get_retry_after(response: requests.Response):
+    """ Return the delay asked by the server in the Retry-After header
+
+    Args:
+        response (requests.Response): Response of the API call
+
+    Returns:
+        float: Delay in seconds, None if the server didn't ask for one
+    """
+
+    retry_after = response.headers.get("Retry-After")
+
+    if retry_after is None:
+        return None
+
+    try:
+        delay = float(retry_after)
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+
+        delay = date.timestamp() - time.time()
+
+    return min(max(delay, 0), MAX_BACKOFF)
+
+
+def get_retry_delay(attempt: int, response: requests.Response = None):
+    """ Return how long to wait before retrying an API call
+
+    The Retry-After header is used if the server sent one, otherwise the delay
+    is an exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Number of the attempt that failed, starting at 0
+        response (requests.Response, optional): Response of the failed attempt. Defaults to None.
+
+    Returns:
+        float: Delay in seconds
+    """
+
+    if response is not None:
+        delay = get_retry_after(response)
+
+        if delay is not None:
+            return delay
+
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF_FACTOR * 2 ** attempt))
+
+
+def send_request(session: requests.Session, url: str, headers: dict):
+    """ Send GET request, waiting for the rate limiter if one is set
+
+    Args:
+        session (requests.Session): Session to use
+        url (str): URL of the API call
+        headers (dict): Headers of the request
+
+    Returns:
+        requests.Response: Response of the API call
+    """
+
+    rate_limiter = _rate_limiter
+
+    if rate_limiter is None:
+        return session.get(url, headers=headers, timeout=TIMEOUT)
+
+    rate_limiter.acquire()
+    start = time.perf_counter()
+    outcome = ERROR
+    retry_after = None
+
+    try:
+        response = session.get(url, headers=headers, timeout=TIMEOUT)
+
+        if response.status_code == 429:
+            outcome = THROTTLED
+            retry_after = get_retry_after(response)
+        elif response.status_code < 500:
+            outcome = SUCCESS
+
+        return response
+    finally:
+        rate_limiter.release(outcome, time.perf_counter() - start, retry_after)
+
+
+def get_url(ext_url: str = None, full_url: str = None):
+    """ Return the URL of the API call
 
     Args:
         ext_url (str, optional): External path for the URL to add to the base URL. Defaults to None.
         full_url (str, optional): Full url to use for the API call. Defaults to None.
 
     Returns:
-        dict: Data from the API call
+        str: Full URL
     """
 
     if full_url:
-        url = full_url
-    else:
-        url = "https://panelapp.genomicsengland.co.uk/api/v1/{}".format(
-            ext_url
-        )
+        return full_url
+
+    return "{}{}".format(BASE_URL, ext_url)
+
+
+def get_panelapp_response(
+    ext_url: str = None, full_url: str = None, raise_errors: bool = False,
+    session: requests.Session = None, retries: int = RETRIES,
+    raw: bool = False
+):
+    """ Make an API query
+
+    Connection errors, timeouts and transient error statuses (429, 503...) are
+    retried with backoff, other error statuses are not.
+
+    If a cache is set, versioned panels are only fetched once and other
+    responses are revalidated with a conditional request once stale.
+
+    If single flight is enabled, identical calls made at the same time by
+    several threads share one API call and its (unmodifiable) result.
+
+    Args:
+        ext_url (str, optional): External path for the URL to add to the base URL. Defaults to None.
+        full_url (str, optional): Full url to use for the API call. Defaults to None.
+        raise_errors (bool, optional): Raise PanelappError instead of printing the error and returning None. Defaults to False.
+        session (requests.Session, optional): Session to use instead of the shared one. Defaults to None.
+        retries (int, optional): Maximum number of attempts. Defaults to 5.
+        raw (bool, optional): Return the body of the response without parsing it. Defaults to False.
+
+    Raises:
+        PanelappError: If the call failed and raise_errors is True
+
+    Returns:
+        dict: Data from the API call, bytes if raw
+    """
+
+    url = get_url(ext_url, full_url)
+    single_flight = _single_flight
+
+    try:
+        if single_flight is not None:
+            return single_flight.do(
+                (url, raw), fetch_data, url, session, retries,
+                not raise_errors, raw
+            )
+
+        return fetch_data(url, session, retries, not raise_errors, raw)
+    except PanelappError as e:
+        if raise_errors:
+            raise
+
+        print(e)
+        return None
+
+
+def fetch_data(
+    url: str, session: requests.Session = None, retries: int = RETRIES,
+    verbose: bool = False, raw: bool = False
+):
+    """ Return data of the API call, going through the cache and retries
+
+    Args:
+        url (str): Full URL of the API call
+        session (requests.Session, optional): Session to use instead of the shared one. Defaults to None.
+        retries (int, optional): Maximum number of attempts. Defaults to 5.
+        verbose (bool, optional): Print the errors of the attempts that are retried. Defaults to False.
+        raw (bool, optional): Return the body of the response without parsing it. Defaults to False.
+
+    Raises:
+        PanelappError: If the call failed
+
+    Returns:
+        dict: Data from the API call, bytes if raw
+    """
+
+    content = fetch_content(url, session, retries, verbose)
+
+    if raw:
+        return content
+
+    return decode_content(url, content)
+
+
+def fetch_content(
+    url: str, session: requests.Session = None, retries: int = RETRIES,
+    verbose: bool = False
+):
+    """ Return body of the response of the API call, going through the cache
+    and retries
+
+    Args:
+        url (str): Full URL of the API call
+        session (requests.Session, optional): Session to use instead of the shared one. Defaults to None.
+        retries (int, optional): Maximum number of attempts. Defaults to 5.
+        verbose (bool, optional): Print the errors of the attempts that are retried. Defaults to False.
+
+    Raises:
+        PanelappError: If the call failed
+
+    Returns:
+        bytes: Body of the response
+    """
+
+    if session is None:
+        session = get_session()
+
+    cache = _cache
+    entry = None
+    headers = {}
+
+    if cache is not None:
+        entry = cache.get(url)
+
+        if entry is not None:
+            if entry.is_fresh(cache.ttl):
+                if metrics.hooks:
+                    metrics.emit("cache", url=url, result="hit")
+
+                return entry.content
+
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+    error = None
+
+    for attempt in range(0, retries):
+        response = None
+        start = time.perf_counter()
 
-    for i in range(0, 5):
         try:
-            request = requests.get(url, headers={"Accept": "application/json"})
-        except Exception as e:
-            print("Something went wrong: {}".format(e))
+            response = send_request(session, url, headers)
+        except requests.RequestException as e:
+            error = "Something went wrong: {}".format(e)
         else:
-            if request.ok:
-                data = json.loads(request.content.decode("utf-8"))
-                return data
+            if response.ok:
+                error = None
             else:
-                print("Error {} for URL: {}".format(request.status_code, url))
-                return None
+                error = "Error {} for URL: {}".format(
+                    response.status_code, url
+                )
+
+        if metrics.hooks:
+            metrics.emit(
+                "request", url=url,
+                status=None if response is None else response.status_code,
+                latency=time.perf_counter() - start,
+                bytes=0 if response is None else len(response.content),
+                attempt=attempt, error=error
+            )
+
+        if response is not None:
+            if response.status_code == 304 and entry is not None:
+                cache.touch(url)
+
+                if metrics.hooks:
+                    metrics.emit("cache", url=url, result="revalidated")
+
+                return entry.content
+
+            if response.ok:
+                if cache is not None:
+                    cache.set(url, CacheEntry(
+                        response.content,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                        immutable=is_immutable_url(url)
+                    ))
 
-    return None
+                    if metrics.hooks:
+                        metrics.emit("cache", url=url, result="miss")
+
+                return response.content
+
+            if response.status_code not in TRANSIENT_STATUS_CODES:
+                raise PanelappError(error)
+
+        if attempt < retries - 1:
+            if verbose:
+                print("{}, retrying".format(error))
+
+            time.sleep(get_retry_delay(attempt, response))
+
+    raise PanelappError(error)
+
+
+def iter_full_results_from_API(data: dict, prefetch: bool = True):
+    """ Yield the results of every page of the API call
+
+    Results are yielded as soon as their page arrives and, with prefetch, the
+    next page is fetched in the background while the current one is consumed.
+    Only two pages are held in memory at any time.
+
+    Args:
+        data (dict): Dict output from the API call
+        prefetch (bool, optional): Fetch the next page while the current one is consumed. Defaults to True.
+
+    Raises:
+        PanelappError: If one of the next pages couldn't be retrieved
+
+    Yields:
+        dict: Data of each result
+    """
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    try:
+        while True:
+            next_url = data["next"]
+            next_page = None
+
+            if next_url and executor:
+                next_page = executor.submit(
+                    get_panelapp_response, full_url=next_url,
+                    raise_errors=True
+                )
+
+            results = data["results"]
+            data = None
+
+            for result in results:
+                yield result
+
+            if not next_url:
+                break
+            elif next_page:
+                data = next_page.result()
+            else:
+                data = get_panelapp_response(
+                    full_url=next_url, raise_errors=True
+                )
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
 
 
 def get_full_results_from_API(data: dict):
@@ -77,20 +576,4 @@ def get_full_results_from_API(data: dict):
         list: Data of every page
     """
 
-    res = []
-
-    while True:
-        res.append(data["results"])
-
-        if not data["next"]:
-            break
-        else:
-            data = get_panelapp_response(full_url=data["next"])
-
-    flat_list = []
-
-    for sublist in res:
-        for item in sublist:
-            flat_list.append(item)
-
-    return flat_list
+    return list(iter_full_results_from_API(data))
@@ -0,0 +1,478 @@
+""" Persistent caches for the responses of the Panelapp API
+
+Responses are keyed on the full URL of the API call. Versioned panel URLs
+(panels/<id>?version=<version>) never change so they are kept until evicted,
+other URLs are considered fresh for a given time and are revalidated with a
+conditional request (ETag/Last-Modified) once stale.
+
+PanelCache keeps parsed Panel objects in memory instead, see Panel.get.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+VERSIONED_PANEL_PATH = re.compile(r"/panels/\d+/?$")
+
+
+def is_immutable_url(url: str):
+    """ Return whether the URL points to a versioned panel snapshot
+
+    Args:
+        url (str): URL of the API call
+
+    Returns:
+        bool: True if the response of the URL never changes
+    """
+
+    parsed = urlparse(url)
+
+    return bool(
+        VERSIONED_PANEL_PATH.search(parsed.path) and
+        parse_qs(parsed.query).get("version")
+    )
+
+
+class CacheEntry():
+    def __init__(
+        self, content: bytes, etag: str = None, last_modified: str = None,
+        stored_at: float = None, immutable: bool = False
+    ):
+        """ Initialise cached response
+
+        Args:
+            content (bytes): Body of the response
+            etag (str, optional): ETag header of the response. Defaults to None.
+            last_modified (str, optional): Last-Modified header of the response. Defaults to None.
+            stored_at (float, optional): Time the response was stored or revalidated. Defaults to now.
+            immutable (bool, optional): Whether the response never changes. Defaults to False.
+        """
+
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+        self.immutable = immutable
+
+    def is_fresh(self, ttl: float):
+        """ Return whether the entry can be used without revalidation
+
+        Args:
+            ttl (float): Seconds during which mutable entries are fresh
+
+        Returns:
+            bool: True if the entry can be used as is
+        """
+
+        return self.immutable or time.time() - self.stored_at < ttl
+
+    def get_metadata(self):
+        """ Return the data of the entry apart from the content
+
+        Returns:
+            dict: Metadata of the entry
+        """
+
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "stored_at": self.stored_at,
+            "immutable": self.immutable,
+        }
+
+
+class SQLiteCache():
+    def __init__(
+        self, path: str = "panelapp_cache.sqlite", ttl: float = 3600,
+        max_size: int = 1024 ** 3
+    ):
+        """ Initialise cache stored in a SQLite database
+
+        Args:
+            path (str, optional): Path of the database. Defaults to "panelapp_cache.sqlite".
+            ttl (float, optional): Seconds during which unversioned responses are used without revalidation. Defaults to 3600.
+            max_size (int, optional): Maximum size in bytes of the cached responses, least recently used ones are evicted first. Defaults to 1 GiB.
+        """
+
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, content BLOB, etag TEXT, "
+            "last_modified TEXT, stored_at REAL, accessed_at REAL, "
+            "immutable INTEGER, size INTEGER)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+            "ON responses (accessed_at)"
+        )
+
+    def get(self, url: str):
+        """ Return cached response for the URL
+
+        Args:
+            url (str): URL of the API call
+
+        Returns:
+            CacheEntry: Cached response, None if not cached
+        """
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT content, etag, last_modified, stored_at, immutable "
+                "FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (time.time(), url)
+            )
+
+        content, etag, last_modified, stored_at, immutable = row
+
+        return CacheEntry(
+            content, etag, last_modified, stored_at, bool(immutable)
+        )
+
+    def set(self, url: str, entry: CacheEntry):
+        """ Store response for the URL and evict old responses if needed
+
+        Args:
+            url (str): URL of the API call
+            entry (CacheEntry): Response to store
+        """
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url, entry.content, entry.etag, entry.last_modified,
+                    entry.stored_at, time.time(), int(entry.immutable),
+                    len(entry.content)
+                )
+            )
+            self.evict()
+
+    def touch(self, url: str):
+        """ Mark the response for the URL as revalidated
+
+        Args:
+            url (str): URL of the API call
+        """
+
+        with self.lock:
+            now = time.time()
+            self.connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? "
+                "WHERE url = ?", (now, now, url)
+            )
+
+    def evict(self):
+        """ Delete least recently used responses until the cache fits in max_size """
+
+        total, = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+        if total <= self.max_size:
+            return
+
+        rows = self.connection.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        to_delete = []
+
+        for url, size in rows:
+            if total <= self.max_size:
+                break
+
+            to_delete.append((url,))
+            total -= size
+
+        self.connection.executemany(
+            "DELETE FROM responses WHERE url = ?", to_delete
+        )
+
+    def clear(self):
+        """ Delete all cached responses """
+
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+
+    def close(self):
+        """ Close the database """
+
+        with self.lock:
+            self.connection.close()
+
+
+class FileCache():
+    def __init__(
+        self, path: str = "panelapp_cache", ttl: float = 3600,
+        max_size: int = 1024 ** 3
+    ):
+        """ Initialise cache storing every response in its own file
+
+        Args:
+            path (str, optional): Folder where to store the responses. Defaults to "panelapp_cache".
+            ttl (float, optional): Seconds during which unversioned responses are used without revalidation. Defaults to 3600.
+            max_size (int, optional): Maximum size in bytes of the cached responses, least recently used ones are evicted first. Defaults to 1 GiB.
+        """
+
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.size = sum(
+            file.stat().st_size for file in self.path.glob("*.body")
+        )
+
+    def get_paths(self, url: str):
+        """ Return paths of the files storing the response for the URL
+
+        Args:
+            url (str): URL of the API call
+
+        Returns:
+            tuple: Path of the body and path of the metadata
+        """
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+        return (
+            self.path / "{}.body".format(key),
+            self.path / "{}.meta".format(key)
+        )
+
+    def get(self, url: str):
+        """ Return cached response for the URL
+
+        Args:
+            url (str): URL of the API call
+
+        Returns:
+            CacheEntry: Cached response, None if not cached
+        """
+
+        body_path, meta_path = self.get_paths(url)
+
+        try:
+            with open(meta_path) as f:
+                metadata = json.load(f)
+
+            with open(body_path, "rb") as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+
+        # the modification time of the body is used as access time for LRU
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+
+        return CacheEntry(content, **metadata)
+
+    def set(self, url: str, entry: CacheEntry):
+        """ Store response for the URL and evict old responses if needed
+
+        Args:
+            url (str): URL of the API call
+            entry (CacheEntry): Response to store
+        """
+
+        body_path, meta_path = self.get_paths(url)
+
+        with self.lock:
+            if body_path.exists():
+                self.size -= body_path.stat().st_size
+
+            self.write(body_path, entry.content)
+            self.write(
+                meta_path, json.dumps(entry.get_metadata()).encode("utf-8")
+            )
+            self.size += len(entry.content)
+            self.evict()
+
+    def touch(self, url: str):
+        """ Mark the response for the URL as revalidated
+
+        Args:
+            url (str): URL of the API call
+        """
+
+        entry = self.get(url)
+
+        if entry:
+            entry.stored_at = time.time()
+            body_path, meta_path = self.get_paths(url)
+            self.write(
+                meta_path, json.dumps(entry.get_metadata()).encode("utf-8")
+            )
+
+    def write(self, path: Path, content: bytes):
+        """ Write file atomically so that readers never see partial files
+
+        Args:
+            path (Path): Path of the file
+            content (bytes): Content of the file
+        """
+
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path), suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+
+        os.replace(tmp_path, str(path))
+
+    def evict(self):
+        """ Delete least recently used responses until the cache fits in max_size """
+
+        if self.size <= self.max_size:
+            return
+
+        bodies = []
+
+        for body_path in self.path.glob("*.body"):
+            try:
+                stat = body_path.stat()
+            except OSError:
+                continue
+
+            bodies.append((stat.st_mtime, stat.st_size, body_path))
+
+        for mtime, size, body_path in sorted(bodies, key=lambda x: x[0]):
+            if self.size <= self.max_size:
+                break
+
+            for path in (body_path, body_path.with_suffix(".meta")):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+            self.size -= size
+
+    def clear(self):
+        """ Delete all cached responses """
+
+        with self.lock:
+            for path in self.path.iterdir():
+                if path.suffix in (".body", ".meta", ".tmp"):
+                    path.unlink()
+
+            self.size = 0
+
+    def close(self):
+        """ Nothing to close, present to match SQLiteCache """
+
+
+class PanelCache():
+    def __init__(
+        self, max_panels: int = 256, max_size: int = 256 * 1024 ** 2
+    ):
+        """ Initialise in-memory cache of parsed panels
+
+        Panels are keyed on (panel_id, version, confidence_level) and never
+        change, the least recently used ones are evicted first. The latest
+        version of each panel is known by panelapp.probe.
+
+        Args:
+            max_panels (int, optional): Maximum number of panels kept. Defaults to 256.
+            max_size (int, optional): Maximum size in bytes of the panels kept, measured as the size of their API responses. Defaults to 256 MiB.
+        """
+
+        self.max_panels = max_panels
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # {(panel_id, version, confidence_level): (Panel, size)}
+        self.panels = OrderedDict()
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, panel_id: str, version: str, confidence_level: str = "3"):
+        """ Return cached panel
+
+        Args:
+            panel_id (str): Panel id
+            version (str): Version of the panel
+            confidence_level (str, optional): Confidence level. Defaults to "3".
+
+        Returns:
+            Panel: Panel object, None if not cached
+        """
+
+        key = (str(panel_id), version, confidence_level)
+
+        with self.lock:
+            if key not in self.panels:
+                self.stats["misses"] += 1
+                return None
+
+            self.panels.move_to_end(key)
+            self.stats["hits"] += 1
+
+            return self.panels[key][0]
+
+    def set(self, panel, size: int):
+        """ Store the panel and evict old panels if needed
+
+        Args:
+            panel (Panel): Loaded panel object
+            size (int): Size in bytes of the API response of the panel, used as estimate of its size
+        """
+
+        key = (panel.get_id(), panel.get_version(), panel.confidence_level)
+
+        with self.lock:
+            if key in self.panels:
+                self.size -= self.panels.pop(key)[1]
+
+            self.panels[key] = (panel, size)
+            self.size += size
+            self.evict()
+
+    def evict(self):
+        """ Remove least recently used panels until the cache fits in its limits """
+
+        while self.panels and (
+            len(self.panels) > self.max_panels or self.size > self.max_size
+        ):
+            self.size -= self.panels.popitem(last=False)[1][1]
+            self.stats["evictions"] += 1
+
+    def get_stats(self):
+        """ Return hit and miss counts and the content of the cache
+
+        Returns:
+            dict: Dict with hits, misses, evictions, panels and size (bytes)
+        """
+
+        with self.lock:
+            return dict(self.stats, panels=len(self.panels), size=self.size)
+
+    def clear(self):
+        """ Remove all the panels, statistics are kept """
+
+        with self.lock:
+            self.panels.clear()
+            self.size = 0
@@ -0,0 +1,375 @@
+""" Columnar views of the entities of many panels
+
+EntityTable holds one row per gene, STR and region of a collection of
+panels in NumPy arrays. Panel ids, entity types, chromosomes, hgnc ids and
+symbols are categorical (integer codes and their categories) so that
+filters and set operations across panels run on integer arrays instead of
+looping over the panels.
+
+    table = columnar.build_table(panels)
+    green = table.filter(confidence_levels=(3,), entity_types=("gene",))
+    shared = green.intersection()
+    df = table.to_dataframe()
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError(
+        "numpy is needed for the columnar views: pip install numpy"
+    )
+
+
+COORDINATE_COLUMNS = (
+    "grch37_start", "grch37_end", "grch38_start", "grch38_end"
+)
+COLUMNS = (
+    "panel_id", "version", "entity_type", "entity_name", "confidence_level",
+    "chromosome", "hgnc_id", "symbol"
+) + COORDINATE_COLUMNS
+CATEGORICAL_COLUMNS = (
+    "panel_id", "entity_type", "chromosome", "hgnc_id", "symbol"
+)
+# missing coordinates and missing categories
+MISSING = -1
+
+
+def encode(values: list):
+    """ Return categorical encoding of the values, in order of appearance
+
+    Args:
+        values (list): Values, None for missing values
+
+    Returns:
+        tuple: Array of int32 codes (MISSING for None) and object array of the categories
+    """
+
+    categories = {None: MISSING}
+    codes = np.fromiter(
+        (
+            categories.setdefault(value, len(categories) - 1)
+            for value in values
+        ),
+        dtype=np.int32, count=len(values)
+    )
+    del categories[None]
+
+    return codes, np.array(list(categories), dtype=object)
+
+
+def build_table(panels, confidence_levels: tuple = (0, 1, 2, 3)):
+    """ Return table of the genes, STRs and regions of the panels
+
+    Args:
+        panels (iterable): Panel objects or dict {panel_id: Panel}
+        confidence_levels (tuple, optional): Confidence levels of the entities to keep. Defaults to (0, 1, 2, 3).
+
+    Returns:
+        EntityTable: Table of the entities
+    """
+
+    if isinstance(panels, dict):
+        panels = panels.values()
+
+    levels = {str(level) for level in confidence_levels}
+    columns = {column: [] for column in COLUMNS}
+    # rows are appended column by column, the order of the panels is kept
+    append = {column: values.append for column, values in columns.items()}
+
+    for panel in panels:
+        panel_id = panel.get_id()
+        version = panel.get_version()
+
+        for level in sorted(levels & set(panel.genes), reverse=True):
+            for gene in panel.genes[level]:
+                append["panel_id"](panel_id)
+                append["version"](version)
+                append["entity_type"]("gene")
+                append["entity_name"](gene.symbol)
+                append["confidence_level"](int(level))
+                append["chromosome"](None)
+                append["hgnc_id"](gene.hgnc_id)
+                append["symbol"](gene.symbol)
+
+                for column in COORDINATE_COLUMNS:
+                    append[column](MISSING)
+
+        for entity_type, entities in (
+            ("str", panel.get_strs()), ("cnv", panel.get_cnvs())
+        ):
+            for entity in entities:
+                if entity.confidence_level not in levels:
+                    continue
+
+                append["panel_id"](panel_id)
+                append["version"](version)
+                append["entity_type"](entity_type)
+                append["entity_name"](entity.entity_name)
+                append["confidence_level"](int(entity.confidence_level))
+                append["chromosome"](entity.chromosome)
+                append["hgnc_id"](getattr(entity, "hgnc_id", None))
+                append["symbol"](getattr(entity, "gene_symbol", None))
+
+                for column in COORDINATE_COLUMNS:
+                    value = getattr(entity, column)
+                    append[column](MISSING if value is None else value)
+
+    arrays = {}
+    categories = {}
+
+    for column in CATEGORICAL_COLUMNS:
+        arrays[column], categories[column] = encode(columns[column])
+
+    for column in COORDINATE_COLUMNS:
+        arrays[column] = np.array(columns[column], dtype=np.int64)
+
+    arrays["confidence_level"] = np.array(
+        columns["confidence_level"], dtype=np.int8
+    )
+    arrays["version"] = np.array(columns["version"], dtype=object)
+    arrays["entity_name"] = np.array(columns["entity_name"], dtype=object)
+
+    return EntityTable(
+        {column: arrays[column] for column in COLUMNS}, categories
+    )
+
+
+class EntityTable():
+    def __init__(self, columns: dict, categories: dict):
+        """ Initialise table from its columns
+
+        Args:
+            columns (dict): Dict {column: numpy array} following COLUMNS, categorical columns hold codes and missing coordinates are MISSING
+            categories (dict): Dict {categorical column: object array of the categories}
+        """
+
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.columns["panel_id"])
+
+    def __getitem__(self, column: str):
+        """ Return column, decoded if categorical
+
+        Args:
+            column (str): Name of the column
+
+        Returns:
+            numpy.ndarray: Values of the column, None for missing categories
+        """
+
+        if column in self.categories:
+            return self.decode(column, self.columns[column])
+
+        return self.columns[column]
+
+    def decode(self, column: str, codes):
+        """ Return values of the codes of a categorical column
+
+        Args:
+            column (str): Name of the categorical column
+            codes (numpy.ndarray): Codes
+
+        Returns:
+            numpy.ndarray: Object array of the values, None for missing codes
+        """
+
+        # one more category at the end for MISSING (-1)
+        categories = np.append(self.categories[column], None)
+
+        return categories[codes]
+
+    def get_code(self, column: str, value):
+        """ Return code of a value of a categorical column
+
+        Args:
+            column (str): Name of the categorical column
+            value: Value
+
+        Returns:
+            int: Code, MISSING if the value isn't in the table
+        """
+
+        matches = np.flatnonzero(self.categories[column] == value)
+
+        return int(matches[0]) if len(matches) else MISSING
+
+    def select(self, mask):
+        """ Return table with the rows selected by the mask
+
+        Args:
+            mask (numpy.ndarray): Boolean array or indices of the rows
+
+        Returns:
+            EntityTable: Table sharing the categories of this one
+        """
+
+        return EntityTable(
+            {column: values[mask] for column, values in self.columns.items()},
+            self.categories
+        )
+
+    def filter(
+        self, confidence_levels: tuple = None, entity_types: tuple = None,
+        panel_ids: tuple = None
+    ):
+        """ Return the rows matching all the criteria given
+
+        Args:
+            confidence_levels (tuple, optional): Confidence levels as int. Defaults to None.
+            entity_types (tuple, optional): "gene", "str" and/or "cnv". Defaults to None.
+            panel_ids (tuple, optional): Panel ids. Defaults to None.
+
+        Returns:
+            EntityTable: Filtered table
+        """
+
+        mask = np.ones(len(self), dtype=bool)
+
+        if confidence_levels is not None:
+            mask &= np.isin(
+                self.columns["confidence_level"],
+                [int(level) for level in confidence_levels]
+            )
+
+        for column, values in (
+            ("entity_type", entity_types), ("panel_id", panel_ids)
+        ):
+            if values is not None:
+                codes = [
+                    self.get_code(column, str(value)) for value in values
+                ]
+                mask &= np.isin(self.columns[column], [
+                    code for code in codes if code != MISSING
+                ])
+
+        return self.select(mask)
+
+    def get_panel_sets(self, key: str = "hgnc_id", panel_ids: tuple = None):
+        """ Return unique (panel code, entity code) pairs, the base of the set operations
+
+        Args:
+            key (str, optional): Categorical column identifying the entities. Defaults to "hgnc_id".
+            panel_ids (tuple, optional): Panels to use. Defaults to all the panels of the table.
+
+        Returns:
+            tuple: Array of (panel code, entity code) rows and number of panels
+        """
+
+        table = self if panel_ids is None else self.filter(panel_ids=panel_ids)
+        present = table.columns[key] != MISSING
+        pairs = np.unique(
+            np.stack(
+                [table.columns["panel_id"][present], table.columns[key][present]],
+                axis=1
+            ),
+            axis=0
+        )
+
+        return pairs, len(np.unique(table.columns["panel_id"]))
+
+    def intersection(self, key: str = "hgnc_id", panel_ids: tuple = None):
+        """ Return the entities present in every panel
+
+        Args:
+            key (str, optional): Categorical column identifying the entities. Defaults to "hgnc_id".
+            panel_ids (tuple, optional): Panels to use. Defaults to all the panels of the table.
+
+        Returns:
+            numpy.ndarray: Values of the key
+        """
+
+        pairs, nb_panels = self.get_panel_sets(key, panel_ids)
+        counts = np.bincount(pairs[:, 1], minlength=len(self.categories[key]))
+
+        return self.categories[key][(counts == nb_panels) & (counts > 0)]
+
+    def union(self, key: str = "hgnc_id", panel_ids: tuple = None):
+        """ Return the entities present in any panel
+
+        Args:
+            key (str, optional): Categorical column identifying the entities. Defaults to "hgnc_id".
+            panel_ids (tuple, optional): Panels to use. Defaults to all the panels of the table.
+
+        Returns:
+            numpy.ndarray: Values of the key
+        """
+
+        pairs, nb_panels = self.get_panel_sets(key, panel_ids)
+
+        return self.categories[key][np.unique(pairs[:, 1])]
+
+    def difference(self, panel_id, other_panel_id, key: str = "hgnc_id"):
+        """ Return the entities of a panel absent from another one
+
+        Args:
+            panel_id: Panel id
+            other_panel_id: Panel id of the panel to remove
+            key (str, optional): Categorical column identifying the entities. Defaults to "hgnc_id".
+
+        Returns:
+            numpy.ndarray: Values of the key
+        """
+
+        codes = []
+
+        for value in (panel_id, other_panel_id):
+            code = self.get_code("panel_id", str(value))
+            codes.append(self.columns[key][
+                (self.columns["panel_id"] == code) &
+                (self.columns[key] != MISSING)
+            ])
+
+        return self.categories[key][np.setdiff1d(codes[0], codes[1])]
+
+    def count_panels(self, key: str = "hgnc_id"):
+        """ Return in how many panels each entity is
+
+        Args:
+            key (str, optional): Categorical column identifying the entities. Defaults to "hgnc_id".
+
+        Returns:
+            dict: Dict {value: number of panels}
+        """
+
+        pairs, nb_panels = self.get_panel_sets(key)
+        counts = np.bincount(pairs[:, 1], minlength=len(self.categories[key]))
+
+        return {
+            value: int(count)
+            for value, count in zip(self.categories[key], counts)
+            if count
+        }
+
+    def to_dataframe(self):
+        """ Return the table as a pandas DataFrame with categorical columns
+
+        Missing coordinates become <NA> in nullable integer columns.
+
+        Returns:
+            pandas.DataFrame: One row per entity
+        """
+
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError(
+                "pandas is needed to build DataFrames: pip install pandas"
+            )
+
+        data = {}
+
+        for column, values in self.columns.items():
+            if column in self.categories:
+                data[column] = pd.Categorical.from_codes(
+                    values, categories=self.categories[column]
+                )
+            elif column in COORDINATE_COLUMNS:
+                data[column] = pd.array(
+                    np.where(values == MISSING, None, values), dtype="Int64"
+                )
+            else:
+                data[column] = values
+
+        return pd.DataFrame(data)
@@ -0,0 +1,220 @@
+""" Decoding of the API responses
+
+The responses are parsed straight from the bytes received, with orjson or
+msgspec when they are installed and the json module otherwise.
+
+decode_panel only keeps the fields of a panel that Panel uses. With msgspec
+the other fields are skipped while parsing, without building them at all;
+without it they are dropped after a full parse.
+"""
+
+import json
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+from .cache import VERSIONED_PANEL_PATH
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+# None keeps the value as is, a dict keeps the fields of an object and a list
+# of one dict keeps the fields of every object of an array
+SUBPANEL_FIELDS = {
+    "id": None, "hash_id": None, "name": None, "version": None,
+    "relevant_disorders": None
+}
+GENE_DATA_FIELDS = {
+    "hgnc_symbol": None, "hgnc_id": None, "ensembl_genes": None
+}
+PANEL_FIELDS = {
+    "id": None,
+    "name": None,
+    "hash_id": None,
+    "version": None,
+    "signed_off": None,
+    "relevant_disorders": None,
+    "stats": None,
+    "genes": [{
+        "entity_name": None,
+        "confidence_level": None,
+        "gene_data": GENE_DATA_FIELDS,
+        "panel": SUBPANEL_FIELDS,
+    }],
+    "strs": [{
+        "entity_name": None,
+        "confidence_level": None,
+        "chromosome": None,
+        "grch37_coordinates": None,
+        "grch38_coordinates": None,
+        "repeated_sequence": None,
+        "normal_repeats": None,
+        "pathogenic_repeats": None,
+        "gene_data": GENE_DATA_FIELDS,
+        "panel": SUBPANEL_FIELDS,
+    }],
+    "regions": [{
+        "entity_name": None,
+        "verbose_name": None,
+        "confidence_level": None,
+        "chromosome": None,
+        "grch37_coordinates": None,
+        "grch38_coordinates": None,
+        "type_of_variants": None,
+        "haploinsufficiency_score": None,
+        "triplosensitivity_score": None,
+        "required_overlap_percentage": None,
+        "panel": SUBPANEL_FIELDS,
+    }],
+}
+
+
+def loads_json(content: bytes):
+    """ Parse JSON bytes with the json module
+
+    Args:
+        content (bytes): Body of the response
+
+    Returns:
+        Parsed data
+    """
+
+    return json.loads(content)
+
+
+DECODERS = {"json": loads_json}
+
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+
+if msgspec is not None:
+    DECODERS["msgspec"] = msgspec.json.Decoder().decode
+
+
+def get_decoder(name: str = None):
+    """ Return the function parsing JSON bytes
+
+    Args:
+        name (str, optional): "orjson", "msgspec" or "json". Defaults to the fastest one installed.
+
+    Raises:
+        ValueError: If the decoder isn't installed
+
+    Returns:
+        function: Function parsing bytes
+    """
+
+    if name is None:
+        for name in ("orjson", "msgspec", "json"):
+            if name in DECODERS:
+                break
+
+    if name not in DECODERS:
+        raise ValueError(
+            "{} isn't installed, choose among: {}".format(
+                name, ", ".join(sorted(DECODERS))
+            )
+        )
+
+    return DECODERS[name]
+
+
+def is_panel_url(url: str):
+    """ Return whether the URL points to the data of one panel
+
+    Args:
+        url (str): URL of the API call
+
+    Returns:
+        bool: True for panels/<id> URLs, with or without version
+    """
+
+    return bool(VERSIONED_PANEL_PATH.search(urlparse(url).path))
+
+
+def get_typed_dict(name: str, fields: dict):
+    """ Return TypedDict matching the fields, used by msgspec to skip the others
+
+    Args:
+        name (str): Name of the TypedDict
+        fields (dict): Fields as in PANEL_FIELDS
+
+    Returns:
+        type: TypedDict class
+    """
+
+    # msgspec needs python 3.8+, like TypedDict
+    from typing import TypedDict
+
+    annotations = {}
+
+    for field, sub_fields in fields.items():
+        if sub_fields is None:
+            annotations[field] = Any
+        elif isinstance(sub_fields, list):
+            annotations[field] = Optional[List[
+                get_typed_dict(name + field.title(), sub_fields[0])
+            ]]
+        else:
+            annotations[field] = Optional[
+                get_typed_dict(name + field.title(), sub_fields)
+            ]
+
+    return TypedDict(name, annotations, total=False)
+
+
+def select_fields(data, fields):
+    """ Return copy of the data with only the fields given
+
+    Args:
+        data: Parsed data
+        fields (dict, list, None): Fields as in PANEL_FIELDS
+
+    Returns:
+        Data with only the fields given
+    """
+
+    if fields is None or data is None:
+        return data
+
+    if isinstance(fields, list):
+        return [select_fields(element, fields[0]) for element in data]
+
+    return {
+        field: select_fields(data[field], sub_fields)
+        for field, sub_fields in fields.items()
+        if field in data
+    }
+
+
+if msgspec is not None:
+    _panel_decoder = msgspec.json.Decoder(
+        get_typed_dict("PanelData", PANEL_FIELDS)
+    )
+else:
+    _panel_decoder = None
+
+
+def decode_panel(content: bytes, decoder=None):
+    """ Parse the data of a panel, keeping only the fields that Panel uses
+
+    Args:
+        content (bytes): Body of the response for a panel
+        decoder (function, optional): Function parsing the bytes if msgspec isn't installed. Defaults to the fastest one installed.
+
+    Returns:
+        dict: Data of the panel
+    """
+
+    if _panel_decoder is not None:
+        return _panel_decoder.decode(content)
+
+    return select_fields((decoder or get_decoder())(content), PANEL_FIELDS)
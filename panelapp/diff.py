@@ -0,0 +1,283 @@
+""" Diff of genes, STRs and regions across versions of a panel
+
+Every version is fetched once, concurrently, and kept by PanelHistory so
+that consecutive versions can be diffed in linear time.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .queries import fetch_panel, get_panel_versions, version_key
+
+
+ENTITY_TYPES = ("gene", "str", "region")
+
+
+class EntityChange():
+    def __init__(
+        self, entity_type: str, entity_name: str, change: str,
+        old_level: str = None, new_level: str = None
+    ):
+        """ Initialise change of an entity between two versions
+
+        Args:
+            entity_type (str): "gene", "str" or "region"
+            entity_name (str): Hgnc id for genes, entity name otherwise
+            change (str): "added", "removed", "promoted" or "demoted"
+            old_level (str, optional): Confidence level in the old version. Defaults to None.
+            new_level (str, optional): Confidence level in the new version. Defaults to None.
+        """
+
+        self.entity_type = entity_type
+        self.entity_name = entity_name
+        self.change = change
+        self.old_level = old_level
+        self.new_level = new_level
+
+    def __eq__(self, other):
+        return isinstance(other, EntityChange) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return "EntityChange({}, {}, {}, {} -> {})".format(
+            self.entity_type, self.entity_name, self.change, self.old_level,
+            self.new_level
+        )
+
+
+class VersionDiff():
+    def __init__(
+        self, panel_id: str, old_version: str, new_version: str,
+        changes: list
+    ):
+        """ Initialise changes between two versions of a panel
+
+        Args:
+            panel_id (str): Panel id
+            old_version (str): Old version
+            new_version (str): New version
+            changes (list): List of EntityChange
+        """
+
+        self.panel_id = panel_id
+        self.old_version = old_version
+        self.new_version = new_version
+        self.changes = changes
+
+    def get_changes(self, entity_type: str = None, change: str = None):
+        """ Return changes filtered by entity type and/or type of change
+
+        Args:
+            entity_type (str, optional): "gene", "str" or "region". Defaults to None.
+            change (str, optional): "added", "removed", "promoted" or "demoted". Defaults to None.
+
+        Returns:
+            list: List of EntityChange
+        """
+
+        return [
+            entity_change
+            for entity_change in self.changes
+            if entity_type in (None, entity_change.entity_type)
+            and change in (None, entity_change.change)
+        ]
+
+    def __str__(self):
+        return "{}: {} -> {}; {} changes".format(
+            self.panel_id, self.old_version, self.new_version,
+            len(self.changes)
+        )
+
+
+def get_entity_levels(panel):
+    """ Return the confidence level of every entity of the panel
+
+    Entities present several times (superpanels) get their highest level.
+
+    Args:
+        panel (Panel): Panel object
+
+    Returns:
+        dict: Dict {entity_type: {entity_name: confidence_level}}
+    """
+
+    levels = {}
+
+    for entity_type, entities, key in (
+        ("gene", panel.get_genes(0, 1, 2, 3), "hgnc_id"),
+        ("str", panel.get_strs(), "entity_name"),
+        ("region", panel.get_cnvs(), "entity_name"),
+    ):
+        entity_levels = levels[entity_type] = {}
+
+        for entity in entities:
+            name = entity[key]
+            level = entity["confidence_level"]
+
+            if entity_levels.get(name, "") < level:
+                entity_levels[name] = level
+
+    return levels
+
+
+def diff_panels(old_panel, new_panel):
+    """ Return changes of the entities between two panel objects
+
+    Args:
+        old_panel (Panel): Panel object of the old version
+        new_panel (Panel): Panel object of the new version
+
+    Returns:
+        VersionDiff: Changes between the two versions
+    """
+
+    old_levels = get_entity_levels(old_panel)
+    new_levels = get_entity_levels(new_panel)
+    changes = []
+
+    for entity_type in ENTITY_TYPES:
+        old_entities = old_levels[entity_type]
+        new_entities = new_levels[entity_type]
+
+        for name, old_level in old_entities.items():
+            new_level = new_entities.get(name)
+
+            if new_level is None:
+                change = "removed"
+            elif new_level > old_level:
+                change = "promoted"
+            elif new_level < old_level:
+                change = "demoted"
+            else:
+                continue
+
+            changes.append(
+                EntityChange(entity_type, name, change, old_level, new_level)
+            )
+
+        for name, new_level in new_entities.items():
+            if name not in old_entities:
+                changes.append(
+                    EntityChange(entity_type, name, "added", None, new_level)
+                )
+
+    return VersionDiff(
+        new_panel.get_id(), old_panel.get_version(), new_panel.get_version(),
+        changes
+    )
+
+
+class PanelHistory():
+    def __init__(
+        self, panel_id: str, confidence_level: str = "3", max_workers: int = 8
+    ):
+        """ Initialise version history of a panel
+
+        Args:
+            panel_id (str): Panel id
+            confidence_level (str, optional): Confidence level of the panel objects. Defaults to "3".
+            max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 8.
+        """
+
+        self.id = str(panel_id)
+        self.confidence_level = confidence_level
+        self.max_workers = max_workers
+        self.snapshots = {}
+        self.versions = None
+
+    def get_versions(self, start: str = None, end: str = None):
+        """ Return the versions of the panel, optionally within a range
+
+        Args:
+            start (str, optional): First version to return. Defaults to None.
+            end (str, optional): Last version to return. Defaults to None.
+
+        Returns:
+            list: Versions sorted from oldest to latest
+        """
+
+        if self.versions is None:
+            self.versions = get_panel_versions(self.id)
+
+        return [
+            version
+            for version in self.versions
+            if (start is None or version_key(version) >= version_key(start))
+            and (end is None or version_key(version) <= version_key(end))
+        ]
+
+    def get_snapshots(self, versions: list):
+        """ Return panel objects for the versions, fetching missing ones concurrently
+
+        Args:
+            versions (list): Versions to get
+
+        Raises:
+            PanelappError: If one of the versions couldn't be retrieved
+
+        Returns:
+            list: Panel objects in the order of the versions given
+        """
+
+        missing = [
+            version for version in dict.fromkeys(versions)
+            if version not in self.snapshots
+        ]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                panels = executor.map(
+                    lambda version: fetch_panel(
+                        self.id, version, self.confidence_level
+                    ),
+                    missing
+                )
+
+                for version, panel in zip(missing, panels):
+                    self.snapshots[version] = panel
+
+        return [self.snapshots[version] for version in versions]
+
+    def diff(self, versions: list = None, start: str = None, end: str = None):
+        """ Return changes between every consecutive versions
+
+        Args:
+            versions (list, optional): Versions to compare, every version of the panel between start and end if None. Defaults to None.
+            start (str, optional): First version when versions isn't given. Defaults to None.
+            end (str, optional): Last version when versions isn't given. Defaults to None.
+
+        Returns:
+            list: List of VersionDiff, one per pair of consecutive versions
+        """
+
+        if versions is None:
+            versions = self.get_versions(start, end)
+        else:
+            versions = sorted(set(versions), key=version_key)
+
+        panels = self.get_snapshots(versions)
+
+        return [
+            diff_panels(old_panel, new_panel)
+            for old_panel, new_panel in zip(panels, panels[1:])
+        ]
+
+
+def compare_version_history(
+    panel_id: str, versions: list = None, start: str = None,
+    end: str = None, max_workers: int = 8
+):
+    """ Return changes between every consecutive versions of a panel
+
+    Args:
+        panel_id (str): Panel id
+        versions (list, optional): Versions to compare, every version of the panel between start and end if None. Defaults to None.
+        start (str, optional): First version when versions isn't given. Defaults to None.
+        end (str, optional): Last version when versions isn't given. Defaults to None.
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 8.
+
+    Returns:
+        list: List of VersionDiff, one per pair of consecutive versions
+    """
+
+    history = PanelHistory(panel_id, max_workers=max_workers)
+
+    return history.diff(versions, start, end)
@@ -0,0 +1,411 @@
+""" Compact records for the genes, STRs and regions of a panel
+
+Records only keep the fields the package uses, with interned strings and
+integer coordinates. They can still be read like the dicts returned by the
+API (entity["entity_name"], entity["gene_data"]["hgnc_id"]...) for the keys
+they know about. The other fields of the API (phenotypes, evidence...) are
+left to Panel.get_data().
+"""
+
+from sys import intern
+
+
+def intern_str(value):
+    """ Return interned string, other values are returned as is
+
+    Args:
+        value: Value to intern
+
+    Returns:
+        Interned string or value given
+    """
+
+    if isinstance(value, str):
+        return intern(value)
+
+    return value
+
+
+def parse_coordinates(coordinates):
+    """ Return start and end from coordinates given by the API
+
+    Args:
+        coordinates (list): [start, end] or None
+
+    Returns:
+        tuple: Start and end as int, (None, None) if no coordinates
+    """
+
+    if not coordinates:
+        return None, None
+
+    return int(coordinates[0]), int(coordinates[1])
+
+
+def parse_subpanel(entity_data: dict):
+    """ Return subpanel of an entity of a superpanel
+
+    Args:
+        entity_data (dict): Data of the entity from the API
+
+    Returns:
+        tuple: Panel id, name and version, None if not part of a superpanel
+    """
+
+    panel = entity_data.get("panel")
+
+    if not panel:
+        return None
+
+    return (panel["id"], intern_str(panel["name"]), intern_str(panel["version"]))
+
+
+def make_entity(cls, fields: tuple):
+    """ Return record from its fields, used to unpickle the records
+
+    Strings are interned again since interning doesn't survive pickling.
+
+    Args:
+        cls (type): Record class
+        fields (tuple): Values of the fields in the order of __slots__
+
+    Returns:
+        Entity: Record
+    """
+
+    return cls(*[intern_str(field) for field in fields])
+
+
+class Entity():
+    """ Base class of the records, gives dict-like access to the fields """
+
+    __slots__ = ()
+    entity_type = None
+    # keys computed from the fields by the get_<key> methods
+    derived_keys = ()
+
+    def __getitem__(self, key: str):
+        if key in self.derived_keys:
+            return getattr(self, "get_{}".format(key))()
+
+        if key in self.__slots__:
+            return getattr(self, key)
+
+        raise KeyError(key)
+
+    def __contains__(self, key: str):
+        try:
+            self[key]
+        except KeyError:
+            return False
+
+        return True
+
+    def get(self, key: str, default=None):
+        """ Return value for the key like dict.get
+
+        Args:
+            key (str): Key of the API data
+            default (optional): Value returned if the key is unknown. Defaults to None.
+
+        Returns:
+            Value of the key
+        """
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """ Return keys available for the entity
+
+        Returns:
+            list: List of keys
+        """
+
+        return [
+            key
+            for key in self.__slots__ + self.derived_keys
+            if key in self
+        ]
+
+    def to_dict(self):
+        """ Return the entity as a dict
+
+        Returns:
+            dict: Data of the entity
+        """
+
+        return {key: self[key] for key in self.keys()}
+
+    def get_entity_type(self):
+        return self.entity_type
+
+    def get_panel(self):
+        if self.subpanel is None:
+            raise KeyError("panel")
+
+        panel_id, name, version = self.subpanel
+
+        return {"id": panel_id, "name": name, "version": version}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, field) == getattr(other, field)
+            for field in self.__slots__
+        )
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, field) for field in self.__slots__))
+
+    def __reduce__(self):
+        # pickled as a plain tuple of the fields, without the slot names
+        return (
+            make_entity,
+            (type(self), tuple(getattr(self, field) for field in self.__slots__))
+        )
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join(
+                "{}={!r}".format(field, getattr(self, field))
+                for field in self.__slots__
+            )
+        )
+
+
+class LocatedEntity(Entity):
+    """ Base class of the entities with coordinates """
+
+    __slots__ = ()
+
+    def get_grch37_coordinates(self):
+        if self.grch37_start is None:
+            return None
+
+        return [self.grch37_start, self.grch37_end]
+
+    def get_grch38_coordinates(self):
+        if self.grch38_start is None:
+            return None
+
+        return [self.grch38_start, self.grch38_end]
+
+    def get_coordinates(self, build: str):
+        """ Return start and end for the build
+
+        Args:
+            build (str): "GRCh37" or "GRCh38"
+
+        Returns:
+            tuple: Start and end, (None, None) if unknown for the build
+        """
+
+        if build == "GRCh37":
+            return self.grch37_start, self.grch37_end
+
+        return self.grch38_start, self.grch38_end
+
+
+class Gene(Entity):
+    __slots__ = (
+        "symbol", "hgnc_id", "confidence_level", "grch37_ensembl_ids",
+        "grch38_ensembl_ids", "subpanel"
+    )
+    entity_type = "gene"
+    derived_keys = ("ensembl_id", "entity_name", "entity_type", "panel")
+
+    def __init__(
+        self, symbol: str, hgnc_id: str, confidence_level: str = None,
+        grch37_ensembl_ids: tuple = None, grch38_ensembl_ids: tuple = None,
+        subpanel: tuple = None
+    ):
+        self.symbol = symbol
+        self.hgnc_id = hgnc_id
+        self.confidence_level = confidence_level
+        self.grch37_ensembl_ids = grch37_ensembl_ids
+        self.grch38_ensembl_ids = grch38_ensembl_ids
+        self.subpanel = subpanel
+
+    @classmethod
+    def from_api(cls, panelapp_data: dict):
+        """ Create gene from the gene data of the API
+
+        Args:
+            panelapp_data (dict): Dict of all the gene data in Panelapp for given gene
+
+        Returns:
+            Gene: Gene record
+        """
+
+        gene_data = panelapp_data["gene_data"]
+        ensembl_ids = {}
+
+        if gene_data.get("ensembl_genes") and isinstance(gene_data["ensembl_genes"], dict):
+            for build, ensembl_data in gene_data["ensembl_genes"].items():
+                # after the following keys
+                # ["gene_data"]["ensembl_genes"]["GRch37"], there is another
+                # key to denote the ensembl version (82 for 37 and 90 for 90)
+                ids = tuple(
+                    intern_str(ensembl_data[version]["ensembl_id"])
+                    for version in ensembl_data
+                )
+
+                if "37" in build:
+                    ensembl_ids["GRCh37"] = ids
+
+                if "38" in build:
+                    ensembl_ids["GRCh38"] = ids
+
+        return cls(
+            intern_str(gene_data["hgnc_symbol"]),
+            intern_str(gene_data["hgnc_id"]),
+            intern_str(panelapp_data.get("confidence_level")),
+            ensembl_ids.get("GRCh37"),
+            ensembl_ids.get("GRCh38"),
+            parse_subpanel(panelapp_data)
+        )
+
+    def get_ensembl_id(self):
+        if self.grch37_ensembl_ids is None and self.grch38_ensembl_ids is None:
+            raise KeyError("ensembl_id")
+
+        ensembl_id = {}
+
+        if self.grch37_ensembl_ids is not None:
+            ensembl_id["GRCh37"] = list(self.grch37_ensembl_ids)
+
+        if self.grch38_ensembl_ids is not None:
+            ensembl_id["GRCh38"] = list(self.grch38_ensembl_ids)
+
+        return ensembl_id
+
+    def get_entity_name(self):
+        return self.symbol
+
+
+class STR(LocatedEntity):
+    __slots__ = (
+        "entity_name", "confidence_level", "chromosome", "grch37_start",
+        "grch37_end", "grch38_start", "grch38_end", "repeated_sequence",
+        "normal_repeats", "pathogenic_repeats", "gene_symbol", "hgnc_id",
+        "subpanel"
+    )
+    entity_type = "str"
+    derived_keys = (
+        "gene_data", "grch37_coordinates", "grch38_coordinates",
+        "entity_type", "panel"
+    )
+
+    def __init__(
+        self, entity_name: str, confidence_level: str, chromosome: str,
+        grch37_start: int, grch37_end: int, grch38_start: int,
+        grch38_end: int, repeated_sequence: str, normal_repeats: int,
+        pathogenic_repeats: int, gene_symbol: str, hgnc_id: str,
+        subpanel: tuple = None
+    ):
+        self.entity_name = entity_name
+        self.confidence_level = confidence_level
+        self.chromosome = chromosome
+        self.grch37_start = grch37_start
+        self.grch37_end = grch37_end
+        self.grch38_start = grch38_start
+        self.grch38_end = grch38_end
+        self.repeated_sequence = repeated_sequence
+        self.normal_repeats = normal_repeats
+        self.pathogenic_repeats = pathogenic_repeats
+        self.gene_symbol = gene_symbol
+        self.hgnc_id = hgnc_id
+        self.subpanel = subpanel
+
+    @classmethod
+    def from_api(cls, panelapp_data: dict):
+        """ Create STR from the STR data of the API
+
+        Args:
+            panelapp_data (dict): Dict of all the STR data in Panelapp
+
+        Returns:
+            STR: STR record
+        """
+
+        gene_data = panelapp_data.get("gene_data") or {}
+
+        return cls(
+            panelapp_data["entity_name"],
+            intern_str(panelapp_data["confidence_level"]),
+            intern_str(panelapp_data["chromosome"]),
+            *parse_coordinates(panelapp_data["grch37_coordinates"]),
+            *parse_coordinates(panelapp_data["grch38_coordinates"]),
+            intern_str(panelapp_data["repeated_sequence"]),
+            panelapp_data["normal_repeats"],
+            panelapp_data["pathogenic_repeats"],
+            intern_str(gene_data.get("hgnc_symbol")),
+            intern_str(gene_data.get("hgnc_id")),
+            parse_subpanel(panelapp_data)
+        )
+
+    def get_gene_data(self):
+        return {"hgnc_symbol": self.gene_symbol, "hgnc_id": self.hgnc_id}
+
+
+class Region(LocatedEntity):
+    __slots__ = (
+        "entity_name", "verbose_name", "confidence_level", "chromosome",
+        "grch37_start", "grch37_end", "grch38_start", "grch38_end",
+        "type_of_variants", "haploinsufficiency_score",
+        "triplosensitivity_score", "required_overlap_percentage", "subpanel"
+    )
+    entity_type = "region"
+    derived_keys = (
+        "grch37_coordinates", "grch38_coordinates", "entity_type", "panel"
+    )
+
+    def __init__(
+        self, entity_name: str, verbose_name: str, confidence_level: str,
+        chromosome: str, grch37_start: int, grch37_end: int,
+        grch38_start: int, grch38_end: int, type_of_variants: str,
+        haploinsufficiency_score: str = None,
+        triplosensitivity_score: str = None,
+        required_overlap_percentage: int = None, subpanel: tuple = None
+    ):
+        self.entity_name = entity_name
+        self.verbose_name = verbose_name
+        self.confidence_level = confidence_level
+        self.chromosome = chromosome
+        self.grch37_start = grch37_start
+        self.grch37_end = grch37_end
+        self.grch38_start = grch38_start
+        self.grch38_end = grch38_end
+        self.type_of_variants = type_of_variants
+        self.haploinsufficiency_score = haploinsufficiency_score
+        self.triplosensitivity_score = triplosensitivity_score
+        self.required_overlap_percentage = required_overlap_percentage
+        self.subpanel = subpanel
+
+    @classmethod
+    def from_api(cls, panelapp_data: dict):
+        """ Create region from the region data of the API
+
+        Args:
+            panelapp_data (dict): Dict of all the region data in Panelapp
+
+        Returns:
+            Region: Region record
+        """
+
+        return cls(
+            panelapp_data["entity_name"],
+            panelapp_data.get("verbose_name"),
+            intern_str(panelapp_data["confidence_level"]),
+            intern_str(panelapp_data["chromosome"]),
+            *parse_coordinates(panelapp_data["grch37_coordinates"]),
+            *parse_coordinates(panelapp_data["grch38_coordinates"]),
+            intern_str(panelapp_data["type_of_variants"]),
+            intern_str(panelapp_data.get("haploinsufficiency_score")),
+            intern_str(panelapp_data.get("triplosensitivity_score")),
+            panelapp_data.get("required_overlap_percentage"),
+            parse_subpanel(panelapp_data)
+        )
@@ -0,0 +1,292 @@
+""" Export many panels at once
+
+write_panels streams the entities of many panels into a single combined
+file (TSV, gzipped TSV, Parquet or Arrow) with one column per field.
+write_panel_files writes the usual one TSV per panel, in parallel.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+from pathlib import Path
+
+
+COLUMNS = (
+    "panel_name", "panel_id", "version", "signedoff", "entity_type",
+    "entity_name", "gene_symbol", "hgnc_id", "confidence_level", "chromosome",
+    "grch37_start", "grch37_end", "grch38_start", "grch38_end",
+    "repeated_sequence", "normal_repeats", "pathogenic_repeats",
+    "type_of_variants"
+)
+INT_COLUMNS = (
+    "grch37_start", "grch37_end", "grch38_start", "grch38_end",
+    "normal_repeats", "pathogenic_repeats"
+)
+FORMATS = {
+    ".tsv": "tsv",
+    ".gz": "tsv.gz",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+BUFFER_SIZE = 1024 ** 2
+# maximum number of rows in a batch of the columnar formats
+BATCH_SIZE = 50000
+# panels rendered ahead of the writing, for each thread
+PREFETCH = 2
+
+
+def get_panel_rows(panel, confidence_levels: tuple = ()):
+    """ Return one row per gene, str and cnv of the panel, following COLUMNS
+
+    Args:
+        panel (Panel): Panel object
+        confidence_levels (tuple, optional): Confidence levels to export. Defaults to the confidence level of the panel.
+
+    Returns:
+        list: List of tuples
+    """
+
+    levels = panel.get_levels(confidence_levels)
+    signedoff = panel.is_signedoff()
+    panel_data = (
+        panel.get_name(), panel.get_id(), panel.get_version(),
+        str(signedoff) if signedoff else None
+    )
+    rows = [
+        panel_data + (
+            "gene", gene.symbol, gene.symbol, gene.hgnc_id,
+            gene.confidence_level, None, None, None, None, None, None, None,
+            None, None
+        )
+        for gene in panel.get_genes(*[int(level) for level in levels])
+    ]
+
+    rows.extend(
+        panel_data + (
+            "str", str_entity.entity_name, str_entity.gene_symbol,
+            str_entity.hgnc_id, str_entity.confidence_level,
+            str_entity.chromosome, str_entity.grch37_start,
+            str_entity.grch37_end, str_entity.grch38_start,
+            str_entity.grch38_end, str_entity.repeated_sequence,
+            str_entity.normal_repeats, str_entity.pathogenic_repeats, None
+        )
+        for str_entity in panel.get_strs()
+        if str_entity.confidence_level in levels
+    )
+
+    rows.extend(
+        panel_data + (
+            "cnv", cnv.entity_name, None, None, cnv.confidence_level,
+            cnv.chromosome, cnv.grch37_start, cnv.grch37_end,
+            cnv.grch38_start, cnv.grch38_end, None, None, None,
+            cnv.type_of_variants
+        )
+        for cnv in panel.get_cnvs()
+        if cnv.confidence_level in levels
+    )
+
+    return rows
+
+
+def render_tsv(panel, confidence_levels: tuple = ()):
+    """ Return the TSV lines of the panel as one string
+
+    Args:
+        panel (Panel): Panel object
+        confidence_levels (tuple, optional): Confidence levels to export. Defaults to the confidence level of the panel.
+
+    Returns:
+        str: Lines of the panel
+    """
+
+    return "".join(
+        "\t".join("" if value is None else str(value) for value in row) + "\n"
+        for row in get_panel_rows(panel, confidence_levels)
+    )
+
+
+def get_file_format(path: str, file_format: str = None):
+    """ Return format of the file from its extension if not given
+
+    Args:
+        path (str): Path of the file
+        file_format (str, optional): "tsv", "tsv.gz", "parquet" or "arrow". Defaults to None.
+
+    Returns:
+        str: Format of the file
+    """
+
+    if file_format:
+        assert file_format in FORMATS.values(), (
+            "Choose among the following formats: {}".format(
+                ", ".join(sorted(set(FORMATS.values())))
+            )
+        )
+        return file_format
+
+    return FORMATS.get(Path(path).suffix, "tsv")
+
+
+def bounded_map(executor, function, items, window: int):
+    """ Yield the results of the function for each item, in order
+
+    Unlike executor.map, items are only submitted while less than window
+    results are waiting, so that a slow consumer doesn't let the results
+    pile up in memory.
+
+    Args:
+        executor (Executor): Executor running the function
+        function (function): Function called with each item
+        items (iterable): Items
+        window (int): Maximum number of items submitted and not yet yielded
+
+    Yields:
+        Result of the function for each item
+    """
+
+    futures = deque()
+
+    for item in items:
+        if len(futures) >= window:
+            yield futures.popleft().result()
+
+        futures.append(executor.submit(function, item))
+
+    while futures:
+        yield futures.popleft().result()
+
+
+def write_panels(
+    panels, path: str, file_format: str = None, confidence_levels: tuple = (),
+    max_workers: int = 1
+):
+    """ Write the genes, strs and cnvs of many panels in a single file
+
+    Args:
+        panels (iterable): Panel objects or dict {panel_id: Panel}
+        path (str): Path of the file to write
+        file_format (str, optional): "tsv", "tsv.gz", "parquet" or "arrow". Defaults to the format matching the extension of path.
+        confidence_levels (tuple, optional): Confidence levels to export i.e. (3, 2). Defaults to the confidence level of each panel.
+        max_workers (int, optional): Number of threads preparing the panels while the file is written. Defaults to 1.
+    """
+
+    if isinstance(panels, dict):
+        panels = panels.values()
+
+    file_format = get_file_format(path, file_format)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    window = max_workers * PREFETCH
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if file_format in ("tsv", "tsv.gz"):
+            if file_format == "tsv":
+                f = open(path, "w", buffering=BUFFER_SIZE)
+            else:
+                f = gzip.open(path, "wt", compresslevel=6)
+
+            with f:
+                f.write("\t".join(COLUMNS) + "\n")
+
+                for lines in bounded_map(
+                    executor,
+                    lambda panel: render_tsv(panel, confidence_levels),
+                    panels, window
+                ):
+                    f.write(lines)
+        else:
+            write_columnar(
+                bounded_map(
+                    executor,
+                    lambda panel: get_panel_rows(panel, confidence_levels),
+                    panels, window
+                ),
+                path, file_format
+            )
+
+
+def write_columnar(panel_rows, path: str, file_format: str):
+    """ Write rows of panels in a Parquet or Arrow file, by batches of at
+    most BATCH_SIZE rows
+
+    Args:
+        panel_rows (iterable): List of rows for every panel
+        path (str): Path of the file to write
+        file_format (str): "parquet" or "arrow"
+    """
+
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "pyarrow is needed to write {} files: pip install pyarrow".format(
+                file_format
+            )
+        )
+
+    schema = pyarrow.schema([
+        (column, pyarrow.int64() if column in INT_COLUMNS else pyarrow.string())
+        for column in COLUMNS
+    ])
+
+    if file_format == "parquet":
+        import pyarrow.parquet
+
+        writer = pyarrow.parquet.ParquetWriter(str(path), schema)
+    else:
+        import pyarrow.ipc
+
+        writer = pyarrow.ipc.new_file(str(path), schema)
+
+    with writer:
+        batch = []
+
+        for rows in panel_rows:
+            batch.extend(rows)
+
+            while len(batch) >= BATCH_SIZE:
+                write_batch(writer, batch[:BATCH_SIZE], schema)
+                batch = batch[BATCH_SIZE:]
+
+        if batch:
+            write_batch(writer, batch, schema)
+
+
+def write_batch(writer, rows: list, schema):
+    """ Write rows as one batch of columns
+
+    Args:
+        writer (ParquetWriter, RecordBatchFileWriter): Writer of the file
+        rows (list): List of tuples following COLUMNS
+        schema (pyarrow.Schema): Schema of the file
+    """
+
+    import pyarrow
+
+    columns = list(zip(*rows))
+    writer.write_table(pyarrow.Table.from_arrays(
+        [
+            pyarrow.array(column, type=field.type)
+            for column, field in zip(columns, schema)
+        ],
+        schema=schema
+    ))
+
+
+def write_panel_files(panels, path: str = None, max_workers: int = 8):
+    """ Write one file per panel like Panel.write, using several threads
+
+    Args:
+        panels (iterable): Panel objects or dict {panel_id: Panel}
+        path (str, optional): Folder where to write the panels. Defaults to "panels".
+        max_workers (int, optional): Number of files written at the same time. Defaults to 8.
+    """
+
+    if isinstance(panels, dict):
+        panels = panels.values()
+
+    Path(path or "panels").mkdir(parents=True, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # list() to raise the errors of the threads
+        list(executor.map(lambda panel: panel.write(path), panels))
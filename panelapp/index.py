@@ -0,0 +1,281 @@
+""" Reverse index of the genes of many panels
+
+Maps hgnc ids, gene symbols and ensembl ids to the panels containing them so
+that "which panels have this gene?" doesn't need to go through every panel.
+The index can be saved to disk and loaded without any API call.
+"""
+
+import gzip
+import json
+
+
+ID_TYPES = ("hgnc_id", "symbol", "ensembl_id")
+
+
+class GeneIndex():
+    def __init__(self):
+        """ Initialise empty index, use add_panel or GeneIndex.build to fill it """
+
+        # {id_type: {gene id: set of (panel_id, version, confidence_level)}}
+        self.index = {id_type: {} for id_type in ID_TYPES}
+        self.panels = {}
+
+    @classmethod
+    def build(cls, panels):
+        """ Return index of the genes of the panels
+
+        Args:
+            panels (iterable): Panel objects or dict {panel_id: Panel}
+
+        Returns:
+            GeneIndex: Index of the panels
+        """
+
+        index = cls()
+
+        if isinstance(panels, dict):
+            panels = panels.values()
+
+        for panel in panels:
+            index.add_panel(panel)
+
+        return index
+
+    def add_panel(self, panel):
+        """ Add the genes of a panel, replacing any version already indexed
+
+        Args:
+            panel (Panel): Panel object
+        """
+
+        if panel.get_id() in self.panels:
+            self.remove_panel(panel.get_id())
+
+        self.panels[panel.get_id()] = (panel.get_version(), panel.get_name())
+
+        for gene in panel.get_genes(0, 1, 2, 3):
+            hit = (panel.get_id(), panel.get_version(), gene["confidence_level"])
+            self.index["hgnc_id"].setdefault(gene["hgnc_id"], set()).add(hit)
+            self.index["symbol"].setdefault(gene["symbol"], set()).add(hit)
+
+            for ensembl_ids in gene.get("ensembl_id", {}).values():
+                for ensembl_id in ensembl_ids:
+                    self.index["ensembl_id"].setdefault(
+                        ensembl_id, set()
+                    ).add(hit)
+
+    def remove_panel(self, panel_id: str):
+        """ Remove every gene of the panel from the index
+
+        Args:
+            panel_id (str): Panel id
+        """
+
+        panel_id = str(panel_id)
+        self.panels.pop(panel_id, None)
+
+        for genes in self.index.values():
+            for gene_id in list(genes):
+                hits = {hit for hit in genes[gene_id] if hit[0] != panel_id}
+
+                if hits:
+                    genes[gene_id] = hits
+                else:
+                    del genes[gene_id]
+
+    def lookup(
+        self, gene_id: str, id_type: str = "hgnc_id", levels: tuple = None
+    ):
+        """ Return the panels containing the gene
+
+        Args:
+            gene_id (str): Hgnc id, symbol or ensembl id
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+            levels (tuple, optional): Only return hits at these confidence levels i.e. (3,). Defaults to all levels.
+
+        Returns:
+            set: Set of (panel_id, version, confidence_level)
+        """
+
+        hits = self.index[id_type].get(gene_id, set())
+
+        if levels is None:
+            return set(hits)
+
+        levels = {str(level) for level in levels}
+
+        return {hit for hit in hits if hit[2] in levels}
+
+    def lookup_many(
+        self, gene_ids: list, id_type: str = "hgnc_id", levels: tuple = None
+    ):
+        """ Return the panels containing each gene
+
+        Args:
+            gene_ids (list): Hgnc ids, symbols or ensembl ids
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+            levels (tuple, optional): Only return hits at these confidence levels. Defaults to all levels.
+
+        Returns:
+            dict: Dict {gene id: set of (panel_id, version, confidence_level)}
+        """
+
+        return {
+            gene_id: self.lookup(gene_id, id_type, levels)
+            for gene_id in gene_ids
+        }
+
+    def get_panel_ids(
+        self, gene_id: str, id_type: str = "hgnc_id", levels: tuple = None
+    ):
+        """ Return ids of the panels containing the gene
+
+        Args:
+            gene_id (str): Hgnc id, symbol or ensembl id
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+            levels (tuple, optional): Only consider these confidence levels. Defaults to all levels.
+
+        Returns:
+            set: Set of panel ids
+        """
+
+        return {hit[0] for hit in self.lookup(gene_id, id_type, levels)}
+
+    def panels_with_all(
+        self, gene_ids: list, id_type: str = "hgnc_id", levels: tuple = None
+    ):
+        """ Return ids of the panels containing every gene given
+
+        Args:
+            gene_ids (list): Hgnc ids, symbols or ensembl ids
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+            levels (tuple, optional): Only consider these confidence levels. Defaults to all levels.
+
+        Returns:
+            set: Set of panel ids
+        """
+
+        panel_ids = None
+
+        # the rarest genes go first to keep the intersection small
+        sets = sorted(
+            (self.get_panel_ids(gene_id, id_type, levels) for gene_id in gene_ids),
+            key=len
+        )
+
+        for ids in sets:
+            panel_ids = ids if panel_ids is None else panel_ids & ids
+
+            if not panel_ids:
+                break
+
+        return panel_ids or set()
+
+    def panels_with_any(
+        self, gene_ids: list, id_type: str = "hgnc_id", levels: tuple = None
+    ):
+        """ Return ids of the panels containing at least one of the genes given
+
+        Args:
+            gene_ids (list): Hgnc ids, symbols or ensembl ids
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+            levels (tuple, optional): Only consider these confidence levels. Defaults to all levels.
+
+        Returns:
+            set: Set of panel ids
+        """
+
+        return set().union(*(
+            self.get_panel_ids(gene_id, id_type, levels)
+            for gene_id in gene_ids
+        ))
+
+    def count_panels(
+        self, gene_ids: list, id_type: str = "hgnc_id", levels: tuple = None
+    ):
+        """ Return the number of genes given found in each panel
+
+        Args:
+            gene_ids (list): Hgnc ids, symbols or ensembl ids
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+            levels (tuple, optional): Only consider these confidence levels. Defaults to all levels.
+
+        Returns:
+            dict: Dict {panel_id: number of genes}
+        """
+
+        counts = {}
+
+        for gene_id in set(gene_ids):
+            for panel_id in self.get_panel_ids(gene_id, id_type, levels):
+                counts[panel_id] = counts.get(panel_id, 0) + 1
+
+        return counts
+
+    def genes_missing(self, gene_ids: list, id_type: str = "hgnc_id"):
+        """ Return the genes given that aren't in any panel
+
+        Args:
+            gene_ids (list): Hgnc ids, symbols or ensembl ids
+            id_type (str, optional): "hgnc_id", "symbol" or "ensembl_id". Defaults to "hgnc_id".
+
+        Returns:
+            set: Set of gene ids
+        """
+
+        return {
+            gene_id for gene_id in gene_ids
+            if gene_id not in self.index[id_type]
+        }
+
+    def save(self, path: str):
+        """ Write the index to a gzipped JSON file
+
+        Args:
+            path (str): Path of the file
+        """
+
+        data = {
+            "panels": self.panels,
+            "index": {
+                id_type: {
+                    gene_id: sorted(hits)
+                    for gene_id, hits in genes.items()
+                }
+                for id_type, genes in self.index.items()
+            }
+        }
+
+        with gzip.open(path, "wt") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str):
+        """ Return index saved with GeneIndex.save
+
+        Args:
+            path (str): Path of the file
+
+        Returns:
+            GeneIndex: Index loaded
+        """
+
+        with gzip.open(path, "rt") as f:
+            data = json.load(f)
+
+        index = cls()
+        index.panels = {
+            panel_id: tuple(panel) for panel_id, panel in data["panels"].items()
+        }
+        index.index = {
+            id_type: {
+                gene_id: {tuple(hit) for hit in hits}
+                for gene_id, hits in genes.items()
+            }
+            for id_type, genes in data["index"].items()
+        }
+
+        return index
+
+    def __len__(self):
+        return len(self.panels)
@@ -0,0 +1,351 @@
+""" Genomic interval index over the STRs and regions of panels
+
+IntervalIndex keeps, for one genome build and for every chromosome, the
+entities grouped by length (each group holds lengths within a factor of 4)
+and sorted by start. A batch of positions is answered with two searchsorted
+calls per group: every entity of a group overlapping a query starts between
+the query start minus the longest length of the group and the query end.
+Only these candidates are compared, without any Python loop over the
+queries. Grouping by length keeps a few long regions from turning every
+preceding entity into a candidate, and queries are answered by chunks of
+QUERY_CHUNK to bound the memory of the candidates.
+
+Coordinates are 1-based and inclusive like in Panelapp.
+
+    index = intervals.IntervalIndex.build(panels, build="GRCh38")
+    query_ids, entity_ids = index.query_points("1", positions)
+    index.overlaps("X", 147912050)
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError(
+        "numpy is needed for the interval index: pip install numpy"
+    )
+
+from .Panelapp import BUILDS
+
+
+ENTITY_TYPES = ("str", "cnv")
+# queries compared at once, bounds the size of the candidate arrays
+QUERY_CHUNK = 65536
+
+
+def normalise_chromosome(chromosome):
+    """ Return chromosome name as used by Panelapp, i.e. "chrX" -> "X"
+
+    Args:
+        chromosome: Chromosome name or number
+
+    Returns:
+        str: Chromosome name
+    """
+
+    chromosome = str(chromosome)
+
+    if chromosome[:3].lower() == "chr":
+        chromosome = chromosome[3:]
+
+    return chromosome.upper()
+
+
+class Chromosome():
+    def __init__(self, starts, ends, entity_ids):
+        """ Initialise intervals of one chromosome, grouped by length
+
+        Args:
+            starts (numpy.ndarray): Starts of the intervals
+            ends (numpy.ndarray): Ends of the intervals
+            entity_ids (numpy.ndarray): Position of the entities in the index
+        """
+
+        lengths = np.maximum(ends - starts + 1, 1)
+        # lengths from 4 ** n to 4 ** (n + 1) - 1 share a group
+        classes = np.floor(np.log2(lengths)).astype(np.int64) // 2
+        # [(starts, ends, entity_ids, longest length)] sorted by start
+        self.groups = []
+
+        for length_class in np.unique(classes):
+            selected = classes == length_class
+            order = np.argsort(starts[selected], kind="stable")
+            self.groups.append((
+                starts[selected][order], ends[selected][order],
+                entity_ids[selected][order], int(lengths[selected].max())
+            ))
+
+    def query(self, starts, ends):
+        """ Return the overlaps of the query intervals
+
+        Args:
+            starts (numpy.ndarray): Starts of the queries
+            ends (numpy.ndarray): Ends of the queries
+
+        Returns:
+            tuple: Arrays of query positions and entity ids, one item per
+                   overlap, sorted by query position
+        """
+
+        query_ids = []
+        entity_ids = []
+
+        for chunk_start in range(0, len(starts), QUERY_CHUNK):
+            chunk = slice(chunk_start, chunk_start + QUERY_CHUNK)
+            chunk_query_ids, chunk_entity_ids = self.query_chunk(
+                starts[chunk], ends[chunk]
+            )
+            query_ids.append(chunk_query_ids + chunk_start)
+            entity_ids.append(chunk_entity_ids)
+
+        if not query_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        return np.concatenate(query_ids), np.concatenate(entity_ids)
+
+    def query_chunk(self, starts, ends):
+        """ Return the overlaps of a chunk of query intervals, see query """
+
+        query_ids = []
+        entity_ids = []
+
+        for group_starts, group_ends, group_entity_ids, longest in self.groups:
+            first = np.searchsorted(group_starts, starts - longest + 1, side="left")
+            last = np.searchsorted(group_starts, ends, side="right")
+            counts = np.maximum(last - first, 0)
+            total = int(counts.sum())
+
+            if not total:
+                continue
+
+            # candidates of each query are the consecutive intervals first..last
+            group_query_ids = np.repeat(np.arange(len(starts)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            candidates = np.repeat(first, counts) + offsets
+            overlap = group_ends[candidates] >= starts[group_query_ids]
+            query_ids.append(group_query_ids[overlap])
+            entity_ids.append(group_entity_ids[candidates[overlap]])
+
+        if not query_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        query_ids = np.concatenate(query_ids)
+        order = np.argsort(query_ids, kind="stable")
+
+        return query_ids[order], np.concatenate(entity_ids)[order]
+
+
+class IntervalIndex():
+    def __init__(self, build: str = "GRCh38"):
+        """ Initialise empty index for a genome build
+
+        Args:
+            build (str, optional): "GRCh37" or "GRCh38". Defaults to "GRCh38".
+        """
+
+        assert build in BUILDS, "Choose among the following builds: {}".format(
+            ", ".join(BUILDS)
+        )
+
+        self.build = build
+        self.chromosome_names = []
+        self.starts = []
+        self.ends = []
+        self.panel_ids = []
+        self.entity_names = []
+        self.confidence_levels = []
+        self.entity_types = []
+        # {chromosome: Chromosome}, built on first query after a change
+        self.chromosomes = None
+
+    @classmethod
+    def build(
+        cls, panels, build: str = "GRCh38",
+        confidence_levels: tuple = (0, 1, 2, 3),
+        entity_types: tuple = ENTITY_TYPES
+    ):
+        """ Build index of the STRs and regions of the panels
+
+        Args:
+            panels (iterable): Panel objects or dict {panel_id: Panel}
+            build (str, optional): "GRCh37" or "GRCh38". Defaults to "GRCh38".
+            confidence_levels (tuple, optional): Confidence levels of the entities to index. Defaults to (0, 1, 2, 3).
+            entity_types (tuple, optional): "str" and/or "cnv". Defaults to ENTITY_TYPES.
+
+        Returns:
+            IntervalIndex: Index of the entities
+        """
+
+        index = cls(build)
+
+        if isinstance(panels, dict):
+            panels = panels.values()
+
+        for panel in panels:
+            index.add_panel(panel, confidence_levels, entity_types)
+
+        return index
+
+    def add_panel(
+        self, panel, confidence_levels: tuple = (0, 1, 2, 3),
+        entity_types: tuple = ENTITY_TYPES
+    ):
+        """ Add the STRs and regions of the panel, entities without coordinates are skipped
+
+        Args:
+            panel (Panel): Panel object
+            confidence_levels (tuple, optional): Confidence levels of the entities to index. Defaults to (0, 1, 2, 3).
+            entity_types (tuple, optional): "str" and/or "cnv". Defaults to ENTITY_TYPES.
+        """
+
+        levels = {str(level) for level in confidence_levels}
+        start_key = "{}_start".format(self.build.lower())
+        end_key = "{}_end".format(self.build.lower())
+        entities = []
+
+        if "str" in entity_types:
+            entities.extend(("str", entity) for entity in panel.get_strs())
+
+        if "cnv" in entity_types:
+            entities.extend(("cnv", entity) for entity in panel.get_cnvs())
+
+        for entity_type, entity in entities:
+            start = getattr(entity, start_key)
+
+            if (
+                start is None or entity.chromosome is None or
+                entity.confidence_level not in levels
+            ):
+                continue
+
+            self.chromosome_names.append(
+                normalise_chromosome(entity.chromosome)
+            )
+            self.starts.append(start)
+            self.ends.append(getattr(entity, end_key))
+            self.panel_ids.append(panel.get_id())
+            self.entity_names.append(entity.entity_name)
+            self.confidence_levels.append(entity.confidence_level)
+            self.entity_types.append(entity_type)
+
+        self.chromosomes = None
+
+    def get_chromosomes(self):
+        """ Return the sorted intervals of every chromosome
+
+        Returns:
+            dict: Dict {chromosome: Chromosome}
+        """
+
+        if self.chromosomes is None:
+            names = np.array(self.chromosome_names, dtype=object)
+            starts = np.array(self.starts, dtype=np.int64)
+            ends = np.array(self.ends, dtype=np.int64)
+            entity_ids = np.arange(len(names))
+
+            self.chromosomes = {
+                name: Chromosome(
+                    starts[names == name], ends[names == name],
+                    entity_ids[names == name]
+                )
+                for name in set(self.chromosome_names)
+            }
+
+        return self.chromosomes
+
+    def query_ranges(self, chromosomes, starts, ends):
+        """ Return the entities overlapping each query range
+
+        Args:
+            chromosomes (str, array-like): Chromosome of all the queries or of each query
+            starts (array-like): Starts of the queries
+            ends (array-like): Ends of the queries, inclusive
+
+        Returns:
+            tuple: Arrays of query positions and entity ids, one item per overlap, see get_entity
+        """
+
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        index = self.get_chromosomes()
+
+        if isinstance(chromosomes, (str, int)):
+            groups = [
+                (normalise_chromosome(chromosomes), np.arange(len(starts)))
+            ]
+        else:
+            names, inverse = np.unique(
+                np.asarray(chromosomes).astype(str), return_inverse=True
+            )
+            groups = [
+                (normalise_chromosome(name), np.flatnonzero(inverse == code))
+                for code, name in enumerate(names)
+            ]
+
+        query_ids = []
+        entity_ids = []
+
+        for name, positions in groups:
+            chromosome = index.get(name)
+
+            if chromosome is None:
+                continue
+
+            group_query_ids, group_entity_ids = chromosome.query(
+                starts[positions], ends[positions]
+            )
+            query_ids.append(positions[group_query_ids])
+            entity_ids.append(group_entity_ids)
+
+        if not query_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        return np.concatenate(query_ids), np.concatenate(entity_ids)
+
+    def query_points(self, chromosomes, positions):
+        """ Return the entities containing each position
+
+        Args:
+            chromosomes (str, array-like): Chromosome of all the positions or of each position
+            positions (array-like): Positions
+
+        Returns:
+            tuple: Arrays of query positions and entity ids, one item per overlap, see get_entity
+        """
+
+        return self.query_ranges(chromosomes, positions, positions)
+
+    def get_entity(self, entity_id: int):
+        """ Return the entity for an id returned by the queries
+
+        Args:
+            entity_id (int): Entity id
+
+        Returns:
+            tuple: Panel id, entity name and confidence level
+        """
+
+        return (
+            self.panel_ids[entity_id], self.entity_names[entity_id],
+            self.confidence_levels[entity_id]
+        )
+
+    def overlaps(self, chromosome: str, start: int, end: int = None):
+        """ Return the entities overlapping one position or range
+
+        Args:
+            chromosome (str): Chromosome
+            start (int): Position or start of the range
+            end (int, optional): End of the range, inclusive. Defaults to start.
+
+        Returns:
+            list: List of (panel_id, entity_name, confidence_level)
+        """
+
+        query_ids, entity_ids = self.query_ranges(
+            chromosome, [start], [start if end is None else end]
+        )
+
+        return [self.get_entity(entity_id) for entity_id in sorted(entity_ids)]
+
+    def __len__(self):
+        return len(self.starts)
@@ -0,0 +1,344 @@
+""" Scoring of gene lists against many panels
+
+GeneMatcher keeps the genes of a collection of panels in a panels x genes
+matrix of confidence levels. Each query is a list of genes: the matrix rows
+of the genes of all the queries are gathered and summed per query in one
+NumPy pass, which gives the overlap of every query with every panel without
+any Python set operation. Scores are derived from the overlaps:
+
+    overlap: number of genes of the query in the panel
+    coverage: fraction of the genes of the query in the panel
+    jaccard: genes in both divided by genes in either
+    weighted: like coverage with each gene weighted by its confidence level
+        in the panel, see WEIGHTS
+
+    matcher = matching.GeneMatcher.build(panels)
+    scores = matcher.score([["HGNC:1100", "HGNC:1101"], ["HGNC:3603"]])
+    matcher.top_k([["HGNC:1100", "HGNC:1101"]], k=5, method="jaccard")
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError(
+        "numpy is needed for the gene list matching: pip install numpy"
+    )
+
+
+METHODS = ("overlap", "coverage", "jaccard", "weighted")
+ID_TYPES = ("hgnc_id", "symbol")
+# weight of a gene of the query found in a panel at each confidence level
+WEIGHTS = {3: 1.0, 2: 0.5, 1: 0.1, 0: 0.0}
+# level of the genes absent from a panel
+ABSENT = -1
+# queries scored at once by top_k, bounds the memory of the score matrix
+BATCH_SIZE = 1024
+
+
+class GeneMatcher():
+    def __init__(
+        self, panel_ids: list, versions: list, hgnc_ids: list, symbols: list,
+        levels
+    ):
+        """ Initialise matcher from its matrix, use GeneMatcher.build to create it
+
+        Args:
+            panel_ids (list): Panel id of each row
+            versions (list): Panel version of each row
+            hgnc_ids (list): Hgnc id of each column
+            symbols (list): Gene symbol of each column
+            levels (numpy.ndarray): int8 matrix panels x genes of the confidence levels, ABSENT if the panel doesn't have the gene
+        """
+
+        self.panel_ids = list(panel_ids)
+        self.versions = list(versions)
+        self.hgnc_ids = list(hgnc_ids)
+        self.symbols = list(symbols)
+        self.levels = levels
+        self.columns = {
+            "hgnc_id": {
+                hgnc_id: column for column, hgnc_id in enumerate(self.hgnc_ids)
+            },
+            "symbol": {
+                symbol: column for column, symbol in enumerate(self.symbols)
+            },
+        }
+        # {(confidence levels, weights): genes x panels float32 matrix}
+        self.matrices = {}
+        # {(confidence levels, weights): sum of the matrix for each panel}
+        self.panel_sizes = {}
+
+    @classmethod
+    def build(cls, panels):
+        """ Build matrix of the genes of the panels
+
+        Genes present at several levels in a panel (superpanels) keep the
+        highest one.
+
+        Args:
+            panels (iterable): Panel objects or dict {panel_id: Panel}
+
+        Returns:
+            GeneMatcher: Matcher of the panels
+        """
+
+        if isinstance(panels, dict):
+            panels = panels.values()
+
+        panel_ids = []
+        versions = []
+        columns = {}
+        symbols = []
+        rows = []
+        cols = []
+        values = []
+
+        for row, panel in enumerate(panels):
+            panel_ids.append(panel.get_id())
+            versions.append(panel.get_version())
+
+            for level, genes in panel.genes.items():
+                for gene in genes:
+                    if gene.hgnc_id not in columns:
+                        columns[gene.hgnc_id] = len(columns)
+                        symbols.append(gene.symbol)
+
+                    rows.append(row)
+                    cols.append(columns[gene.hgnc_id])
+                    values.append(int(level))
+
+        levels = np.full((len(panel_ids), len(columns)), ABSENT, dtype=np.int8)
+        # maximum.at keeps the highest level of genes listed several times
+        np.maximum.at(
+            levels, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)),
+            np.array(values, dtype=np.int8)
+        )
+
+        return cls(panel_ids, versions, list(columns), symbols, levels)
+
+    def __len__(self):
+        return len(self.panel_ids)
+
+    def get_key(self, confidence_levels: tuple, weights: dict = None):
+        """ Return key of the matrices built for the arguments
+
+        Args:
+            confidence_levels (tuple): Confidence levels of the genes counted
+            weights (dict, optional): Weight of each confidence level. Defaults to None.
+
+        Returns:
+            tuple: Sorted levels and sorted weights
+        """
+
+        return (
+            tuple(sorted({int(level) for level in confidence_levels})),
+            tuple(sorted(weights.items())) if weights else None
+        )
+
+    def get_matrix(self, confidence_levels: tuple, weights: dict = None):
+        """ Return the genes x panels matrix used for the scores
+
+        Args:
+            confidence_levels (tuple): Confidence levels of the genes counted
+            weights (dict, optional): Weight of each confidence level, 1 for every level if None. Defaults to None.
+
+        Returns:
+            numpy.ndarray: float32 matrix genes x panels, built once for each set of arguments
+        """
+
+        key = self.get_key(confidence_levels, weights)
+
+        if key not in self.matrices:
+            matrix = np.zeros(self.levels.shape, dtype=np.float32)
+
+            for level in key[0]:
+                matrix[self.levels == level] = (
+                    weights.get(level, 0) if weights else 1
+                )
+
+            # rows of genes are gathered when scoring, keep them contiguous
+            self.matrices[key] = np.ascontiguousarray(matrix.T)
+            self.panel_sizes[key] = self.matrices[key].sum(axis=0)
+
+        return self.matrices[key]
+
+    def get_panel_sizes(self, confidence_levels: tuple, weights: dict = None):
+        """ Return number of genes of each panel, weighted if weights are given
+
+        Args:
+            confidence_levels (tuple): Confidence levels of the genes counted
+            weights (dict, optional): Weight of each confidence level. Defaults to None.
+
+        Returns:
+            numpy.ndarray: float32 array in the order of panel_ids
+        """
+
+        self.get_matrix(confidence_levels, weights)
+
+        return self.panel_sizes[self.get_key(confidence_levels, weights)]
+
+    def encode_queries(self, queries: list, id_type: str = "hgnc_id"):
+        """ Return columns of the genes of the queries, flattened
+
+        Args:
+            queries (list): Lists of gene ids
+            id_type (str, optional): "hgnc_id" or "symbol". Defaults to "hgnc_id".
+
+        Returns:
+            tuple: Array of the columns of the known genes, array of the
+                   query of each of them and array of the number of distinct
+                   genes of each query (unknown genes included)
+        """
+
+        assert id_type in ID_TYPES, "Choose among the following id types: {}".format(
+            ", ".join(ID_TYPES)
+        )
+
+        index = self.columns[id_type]
+        columns = []
+        query_ids = []
+        sizes = np.zeros(len(queries), dtype=np.float32)
+
+        for query_id, genes in enumerate(queries):
+            genes = set(genes)
+            sizes[query_id] = len(genes)
+
+            for gene in genes:
+                column = index.get(gene)
+
+                if column is not None:
+                    columns.append(column)
+                    query_ids.append(query_id)
+
+        return (
+            np.array(columns, dtype=np.int64),
+            np.array(query_ids, dtype=np.int64), sizes
+        )
+
+    def score(
+        self, queries: list, method: str = "coverage",
+        confidence_levels: tuple = None, id_type: str = "hgnc_id",
+        weights: dict = WEIGHTS
+    ):
+        """ Return the score of every query against every panel
+
+        Args:
+            queries (list): Lists of gene ids
+            method (str, optional): "overlap", "coverage", "jaccard" or "weighted". Defaults to "coverage".
+            confidence_levels (tuple, optional): Confidence levels of the genes of the panels. Defaults to (3,), all the levels for weighted.
+            id_type (str, optional): "hgnc_id" or "symbol". Defaults to "hgnc_id".
+            weights (dict, optional): Weight of each confidence level for weighted. Defaults to WEIGHTS.
+
+        Returns:
+            numpy.ndarray: float32 matrix queries x panels, rows in the order of the queries and columns in the order of panel_ids
+        """
+
+        assert method in METHODS, "Choose among the following methods: {}".format(
+            ", ".join(METHODS)
+        )
+
+        if confidence_levels is None:
+            confidence_levels = (0, 1, 2, 3) if method == "weighted" else (3,)
+
+        if method != "weighted":
+            weights = None
+
+        matrix = self.get_matrix(confidence_levels, weights)
+        columns, query_ids, sizes = self.encode_queries(queries, id_type)
+        overlaps = np.zeros((len(queries), len(self)), dtype=np.float32)
+
+        if len(columns):
+            # genes are grouped by query, sum the rows of each group
+            starts = np.flatnonzero(np.diff(query_ids, prepend=-1))
+            overlaps[query_ids[starts]] = np.add.reduceat(
+                matrix[columns], starts, axis=0
+            )
+
+        if method == "overlap":
+            return overlaps
+
+        if method == "jaccard":
+            panel_sizes = self.get_panel_sizes(confidence_levels, weights)
+            union = sizes[:, None] + panel_sizes[None, :] - overlaps
+        else:
+            union = np.broadcast_to(sizes[:, None], overlaps.shape)
+
+        return np.divide(
+            overlaps, union, out=np.zeros_like(overlaps), where=union > 0
+        )
+
+    def top_k(self, queries: list, k: int = 10, **kwargs):
+        """ Return the panels with the best scores for each query
+
+        Panels without any gene of the query are left out. Queries are
+        scored by batches of BATCH_SIZE.
+
+        Args:
+            queries (list): Lists of gene ids
+            k (int, optional): Maximum number of panels for each query. Defaults to 10.
+            kwargs: Arguments of score (method, confidence_levels, id_type, weights)
+
+        Returns:
+            list: List of [(panel_id, score)] for each query, best score first
+        """
+
+        results = []
+        k = min(k, len(self))
+
+        for batch_start in range(0, len(queries), BATCH_SIZE):
+            scores = self.score(
+                queries[batch_start:batch_start + BATCH_SIZE], **kwargs
+            )
+
+            if k < len(self):
+                best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                best = np.tile(np.arange(len(self)), (len(scores), 1))
+
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            # ties keep the order of the panels
+            order = np.lexsort((best, -best_scores), axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+            for rows, row_scores in zip(best.tolist(), best_scores.tolist()):
+                results.append([
+                    (self.panel_ids[row], score)
+                    for row, score in zip(rows, row_scores)
+                    if score > 0
+                ])
+
+        return results
+
+    def save(self, path: str):
+        """ Save the matrix in a NumPy .npz file
+
+        Args:
+            path (str): Path of the file
+        """
+
+        np.savez_compressed(
+            path, levels=self.levels,
+            panel_ids=np.array(self.panel_ids, dtype=str),
+            versions=np.array(self.versions, dtype=str),
+            hgnc_ids=np.array(self.hgnc_ids, dtype=str),
+            symbols=np.array(self.symbols, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        """ Load matrix saved with save, without any API call
+
+        Args:
+            path (str): Path of the file
+
+        Returns:
+            GeneMatcher: Matcher of the saved panels
+        """
+
+        with np.load(path) as data:
+            return cls(
+                data["panel_ids"].tolist(), data["versions"].tolist(),
+                data["hgnc_ids"].tolist(), data["symbols"].tolist(),
+                data["levels"]
+            )
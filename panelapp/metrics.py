@@ -0,0 +1,362 @@
+""" Instrumentation of the API calls and of the parsing of the panels
+
+Hooks are functions called with the name of an event and a dict of its
+fields. Nothing is measured while no hook is set, the instrumented code only
+checks whether the hooks tuple is empty.
+
+Events:
+    request: one attempt of an API call, with url, status (None if no
+        response), latency (seconds), bytes, attempt (0 for the first try)
+        and error (None if the attempt succeeded)
+    cache: lookup in the cache, with url and result ("hit", "revalidated"
+        or "miss")
+    parse: stage of the parsing of a response or a panel, with stage,
+        duration (seconds) and panel_id for the stages of Panel
+
+    registry = metrics.Registry()
+    metrics.add_hook(registry)
+    print(registry.render())
+
+    with metrics.Profiler() as profiler:
+        queries.get_all_panels(max_workers=8)
+
+    print(profiler.report())
+"""
+
+import bisect
+import threading
+import time
+
+
+# replaced rather than modified so that it can be read without lock
+hooks = ()
+_hooks_lock = threading.Lock()
+
+DURATION_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+
+def add_hook(hook):
+    """ Call the hook on every event
+
+    Args:
+        hook (function): Function called with the name of the event and a dict of its fields
+    """
+
+    global hooks
+
+    with _hooks_lock:
+        hooks = hooks + (hook,)
+
+
+def remove_hook(hook):
+    """ Stop calling the hook
+
+    Args:
+        hook (function): Hook given to add_hook
+    """
+
+    global hooks
+
+    with _hooks_lock:
+        hooks = tuple(function for function in hooks if function is not hook)
+
+
+def emit(event: str, **fields):
+    """ Call the hooks with the event
+
+    Args:
+        event (str): Name of the event
+        fields: Fields of the event
+    """
+
+    for hook in hooks:
+        hook(event, fields)
+
+
+def time_stage(stage: str, function, *args, **fields):
+    """ Run the function and emit a parse event with its duration
+
+    Args:
+        stage (str): Name of the stage
+        function (function): Function to run with args
+        fields: Other fields of the event
+
+    Returns:
+        Value returned by the function
+    """
+
+    start = time.perf_counter()
+    result = function(*args)
+    emit(
+        "parse", stage=stage, duration=time.perf_counter() - start, **fields
+    )
+
+    return result
+
+
+class Histogram():
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        """ Initialise cumulative histogram of observed values
+
+        Args:
+            buckets (tuple, optional): Sorted upper bounds of the buckets. Defaults to DURATION_BUCKETS.
+        """
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value: float):
+        """ Add value to the histogram
+
+        Args:
+            value (float): Observed value
+        """
+
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry():
+    def __init__(self, prefix: str = "panelapp"):
+        """ Initialise in-process registry of metrics, to use as a hook
+
+        Args:
+            prefix (str, optional): Prefix of the names of the metrics. Defaults to "panelapp".
+        """
+
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        # {(name, labels): value} where labels is a sorted tuple of pairs
+        self.counters = {}
+        self.histograms = {}
+
+    def __call__(self, event: str, fields: dict):
+        with self.lock:
+            if event == "request":
+                status = fields["status"]
+                labels = (("status", str(status) if status else "error"),)
+                self.increment("requests_total", labels)
+                self.increment("response_bytes_total", (), fields["bytes"])
+                self.observe("request_duration_seconds", (), fields["latency"])
+
+                if fields["attempt"]:
+                    self.increment("retries_total", ())
+            elif event == "cache":
+                self.increment("cache_total", (("result", fields["result"]),))
+            elif event == "parse":
+                self.observe(
+                    "parse_duration_seconds", (("stage", fields["stage"]),),
+                    fields["duration"]
+                )
+
+    def increment(self, name: str, labels: tuple, value: float = 1):
+        """ Add value to a counter
+
+        Args:
+            name (str): Name of the counter
+            labels (tuple): Pairs of label name and value
+            value (float, optional): Value to add. Defaults to 1.
+        """
+
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: tuple, value: float):
+        """ Add value to a histogram
+
+        Args:
+            name (str): Name of the histogram
+            labels (tuple): Pairs of label name and value
+            value (float): Observed value
+        """
+
+        key = (name, labels)
+
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+
+        self.histograms[key].observe(value)
+
+    def get(self, name: str, **labels):
+        """ Return value of a counter, or count of a histogram
+
+        Args:
+            name (str): Name of the metric without prefix
+            labels: Labels of the metric
+
+        Returns:
+            float: Value of the metric, 0 if never recorded
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            if key in self.histograms:
+                return self.histograms[key].count
+
+            return self.counters.get(key, 0)
+
+    def render(self):
+        """ Return the metrics in the OpenMetrics text format
+
+        Returns:
+            str: Metrics
+        """
+
+        lines = []
+
+        with self.lock:
+            for name in sorted({name for name, labels in self.counters}):
+                full_name = "{}_{}".format(self.prefix, name)
+                lines.append("# TYPE {} counter".format(full_name[:-len("_total")]))
+
+                for (key, labels), value in sorted(self.counters.items()):
+                    if key == name:
+                        lines.append("{}{} {}".format(
+                            full_name, format_labels(labels), value
+                        ))
+
+            for name in sorted({name for name, labels in self.histograms}):
+                full_name = "{}_{}".format(self.prefix, name)
+                lines.append("# TYPE {} histogram".format(full_name))
+
+                for (key, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0]
+                ):
+                    if key != name:
+                        continue
+
+                    cumulative = 0
+
+                    for bound, count in zip(
+                        histogram.buckets + ("+Inf",), histogram.counts
+                    ):
+                        cumulative += count
+                        lines.append("{}_bucket{} {}".format(
+                            full_name,
+                            format_labels(labels + (("le", str(bound)),)),
+                            cumulative
+                        ))
+
+                    lines.append("{}_sum{} {}".format(
+                        full_name, format_labels(labels), histogram.sum
+                    ))
+                    lines.append("{}_count{} {}".format(
+                        full_name, format_labels(labels), histogram.count
+                    ))
+
+        lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: tuple):
+    """ Return labels in the OpenMetrics format
+
+    Args:
+        labels (tuple): Pairs of label name and value
+
+    Returns:
+        str: Labels between braces, empty string if no labels
+    """
+
+    if not labels:
+        return ""
+
+    return "{{{}}}".format(",".join(
+        '{}="{}"'.format(name, value) for name, value in labels
+    ))
+
+
+class Profiler():
+    def __init__(self):
+        """ Initialise profiler recording the events of a block of code """
+
+        self.events = []
+        self.start = None
+        self.duration = None
+
+    def __call__(self, event: str, fields: dict):
+        # list.append is atomic, events can come from any thread
+        self.events.append((event, fields))
+
+    def __enter__(self):
+        self.events = []
+        self.start = time.perf_counter()
+        add_hook(self)
+
+        return self
+
+    def __exit__(self, *exc):
+        remove_hook(self)
+        self.duration = time.perf_counter() - self.start
+
+    def get_breakdown(self):
+        """ Return totals of the events recorded
+
+        Returns:
+            dict: Dict with requests, retries, errors, bytes, request_seconds,
+                  cache (dict {result: count}) and stages (dict {stage:
+                  (count, seconds)})
+        """
+
+        breakdown = {
+            "requests": 0, "retries": 0, "errors": 0, "bytes": 0,
+            "request_seconds": 0, "cache": {}, "stages": {},
+        }
+
+        for event, fields in self.events:
+            if event == "request":
+                breakdown["requests"] += 1
+                breakdown["retries"] += bool(fields["attempt"])
+                breakdown["errors"] += fields["error"] is not None
+                breakdown["bytes"] += fields["bytes"]
+                breakdown["request_seconds"] += fields["latency"]
+            elif event == "cache":
+                cache = breakdown["cache"]
+                cache[fields["result"]] = cache.get(fields["result"], 0) + 1
+            elif event == "parse":
+                count, seconds = breakdown["stages"].get(fields["stage"], (0, 0))
+                breakdown["stages"][fields["stage"]] = (
+                    count + 1, seconds + fields["duration"]
+                )
+
+        return breakdown
+
+    def report(self):
+        """ Return readable breakdown of where the time went
+
+        Time summed over the threads can be higher than the wall time.
+
+        Returns:
+            str: Report
+        """
+
+        breakdown = self.get_breakdown()
+        lines = [
+            "wall time\t{:.3f}s".format(self.duration or 0),
+            "requests\t{} ({} retries, {} errors)".format(
+                breakdown["requests"], breakdown["retries"],
+                breakdown["errors"]
+            ),
+            "request time\t{:.3f}s".format(breakdown["request_seconds"]),
+            "received\t{:.1f} MiB".format(breakdown["bytes"] / 1024 ** 2),
+        ]
+
+        if breakdown["cache"]:
+            lines.append("cache\t{}".format(", ".join(
+                "{} {}".format(count, result)
+                for result, count in sorted(breakdown["cache"].items())
+            )))
+
+        for stage, (count, seconds) in sorted(
+            breakdown["stages"].items(), key=lambda item: -item[1][1]
+        ):
+            lines.append("{}\t{:.3f}s ({} calls)".format(stage, seconds, count))
+
+        return "\n".join(lines)
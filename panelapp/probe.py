@@ -0,0 +1,282 @@
+""" Lightweight probe of the version and signedoff status of panels
+
+The probe answers from the panel listings only: one pass over the paginated
+"panels" and "panels/signedoff" listings gives the latest version, hash_id
+and signed_off date of every panel without downloading any genes. The map is
+kept for a short time and rebuilt once stale, so that repeated checks don't
+call the API at all.
+
+The probe is also where Panel.get and Panel.get_latest_version look for the
+latest version of a panel: versions from the listings and from the panels
+fetched without version are used for ttl seconds.
+
+    probe.probe_panels([3, 269])
+    probe.get_latest_version(269)
+    probe.set_probe(probe.PanelProbe(ttl=300))
+
+Listings go through the cache set with api.set_cache, whose ttl also bounds
+how fresh the answers are.
+"""
+
+import threading
+import time
+
+from .api import get_panelapp_response, iter_full_results_from_API
+
+
+PROBE_KEYS = ("id", "name", "version", "hash_id")
+
+
+class PanelProbe():
+    def __init__(self, ttl: float = 60):
+        """ Initialise probe answering from the panel listings
+
+        Args:
+            ttl (float, optional): Seconds during which the listings are used without calling the API. Defaults to 60.
+        """
+
+        self.ttl = ttl
+        # guards the entries and versions, never held during API calls
+        self.lock = threading.Lock()
+        # held by the caller reading the listings
+        self.refresh_lock = threading.Lock()
+        # {panel_id as str: entry}, see get_entries
+        self.entries = None
+        self.refreshed_at = 0
+        # {panel_id as str: (latest version, time it was seen)}
+        self.versions = {}
+
+    def refresh(self):
+        """ Read the panel and signedoff listings
+
+        Raises:
+            PanelappError: If one of the listings couldn't be retrieved
+
+        Returns:
+            dict: Dict {panel_id as str: entry}, see get_entries
+        """
+
+        entries = {}
+        data = get_panelapp_response(ext_url="panels", raise_errors=True)
+
+        for panel in iter_full_results_from_API(data):
+            entry = {key: panel.get(key) for key in PROBE_KEYS}
+            entry["signed_off"] = None
+            entry["signedoff_version"] = None
+            entries[str(panel["id"])] = entry
+
+        data = get_panelapp_response(
+            ext_url="panels/signedoff", raise_errors=True
+        )
+
+        for panel in iter_full_results_from_API(data):
+            # signedoff panels missing from the listing of the latest versions
+            entry = entries.setdefault(
+                str(panel["id"]), {key: panel.get(key) for key in PROBE_KEYS}
+            )
+            entry["signed_off"] = panel.get("signed_off")
+            entry["signedoff_version"] = panel.get("version")
+
+        return entries
+
+    def get_entries(self):
+        """ Return the entries of every panel, reading the listings if stale
+
+        Concurrent callers wait for a single refresh. The listings are read
+        without holding self.lock, so get_known_version and
+        set_latest_version don't wait for the API.
+
+        Raises:
+            PanelappError: If one of the listings couldn't be retrieved
+
+        Returns:
+            dict: Dict {panel_id as str: entry} where each entry is a dict
+                  with id, name, version (latest), hash_id, signed_off (date
+                  or None) and signedoff_version (None if never signed off)
+        """
+
+        entries = self.get_fresh_entries()
+
+        if entries is not None:
+            return entries
+
+        with self.refresh_lock:
+            # refreshed by another caller while waiting
+            entries = self.get_fresh_entries()
+
+            if entries is not None:
+                return entries
+
+            entries = self.refresh()
+            refreshed_at = time.time()
+
+            with self.lock:
+                self.entries = entries
+                self.refreshed_at = refreshed_at
+                self.versions.update(
+                    (panel_id, (entry["version"], refreshed_at))
+                    for panel_id, entry in entries.items()
+                )
+
+            return entries
+
+    def get_fresh_entries(self):
+        """ Return the entries if read less than ttl seconds ago
+
+        Returns:
+            dict: Dict {panel_id as str: entry}, None if stale or never read
+        """
+
+        with self.lock:
+            if (
+                self.entries is None or
+                time.time() - self.refreshed_at >= self.ttl
+            ):
+                return None
+
+            return self.entries
+
+    def probe(self, panel_ids: list):
+        """ Return the entries of the panels
+
+        Args:
+            panel_ids (list): Panel ids
+
+        Raises:
+            PanelappError: If one of the listings couldn't be retrieved
+
+        Returns:
+            dict: Dict {panel_id: entry} in the order given, None for panels
+                  absent from the listings
+        """
+
+        entries = self.get_entries()
+
+        return {
+            panel_id: entries.get(str(panel_id))
+            for panel_id in panel_ids
+        }
+
+    def get_latest_version(self, panel_id: str):
+        """ Return latest version of the panel
+
+        Args:
+            panel_id (str): Panel id
+
+        Returns:
+            str: Version, None if the panel isn't listed
+        """
+
+        entry = self.get_entries().get(str(panel_id))
+
+        return entry["version"] if entry else None
+
+    def get_known_version(self, panel_id: str):
+        """ Return latest version of the panel if seen less than ttl seconds
+        ago, without calling the API
+
+        Args:
+            panel_id (str): Panel id
+
+        Returns:
+            str: Version, None if unknown or stale
+        """
+
+        with self.lock:
+            version, seen_at = self.versions.get(str(panel_id), (None, 0))
+
+            if version is None or time.time() - seen_at >= self.ttl:
+                return None
+
+            return version
+
+    def set_latest_version(self, panel_id: str, version: str):
+        """ Remember the latest version of a panel fetched without version
+
+        Args:
+            panel_id (str): Panel id
+            version (str): Latest version
+        """
+
+        with self.lock:
+            self.versions[str(panel_id)] = (version, time.time())
+
+    def get_signedoff(self, panel_id: str):
+        """ Return signedoff date and version of the panel
+
+        Args:
+            panel_id (str): Panel id
+
+        Returns:
+            tuple: Date and version, (None, None) if not signedoff
+        """
+
+        entry = self.get_entries().get(str(panel_id))
+
+        if not entry:
+            return None, None
+
+        return entry["signed_off"], entry["signedoff_version"]
+
+    def clear(self):
+        """ Forget the listings and versions, the next probe reads them again """
+
+        with self.lock:
+            self.entries = None
+            self.refreshed_at = 0
+            self.versions.clear()
+
+
+_probe = PanelProbe()
+
+
+def set_probe(probe: PanelProbe):
+    """ Set the probe used by the functions of this module
+
+    Args:
+        probe (PanelProbe): Probe to use
+    """
+
+    global _probe
+
+    _probe = probe
+
+
+def get_probe():
+    """ Return the probe used by the functions of this module
+
+    Returns:
+        PanelProbe: Probe in use
+    """
+
+    return _probe
+
+
+def probe_panels(panel_ids: list):
+    """ Return version, hash_id and signedoff status of the panels, see PanelProbe.probe """
+
+    return _probe.probe(panel_ids)
+
+
+def get_latest_version(panel_id: str):
+    """ Return latest version of the panel, see PanelProbe.get_latest_version """
+
+    return _probe.get_latest_version(panel_id)
+
+
+def get_known_version(panel_id: str):
+    """ Return latest version of the panel if recently seen, see PanelProbe.get_known_version """
+
+    return _probe.get_known_version(panel_id)
+
+
+def set_latest_version(panel_id: str, version: str):
+    """ Remember the latest version of a panel, see PanelProbe.set_latest_version """
+
+    _probe.set_latest_version(panel_id, version)
+
+
+def get_signedoff(panel_id: str):
+    """ Return signedoff date and version of the panel, see PanelProbe.get_signedoff """
+
+    return _probe.get_signedoff(panel_id)
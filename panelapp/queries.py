@@ -1,29 +1,307 @@
-from .api import get_panelapp_response, get_full_results_from_API
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import warnings
+
+from .api import (
+    build_url, decode_content, get_panelapp_response,
+    iter_full_results_from_API
+)
 from .Panelapp import Panel
 
 
-def get_all_signedoff_panels(confidence_level: str = "3"):
-    """ Return list of signedoff panel objects
+def fetch_panel_data(panel_id: str, version: str = None):
+    """ Return data of the panel, raising instead of printing if the call fails
 
     Args:
-        confidence_level (str, optional): Specify. Defaults to "3".
+        panel_id (str): Panel id
+        version (str, optional): Version of the panel to get. Defaults to None.
+
+    Raises:
+        PanelappError: If the panel couldn't be retrieved
+
+    Returns:
+        dict: Data of the panel
+    """
+
+    url = build_url(["panels", str(panel_id)], {"version": version})
+
+    return get_panelapp_response(url, raise_errors=True)
+
+
+def fetch_panel(panel_id: str, version: str = None, confidence_level: str = "3"):
+    """ Return panel object, raising instead of printing if the call fails
+
+    Args:
+        panel_id (str): Panel id
+        version (str, optional): Version of the panel to get. Defaults to None.
+        confidence_level (str, optional): Confidence level. Defaults to "3".
+
+    Raises:
+        PanelappError: If the panel couldn't be retrieved
+
+    Returns:
+        Panel: Panel object
+    """
+
+    data = fetch_panel_data(panel_id, version)
+
+    return Panel(
+        panel_id=panel_id, version=version,
+        confidence_level=confidence_level, data=data
+    )
+
+
+def parse_panel(
+    url: str, content: bytes, panel_id: str, version: str = None,
+    confidence_level: str = "3"
+):
+    """ Return records and metadata of the panel built from the body of the response
+
+    Run in the worker processes of load_panels: only the records are pickled
+    back to the parent process, the decoded API data is dropped in the worker
+    and the panel is rebuilt with build_parsed_panel.
+
+    Args:
+        url (str): URL of the API call
+        content (bytes): Body of the response
+        panel_id (str): Panel id
+        version (str, optional): Version of the panel. Defaults to None.
+        confidence_level (str, optional): Confidence level. Defaults to "3".
 
     Returns:
-        list: List of panel objects
+        dict: Attributes of the panel without the API data, see Panel.__getstate__
+    """
+
+    state = Panel(
+        panel_id=panel_id, version=version, confidence_level=confidence_level,
+        data=decode_content(url, content), keep_data=False
+    ).__getstate__()
+    del state["data"], state["keep_data"]
+
+    return state
+
+
+def build_parsed_panel(state: dict, url: str = None, content: bytes = None):
+    """ Return panel object rebuilt from the records returned by parse_panel
+
+    If Panel.keep_data is set, the body of the response is kept undecoded and
+    decoded the first time get_data() is called.
+
+    Args:
+        state (dict): Attributes returned by parse_panel
+        url (str, optional): URL of the API call. Defaults to None.
+        content (bytes, optional): Body of the response. Defaults to None.
+
+    Returns:
+        Panel: Panel object
+    """
+
+    panel = Panel.__new__(Panel)
+    panel.__setstate__(state)
+    panel.data = None
+
+    if Panel.keep_data and content is not None:
+        panel.response = (url, content)
+
+    return panel
+
+
+def fetch_panel_content(panel_id: str, version: str = None):
+    """ Return URL and undecoded body of the response for the panel
+
+    Args:
+        panel_id (str): Panel id
+        version (str, optional): Version of the panel to get. Defaults to None.
+
+    Raises:
+        PanelappError: If the panel couldn't be retrieved
+
+    Returns:
+        tuple: URL and bytes of the response
+    """
+
+    url = build_url(["panels", str(panel_id)], {"version": version})
+
+    return url, get_panelapp_response(url, raise_errors=True, raw=True)
+
+
+def fetch_parsed_panel(
+    process_pool, panel_id: str, version: str = None,
+    confidence_level: str = "3"
+):
+    """ Return panel object parsed in the pool of processes once fetched
+
+    Args:
+        process_pool (ProcessPoolExecutor): Pool parsing the panels
+        panel_id (str): Panel id
+        version (str, optional): Version of the panel to get. Defaults to None.
+        confidence_level (str, optional): Confidence level. Defaults to "3".
+
+    Raises:
+        PanelappError: If the panel couldn't be retrieved
+
+    Returns:
+        Panel: Panel object
+    """
+
+    url, content = fetch_panel_content(panel_id, version)
+    state = process_pool.submit(
+        parse_panel, url, content, panel_id, version, confidence_level
+    ).result()
+
+    return build_parsed_panel(state, url, content)
+
+
+def load_panels(
+    panels_to_load: list, confidence_level: str = "3", max_workers: int = 8,
+    processes: int = None
+):
+    """ Build many panel objects using a bounded pool of threads
+
+    With processes, the threads only fetch the responses: decoding and
+    parsing run in a pool of processes to use several cores, and only the
+    records and metadata of the panels are pickled back, without the API
+    data or the gene indexes. The panels are rebuilt in this process, and
+    keep the undecoded response for get_data() if Panel.keep_data. Workers
+    started by fork (the default on Linux) use the decoder set with
+    api.set_decoder in the parent process.
+
+    Args:
+        panels_to_load (list): Panel ids or (panel_id, version) tuples, can be an iterator to start loading while it is consumed
+        confidence_level (str, optional): Confidence level. Defaults to "3".
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 8.
+        processes (int, optional): Number of processes parsing the panels. Defaults to None, parsing in the threads.
+
+    Returns:
+        tuple: Dict {panel_id: Panel} of loaded panels and dict
+               {panel_id: Exception} of panels that failed to load
     """
 
     panels = {}
+    failures = {}
+    process_pool = ProcessPoolExecutor(processes) if processes else None
 
-    signedoff_panels = get_panelapp_response(ext_url="panels/signedoff")
-    res = get_full_results_from_API(signedoff_panels)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+
+            for panel in panels_to_load:
+                if isinstance(panel, tuple):
+                    panel_id, version = panel
+                else:
+                    panel_id, version = panel, None
+
+                if process_pool is None:
+                    future = executor.submit(
+                        fetch_panel, panel_id, version, confidence_level
+                    )
+                else:
+                    future = executor.submit(
+                        fetch_parsed_panel, process_pool, panel_id, version,
+                        confidence_level
+                    )
 
-    for data in res:
-        panels[data["id"]] = Panel(
-            panel_id=data["id"],
-            version=data["version"],
-            confidence_level=confidence_level
+                futures[future] = panel_id
+
+            # results are gathered in submission order to keep the listing order
+            for future, panel_id in futures.items():
+                try:
+                    panels[panel_id] = future.result()
+                except Exception as e:
+                    failures[panel_id] = e
+    finally:
+        if process_pool is not None:
+            process_pool.shutdown()
+
+    return panels, failures
+
+
+def warn_failures(failures: dict):
+    """ Warn about the panels that couldn't be loaded and were skipped
+
+    Args:
+        failures (dict): Dict {panel_id: Exception} returned by load_panels
+    """
+
+    if failures:
+        warnings.warn(
+            "{} panel(s) couldn't be retrieved and were skipped: {}".format(
+                len(failures), "; ".join(
+                    "{} ({})".format(panel_id, error)
+                    for panel_id, error in failures.items()
+                )
+            ),
+            stacklevel=3
         )
 
+
+def prefetch_panels(panels: list, max_workers: int = 8):
+    """ Load many lazy panel objects using a bounded pool of threads
+
+    Args:
+        panels (list): Panel objects, the ones already loaded are skipped
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 8.
+
+    Returns:
+        dict: Dict {panel_id: Exception} of panels that failed to load
+    """
+
+    failures = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_panel_data, panel.id, panel.version): panel
+            for panel in panels
+            if not panel.is_loaded()
+        }
+
+        for future, panel in futures.items():
+            try:
+                panel.set_data(future.result())
+            except Exception as e:
+                failures[panel.id] = e
+
+    return failures
+
+
+def get_all_signedoff_panels(
+    confidence_level: str = "3", max_workers: int = 1, lazy: bool = False,
+    processes: int = None
+):
+    """ Return list of signedoff panel objects
+
+    Panels that couldn't be retrieved are skipped with a warning listing
+    them, use load_panels to get the failures.
+
+    Args:
+        confidence_level (str, optional): Specify. Defaults to "3".
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 1.
+        lazy (bool, optional): Only call the API for the panel data when it is needed. Defaults to False.
+        processes (int, optional): Number of processes parsing the panels, see load_panels. Defaults to None.
+
+    Returns:
+        dict: Dict of panel objects
+    """
+
+    signedoff_panels = get_panelapp_response(ext_url="panels/signedoff")
+    res = iter_full_results_from_API(signedoff_panels)
+
+    if lazy:
+        return {
+            data["id"]: Panel(
+                panel_id=data["id"], version=data["version"],
+                confidence_level=confidence_level, lazy=True,
+                name=data["name"]
+            )
+            for data in res
+        }
+
+    panels, failures = load_panels(
+        ((data["id"], data["version"]) for data in res),
+        confidence_level=confidence_level, max_workers=max_workers,
+        processes=processes
+    )
+    warn_failures(failures)
+
     return panels
 
 
@@ -34,25 +312,70 @@ def compare_versions(original_panel: Panel, compare_version: str):
         original_panel (Panel object): Panel object to compare
         compare_version (str): Version of the Panel object to compare to
 
+    Raises:
+        PanelappError: If the version couldn't be retrieved
+
     Returns:
         tuple: Tuple of sets with genes matched and not matched
     """
 
-    new_panel = Panel(
-        panel_id=original_panel.id,
-        version=compare_version,
-        confidence_level=original_panel.confidence_level
+    new_panel = Panel.get(
+        original_panel.id, compare_version, original_panel.confidence_level
     )
 
-    original_genes = original_panel.get_hgnc_ids(1, 2, 3)
-    compare_genes = new_panel.get_hgnc_ids(1, 2, 3)
+    original_genes = original_panel.get_hgnc_id_set(1, 2, 3)
+    compare_genes = new_panel.get_hgnc_id_set(1, 2, 3)
 
-    matches = set(original_genes).intersection(set(compare_genes))
-    difference = set(original_genes).symmetric_difference(set(compare_genes))
+    matches = set(original_genes.intersection(compare_genes))
+    difference = set(original_genes.symmetric_difference(compare_genes))
 
     return (matches, difference)
 
 
+def version_key(version: str):
+    """ Return key to sort panel versions numerically ("0.10" after "0.9")
+
+    Args:
+        version (str): Panel version
+
+    Returns:
+        tuple: Tuple of ints
+    """
+
+    return tuple(int(part) for part in str(version).split("."))
+
+
+def get_panel_versions(panel_id: str):
+    """ Return every version of the panel found in its activities
+
+    Args:
+        panel_id (str): Panel id
+
+    Raises:
+        PanelappError: If the activities couldn't be retrieved
+
+    Returns:
+        list: Versions sorted from oldest to latest
+    """
+
+    data = get_panelapp_response(
+        build_url(["panels", str(panel_id), "activities"]), raise_errors=True
+    )
+
+    if isinstance(data, dict):
+        activities = iter_full_results_from_API(data)
+    else:
+        activities = data
+
+    versions = {
+        activity["panel_version"]
+        for activity in activities
+        if activity.get("panel_version")
+    }
+
+    return sorted(versions, key=version_key)
+
+
 def get_signedoff_panel(panel_id: str):
     """ Return data for the latest version of a signedoff panel
 
@@ -69,18 +392,61 @@ def get_signedoff_panel(panel_id: str):
     return signedoff_panel
 
 
-def get_all_panels():
+def get_all_panels(
+    max_workers: int = 1, lazy: bool = False, processes: int = None
+):
     """ Returns all panels
 
+    Panels that couldn't be retrieved are skipped with a warning listing
+    them, use load_panels to get the failures.
+
+    Args:
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 1.
+        lazy (bool, optional): Only call the API for the panel data when it is needed. Defaults to False.
+        processes (int, optional): Number of processes parsing the panels, see load_panels. Defaults to None.
+
     Returns:
         dict: All panels in Panelapp
     """
 
-    all_panels = {}
     data = get_panelapp_response(ext_url="panels")
-    panels = get_full_results_from_API(data)
+    panels = iter_full_results_from_API(data)
 
-    for panel in panels:
-        all_panels[panel["id"]] = Panel(panel_id=panel["id"])
+    if lazy:
+        return {
+            panel["id"]: Panel(
+                panel_id=panel["id"], version=panel["version"], lazy=True,
+                name=panel["name"]
+            )
+            for panel in panels
+        }
+
+    all_panels, failures = load_panels(
+        (panel["id"] for panel in panels), max_workers=max_workers,
+        processes=processes
+    )
+    warn_failures(failures)
 
     return all_panels
+
+
+def expand_superpanels(panels):
+    """ Return the subpanels of the superpanels without any API call
+
+    Args:
+        panels (iterable): Panel objects or dict {panel_id: Panel}, panels that aren't superpanels are ignored
+
+    Returns:
+        dict: Dict {panel_id: Panel} of the subpanels
+    """
+
+    if isinstance(panels, dict):
+        panels = panels.values()
+
+    subpanels = {}
+
+    for panel in panels:
+        if panel.is_superpanel():
+            subpanels.update(panel.get_subpanel_panels())
+
+    return subpanels
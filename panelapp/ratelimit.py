@@ -0,0 +1,195 @@
+""" Client-side rate limiting of the API calls
+
+RateLimiter combines a token bucket (calls per second) with a cap on the
+number of calls in flight. In adaptive mode the cap follows AIMD: it grows
+by one call per window of healthy calls and is halved on 429, 5xx and
+timeouts. Once set with api.set_rate_limiter, it is shared by every thread
+making API calls, including the asyncio client which runs its calls in
+threads.
+"""
+
+import threading
+import time
+
+
+SUCCESS = "success"
+THROTTLED = "throttled"
+ERROR = "error"
+
+
+class TokenBucket():
+    def __init__(self, rate: float, capacity: float = None):
+        """ Initialise bucket refilled with rate tokens per second
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float, optional): Maximum number of tokens, i.e. size of the bursts. Defaults to rate.
+        """
+
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """ Take a token and return how long to wait before using it
+
+        Tokens can go negative so that waiting callers are served in order.
+
+        Returns:
+            float: Seconds to wait
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last) * self.rate
+            )
+            self.last = now
+            self.tokens -= 1
+            wait = max(0, -self.tokens / self.rate)
+
+            return max(wait, self.paused_until - now)
+
+    def acquire(self):
+        """ Wait for a token """
+
+        wait = self.reserve()
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """ Stop giving tokens for a while, i.e. when the server asks to retry later
+
+        Args:
+            seconds (float): Seconds to pause
+        """
+
+        with self.lock:
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + seconds
+            )
+
+
+class ConcurrencyLimiter():
+    def __init__(
+        self, limit: int = 8, adaptive: bool = False, min_limit: int = 1,
+        max_limit: int = 64, latency_target: float = 5.0,
+        decrease_factor: float = 0.5
+    ):
+        """ Initialise cap on the number of calls in flight
+
+        Args:
+            limit (int, optional): Initial maximum number of calls in flight. Defaults to 8.
+            adaptive (bool, optional): Adjust the limit with AIMD from the outcome of the calls. Defaults to False.
+            min_limit (int, optional): Lowest limit in adaptive mode. Defaults to 1.
+            max_limit (int, optional): Highest limit in adaptive mode. Defaults to 64.
+            latency_target (float, optional): Calls slower than this (seconds) count as unhealthy in adaptive mode. Defaults to 5.0.
+            decrease_factor (float, optional): Factor applied to the limit on unhealthy calls in adaptive mode. Defaults to 0.5.
+        """
+
+        self.limit = float(limit)
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.last_decrease = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """ Wait until a call can be made """
+
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+
+            self.in_flight += 1
+
+    def release(self, outcome: str = SUCCESS, latency: float = 0):
+        """ Free the slot of a call and adapt the limit to its outcome
+
+        Args:
+            outcome (str, optional): SUCCESS, THROTTLED or ERROR. Defaults to SUCCESS.
+            latency (float, optional): Duration of the call in seconds. Defaults to 0.
+        """
+
+        with self.condition:
+            self.in_flight -= 1
+
+            if self.adaptive:
+                if outcome == SUCCESS and latency <= self.latency_target:
+                    # +1 once a full window of calls succeeded
+                    self.limit = min(
+                        self.max_limit, self.limit + 1 / int(self.limit)
+                    )
+                else:
+                    now = time.monotonic()
+
+                    # decrease once per burst of failures, not once per call
+                    if now - self.last_decrease > max(latency, 1):
+                        self.limit = max(
+                            self.min_limit, self.limit * self.decrease_factor
+                        )
+                        self.last_decrease = now
+
+            self.condition.notify_all()
+
+
+class RateLimiter():
+    def __init__(
+        self, rate: float = None, burst: float = None,
+        max_concurrency: int = 8, adaptive: bool = False, **adaptive_options
+    ):
+        """ Initialise limiter of the API calls
+
+        Args:
+            rate (float, optional): Maximum calls per second, no limit if None. Defaults to None.
+            burst (float, optional): Calls that can be made at once above the rate. Defaults to rate.
+            max_concurrency (int, optional): Maximum number of calls in flight, initial value in adaptive mode. Defaults to 8.
+            adaptive (bool, optional): Adjust max_concurrency from the outcome of the calls. Defaults to False.
+            adaptive_options: Other arguments of ConcurrencyLimiter (min_limit, max_limit, latency_target...)
+        """
+
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = ConcurrencyLimiter(
+            max_concurrency, adaptive, **adaptive_options
+        )
+
+    def acquire(self):
+        """ Wait until a call can be made """
+
+        self.concurrency.acquire()
+
+        if self.bucket:
+            self.bucket.acquire()
+
+    def release(
+        self, outcome: str = SUCCESS, latency: float = 0,
+        retry_after: float = None
+    ):
+        """ Report the outcome of a call made after acquire()
+
+        Args:
+            outcome (str, optional): SUCCESS, THROTTLED or ERROR. Defaults to SUCCESS.
+            latency (float, optional): Duration of the call in seconds. Defaults to 0.
+            retry_after (float, optional): Seconds the server asked to wait, pauses every call. Defaults to None.
+        """
+
+        if retry_after and self.bucket:
+            self.bucket.pause(retry_after)
+
+        self.concurrency.release(outcome, latency)
+
+    def get_limit(self):
+        """ Return current maximum number of calls in flight
+
+        Returns:
+            int: Maximum number of calls in flight
+        """
+
+        return int(self.concurrency.limit)
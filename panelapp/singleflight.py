@@ -0,0 +1,71 @@
+""" Coalescing of identical calls in flight
+
+When several threads ask for the same key at the same time, only the first
+one runs the call and the others wait for its result (or its exception).
+"""
+
+import threading
+
+
+class Call():
+    def __init__(self):
+        """ Initialise call in flight """
+
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight():
+    def __init__(self):
+        """ Initialise group of calls in flight """
+
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.nb_coalesced = 0
+
+    def do(self, key, function, *args, **kwargs):
+        """ Run the function, or wait for the call with the same key in flight
+
+        The result is shared by every caller so it shouldn't be modified.
+
+        Args:
+            key: Key identifying identical calls, i.e. the URL
+            function (function): Function to run
+
+        Returns:
+            Value returned by the function
+        """
+
+        with self.lock:
+            call = self.calls.get(key)
+
+            if call is None:
+                call = self.calls[key] = Call()
+                leader = True
+            else:
+                call.waiters += 1
+                self.nb_coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+            call.done.set()
+
+        return call.result
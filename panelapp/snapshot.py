@@ -0,0 +1,269 @@
+""" Offline snapshot of the Panelapp catalogue
+
+dump_snapshot fetches every panel (optionally every version of every panel)
+into a single file where each panel is compressed on its own. An index at
+the end of the file gives the position of each (panel_id, version), so
+Snapshot can memory-map the file and build any panel without reading the
+others and without any API call.
+
+Layout: MAGIC, compressed panels, compressed JSON index, then a footer with
+the offset and length of the index followed by MAGIC.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from .api import (
+    build_url, decode_content, get_decoder, get_panelapp_response,
+    iter_full_results_from_API
+)
+from .Panelapp import Panel
+from .queries import fetch_panel_content, get_panel_versions, version_key
+
+
+MAGIC = b"PANELAPPSNAP0001"
+FOOTER = struct.Struct("<QQ")
+
+
+def dump_snapshot(
+    path: str, all_versions: bool = False, max_workers: int = 8,
+    compression_level: int = 6
+):
+    """ Fetch every panel and write them in a snapshot file
+
+    Args:
+        path (str): Path of the snapshot file
+        all_versions (bool, optional): Fetch every version of every panel instead of the latest ones. Defaults to False.
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 8.
+        compression_level (int, optional): zlib compression level of the panels. Defaults to 6.
+
+    Raises:
+        PanelappError: If the panel listing couldn't be retrieved
+
+    Returns:
+        dict: Dict {(panel_id, version): Exception} of panels that couldn't be fetched
+    """
+
+    data = get_panelapp_response(ext_url="panels", raise_errors=True)
+    latest = {
+        str(panel["id"]): panel["version"]
+        for panel in iter_full_results_from_API(data)
+    }
+    failures = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if all_versions:
+            versions = {}
+
+            for panel_id, future in [
+                (panel_id, executor.submit(get_panel_versions, panel_id))
+                for panel_id in latest
+            ]:
+                try:
+                    versions[panel_id] = future.result()
+                except Exception as e:
+                    failures[(panel_id, None)] = e
+                    versions[panel_id] = []
+
+                if latest[panel_id] not in versions[panel_id]:
+                    versions[panel_id].append(latest[panel_id])
+        else:
+            versions = {
+                panel_id: [version] for panel_id, version in latest.items()
+            }
+
+        futures = {
+            executor.submit(fetch_panel_content, panel_id, version): (panel_id, version)
+            for panel_id, panel_versions in versions.items()
+            for version in panel_versions
+        }
+
+        entries = []
+        tmp_path = "{}.tmp".format(path)
+
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+
+            # panels are written as they arrive, the index keeps their
+            # position, and dropped once written to not hold the catalogue
+            for future in as_completed(futures):
+                panel_id, version = futures.pop(future)
+
+                try:
+                    url, response = future.result()
+                except Exception as e:
+                    failures[(panel_id, version)] = e
+                    continue
+
+                # the response is stored as received, without decoding it
+                content = zlib.compress(response, compression_level)
+                entries.append([panel_id, version, f.tell(), len(content)])
+                f.write(content)
+
+            index = zlib.compress(json.dumps({
+                "created": time.time(),
+                "latest": latest,
+                "panels": entries,
+            }).encode("utf-8"))
+            index_offset = f.tell()
+            f.write(index)
+            f.write(FOOTER.pack(index_offset, len(index)))
+            f.write(MAGIC)
+
+        os.replace(tmp_path, str(path))
+
+    return failures
+
+
+class Snapshot():
+    def __init__(self, path: str):
+        """ Open snapshot file written by dump_snapshot
+
+        Args:
+            path (str): Path of the snapshot file
+        """
+
+        self.path = str(path)
+        self.file = open(self.path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        footer_start = len(self.map) - FOOTER.size - len(MAGIC)
+
+        if (
+            self.map[:len(MAGIC)] != MAGIC or
+            self.map[footer_start + FOOTER.size:] != MAGIC
+        ):
+            self.close()
+            raise ValueError("{} is not a panelapp snapshot".format(path))
+
+        index_offset, index_length = FOOTER.unpack(
+            self.map[footer_start:footer_start + FOOTER.size]
+        )
+        index = get_decoder()(zlib.decompress(
+            self.map[index_offset:index_offset + index_length]
+        ))
+
+        self.created = index["created"]
+        self.latest = index["latest"]
+        self.offsets = {
+            (panel_id, version): (offset, length)
+            for panel_id, version, offset, length in index["panels"]
+        }
+
+    def get_panel_ids(self):
+        """ Return ids of the panels in the snapshot
+
+        Returns:
+            list: List of panel ids
+        """
+
+        return list(self.latest)
+
+    def get_versions(self, panel_id: str):
+        """ Return versions of the panel in the snapshot
+
+        Args:
+            panel_id (str): Panel id
+
+        Returns:
+            list: Versions sorted from oldest to latest
+        """
+
+        panel_id = str(panel_id)
+
+        return sorted(
+            (version for key, version in self.offsets if key == panel_id),
+            key=version_key
+        )
+
+    def get_data(self, panel_id: str, version: str = None):
+        """ Return the data of the panel as returned by the API
+
+        Args:
+            panel_id (str): Panel id
+            version (str, optional): Version of the panel. Defaults to the latest version.
+
+        Raises:
+            KeyError: If the panel or the version isn't in the snapshot
+
+        Returns:
+            dict: Data of the panel
+        """
+
+        panel_id = str(panel_id)
+
+        if version is None:
+            version = self.latest[panel_id]
+
+        offset, length = self.offsets[(panel_id, version)]
+
+        # decoded like the responses of the API, with the decoder set
+        return decode_content(
+            build_url(["panels", panel_id], {"version": version}),
+            zlib.decompress(self.map[offset:offset + length])
+        )
+
+    def get_panel(
+        self, panel_id: str, version: str = None, confidence_level: str = "3"
+    ):
+        """ Return panel object built from the snapshot
+
+        Args:
+            panel_id (str): Panel id
+            version (str, optional): Version of the panel. Defaults to the latest version.
+            confidence_level (str, optional): Confidence level. Defaults to "3".
+
+        Raises:
+            KeyError: If the panel or the version isn't in the snapshot
+
+        Returns:
+            Panel: Panel object
+        """
+
+        return Panel(
+            panel_id=panel_id, confidence_level=confidence_level,
+            data=self.get_data(panel_id, version)
+        )
+
+    def get_all_panels(self, confidence_level: str = "3"):
+        """ Return the latest version of every panel of the snapshot
+
+        Args:
+            confidence_level (str, optional): Confidence level. Defaults to "3".
+
+        Returns:
+            dict: Dict {panel_id: Panel}
+        """
+
+        return {
+            int(panel_id): self.get_panel(
+                panel_id, version, confidence_level
+            )
+            for panel_id, version in self.latest.items()
+            if (panel_id, version) in self.offsets
+        }
+
+    def close(self):
+        """ Close the snapshot file """
+
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        panel_id, version = key
+
+        return (str(panel_id), version) in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
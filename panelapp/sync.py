@@ -0,0 +1,159 @@
+""" Incremental sync of the signedoff panels
+
+A manifest file keeps the id, version, hash_id and signed_off date of the
+signedoff panels seen during the last sync. Each sync only fetches the
+signedoff listing and downloads the panels that are new or changed since.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from .api import get_panelapp_response, iter_full_results_from_API
+from .queries import load_panels
+
+
+MANIFEST_KEYS = ("version", "hash_id", "signed_off")
+
+
+class ChangeSet():
+    def __init__(
+        self, added: dict, updated: dict, removed: dict, unchanged: list,
+        failures: dict
+    ):
+        """ Initialise result of a sync
+
+        Args:
+            added (dict): Dict {panel_id: Panel} of panels newly signedoff
+            updated (dict): Dict {panel_id: Panel} of panels with a new version or hash_id
+            removed (dict): Dict {panel_id: manifest entry} of panels not signedoff anymore
+            unchanged (list): Ids of the panels that didn't change
+            failures (dict): Dict {panel_id: Exception} of new or changed panels that failed to load, they are retried on the next sync
+        """
+
+        self.added = added
+        self.updated = updated
+        self.removed = removed
+        self.unchanged = unchanged
+        self.failures = failures
+
+    def has_changes(self):
+        """ Return whether anything changed since the last sync
+
+        Returns:
+            bool: True if panels were added, updated or removed
+        """
+
+        return bool(self.added or self.updated or self.removed)
+
+    def __str__(self):
+        return "added={}; updated={}; removed={}; unchanged={}; failed={}".format(
+            len(self.added), len(self.updated), len(self.removed),
+            len(self.unchanged), len(self.failures)
+        )
+
+
+def load_manifest(path: str):
+    """ Return the manifest of the last sync
+
+    Args:
+        path (str): Path of the manifest file
+
+    Returns:
+        dict: Dict {panel_id: dict} of version, hash_id and signed_off, empty if no manifest yet
+    """
+
+    if not Path(path).is_file():
+        return {}
+
+    with open(path) as f:
+        return {entry.pop("id"): entry for entry in json.load(f)}
+
+
+def save_manifest(path: str, manifest: dict):
+    """ Write the manifest, replacing the previous one atomically
+
+    Args:
+        path (str): Path of the manifest file
+        manifest (dict): Dict {panel_id: dict} of version, hash_id and signed_off
+    """
+
+    tmp_path = "{}.tmp".format(path)
+
+    with open(tmp_path, "w") as f:
+        json.dump(
+            [dict(entry, id=panel_id) for panel_id, entry in manifest.items()],
+            f, indent=1
+        )
+
+    os.replace(tmp_path, str(path))
+
+
+def sync_signedoff_panels(
+    manifest_path: str, confidence_level: str = "3", max_workers: int = 8
+):
+    """ Download the signedoff panels that changed since the last sync
+
+    Args:
+        manifest_path (str): Path of the manifest file, created on first sync
+        confidence_level (str, optional): Confidence level of the panels. Defaults to "3".
+        max_workers (int, optional): Maximum number of concurrent API calls. Defaults to 8.
+
+    Raises:
+        PanelappError: If the signedoff listing couldn't be retrieved
+
+    Returns:
+        ChangeSet: Panels added, updated, removed and unchanged
+    """
+
+    previous = load_manifest(manifest_path)
+    data = get_panelapp_response(ext_url="panels/signedoff", raise_errors=True)
+    current = {
+        panel["id"]: {key: panel.get(key) for key in MANIFEST_KEYS}
+        for panel in iter_full_results_from_API(data)
+    }
+
+    to_load = [
+        (panel_id, entry["version"])
+        for panel_id, entry in current.items()
+        if previous.get(panel_id) != entry
+    ]
+    panels, failures = load_panels(
+        to_load, confidence_level=confidence_level, max_workers=max_workers
+    )
+
+    added = {
+        panel_id: panel
+        for panel_id, panel in panels.items()
+        if panel_id not in previous
+    }
+    updated = {
+        panel_id: panel
+        for panel_id, panel in panels.items()
+        if panel_id in previous
+    }
+    removed = {
+        panel_id: entry
+        for panel_id, entry in previous.items()
+        if panel_id not in current
+    }
+    unchanged = [
+        panel_id
+        for panel_id, entry in current.items()
+        if previous.get(panel_id) == entry
+    ]
+
+    # failed panels keep their previous entry so that they are retried
+    manifest = {
+        panel_id: entry
+        for panel_id, entry in current.items()
+        if panel_id not in failures
+    }
+
+    for panel_id in failures:
+        if panel_id in previous:
+            manifest[panel_id] = previous[panel_id]
+
+    save_manifest(manifest_path, manifest)
+
+    return ChangeSet(added, updated, removed, unchanged, failures)
@@ -12,12 +12,19 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/NHS-NGS/panelapp",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(
+        exclude=["benchmarks", "benchmarks.*", "tests", "tests.*"]
+    ),
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.5',
+    python_requires='>=3.7',
     py_modules=["requests"],
+    extras_require={
+        "parquet": ["pyarrow"],
+        "json": ["orjson", "msgspec"],
+        "pandas": ["numpy", "pandas"],
+    },
 )
\ No newline at end of file
@@ -0,0 +1,10 @@
+import pytest
+
+from panelapp import api
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(api.time, "sleep", delays.append)
+    return delays
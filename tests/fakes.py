@@ -0,0 +1,29 @@
+""" Fake requests objects shared by the tests """
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b"{}", headers: dict = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.ok = status_code < 400
+
+
+class FakeSession:
+    """
+    Session returning the given responses (or raising the given exceptions) in order.
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.urls = []
+        self.headers = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.urls.append(url)
+        self.headers.append(headers or {})
+        response = self.responses.pop(0)
+
+        if isinstance(response, Exception):
+            raise response
+
+        return response
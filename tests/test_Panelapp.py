@@ -0,0 +1,303 @@
+import json
+import pickle
+
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api, probe, queries
+from panelapp.cache import PanelCache
+from panelapp.Panelapp import get_panel_cache, Panel
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockPanelapp(nb_panels=5) as server:
+        monkeypatch.setattr(api, "BASE_URL", server.url)
+        monkeypatch.setattr(probe, "_probe", probe.PanelProbe())
+        yield server
+
+
+class TestLazyPanel:
+    def test_no_call_until_data_is_needed(self, server):
+        panel = Panel(3, version="1.0", lazy=True, name="Synthetic panel 3")
+
+        assert panel.get_name() == "Synthetic panel 3"
+        assert panel.get_version() == "1.0"
+        assert not panel.is_loaded()
+        assert server.nb_requests == 0
+
+        assert panel.get_hgnc_ids(0, 1, 2, 3)
+        assert panel.is_superpanel() is False
+        assert panel.is_loaded()
+        assert server.nb_requests == 1
+
+    def test_failed_load_is_not_retried_on_access(self, server):
+        panel = Panel(999, lazy=True)
+
+        with pytest.raises(AttributeError):
+            panel.get_genes()
+
+        with pytest.raises(AttributeError):
+            panel.get_strs()
+
+        assert server.nb_requests == 1
+
+    def test_data_given(self, server):
+        panel = Panel(3, data=api.get_panelapp_response("panels/3"))
+
+        assert panel.get_id() == "3"
+        assert panel.get_hash_id() == "{:024x}".format(3)
+        assert server.nb_requests == 1
+
+
+class TestGeneIndexes:
+    def test_queries_match_the_raw_data(self, server):
+        panel = Panel(3)
+        genes = panel.get_data()["genes"]
+
+        green = [gene["gene_data"]["hgnc_id"] for gene in genes if gene["confidence_level"] == "3"]
+        amber_red = [
+            gene["gene_data"]["hgnc_symbol"]
+            for gene in genes
+            if gene["confidence_level"] in ("2", "1")
+        ]
+
+        assert panel.get_hgnc_ids() == green
+        assert sorted(panel.get_gene_symbols(2, 1)) == sorted(amber_red)
+        assert panel.get_hgnc_id_set(3) == frozenset(green)
+        assert len(panel.get_ensembl_ids("GRCh38", 0, 1, 2, 3)) == len(genes)
+        assert len(panel.get_genes(0, 1, 2, 3)) == len(genes)
+        assert panel.get_info()["green_genes"] == len(green)
+
+    def test_membership(self, server):
+        panel = Panel(3)
+        gene = panel.get_genes()[0]
+
+        assert panel.contains_hgnc(gene["hgnc_id"])
+        assert panel.contains_hgnc(gene["hgnc_id"], levels=(3, 2))
+        assert panel.contains_symbol(gene["symbol"], levels=(3,))
+        assert not panel.contains_hgnc("HGNC:0")
+        assert panel.get_gene(hgnc_id=gene["hgnc_id"]) == gene
+        assert panel.get_gene(symbol="GENE0") is None
+
+        with pytest.raises(AssertionError):
+            panel.contains_hgnc(gene["hgnc_id"], levels=("3",))
+
+
+class TestEntityRecords:
+    def test_records_read_like_api_data(self, server):
+        panel = Panel(3)
+        raw_str = panel.get_data()["strs"][0]
+        str_entity = panel.get_strs()[0]
+
+        for key in ("entity_name", "confidence_level", "chromosome", "grch37_coordinates", "grch38_coordinates"):
+            assert str_entity[key] == raw_str[key]
+
+        assert str_entity["gene_data"]["hgnc_id"] == raw_str["gene_data"]["hgnc_id"]
+        assert "panel" not in str_entity
+        assert panel.get_cnvs()[0]["type_of_variants"] == "cnv_loss"
+        assert panel.get_cnvs()[0].get("unknown") is None
+
+        gene = panel.get_genes()[0]
+        assert set(gene["ensembl_id"]) == {"GRCh37", "GRCh38"}
+
+    def test_other_api_fields_are_left_to_the_data(self, server):
+        panel = Panel(3)
+        raw_region = panel.get_data()["regions"][0]
+        region = panel.get_cnvs()[0]
+        raw_str = panel.get_data()["strs"][0]
+        str_entity = panel.get_strs()[0]
+
+        assert "phenotypes" in raw_region
+        assert "phenotypes" not in region
+        assert region.get("evidence") is None
+        assert str_entity["gene_data"]["hgnc_id"] == raw_str["gene_data"]["hgnc_id"]
+        assert json.loads(json.dumps(region.to_dict()))["entity_name"] == raw_region["entity_name"]
+        assert not hasattr(region, "__dict__")
+
+    def test_data_not_kept(self, server):
+        panel = Panel(3, keep_data=False)
+
+        assert panel.data is None
+        assert panel.get_hgnc_ids()
+        assert server.nb_requests == 1
+        assert panel.get_data()["id"] == 3
+        assert server.nb_requests == 2
+
+
+class TestPanelCache:
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        cache = PanelCache()
+        monkeypatch.setattr(Panel, "panel_cache", cache)
+        return cache
+
+    def test_versions_are_shared(self, server, cache):
+        panel = Panel.get(3, "1.0")
+
+        assert Panel.get(3, "1.0") is panel
+        assert Panel.get(3, "1.0", confidence_level="2") is not panel
+        assert server.nb_requests == 2
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["panels"] == 2
+        assert cache.get_stats()["size"] == 2 * len(
+            api.get_panelapp_response(
+                api.build_url(["panels", "3"], {"version": "1.0"}), raw=True
+            )
+        )
+
+    def test_latest_version(self, server, cache):
+        panel = Panel.get(3)
+
+        assert Panel.get(3) is panel
+        assert panel.get_latest_version() == panel.get_version()
+        assert queries.compare_versions(panel, panel.get_version())[1] == set()
+        assert server.nb_requests == 1
+        assert cache.get_stats()["hits"] == 2
+
+        probe.get_probe().ttl = 0
+        Panel.get(3)
+
+        assert server.nb_requests == 2
+
+    def test_latest_version_from_the_listings(self, server, cache):
+        probe.probe_panels([3])
+        requests = server.nb_requests
+
+        assert Panel(3, lazy=True).get_latest_version() == server.panels["3"]["version"]
+        assert Panel.get(3).get_version() == server.panels["3"]["version"]
+        assert server.nb_requests == requests + 1
+
+    def test_eviction(self, server, cache):
+        cache.max_panels = 2
+
+        for panel_id in (1, 2, 3):
+            Panel.get(panel_id, "1.0")
+
+        assert cache.get(1, "1.0") is None
+        assert cache.get(3, "1.0") is not None
+        assert cache.get_stats()["evictions"] == 1
+
+        cache.max_size = cache.size - 1
+        Panel.get(4, "1.0")
+
+        assert cache.get_stats()["panels"] == 1
+        assert cache.get(4, "1.0") is not None
+
+    def test_shared_panels_are_read_only(self, server, cache):
+        panel = Panel.get(3, "1.0")
+
+        with pytest.raises(TypeError):
+            panel.update_version("2.0")
+
+        assert Panel.get(3, "1.0").get_version() == "1.0"
+
+        copy = panel.copy()
+        copy.update_version(panel.get_version(), confidence_level="2")
+
+        assert copy.confidence_level == "2"
+        assert panel.confidence_level == "3"
+        assert copy.get_hgnc_ids(0, 1, 2, 3) == panel.get_hgnc_ids(0, 1, 2, 3)
+        assert not pickle.loads(pickle.dumps(panel)).read_only
+
+    def test_getters_of_shared_panels_return_copies(self, server, cache):
+        panel = Panel.get(3, "1.0")
+        nb_strs = len(panel.get_strs())
+        nb_cnvs = len(panel.get_cnvs())
+        ensembl_ids = panel.get_ensembl_ids("GRCh38", 0, 1, 2, 3)
+        nb_genes = len(panel.get_data()["genes"])
+
+        panel.get_strs().clear()
+        panel.get_cnvs().clear()
+        panel.get_subpanels().add(("1", "name", "1.0"))
+        panel.get_ensembl_ids("GRCh38", 0, 1, 2, 3)[0].append("ENSGX")
+        panel.get_data()["genes"].clear()
+
+        shared = Panel.get(3, "1.0")
+
+        assert len(shared.get_strs()) == nb_strs
+        assert len(shared.get_cnvs()) == nb_cnvs
+        assert shared.get_subpanels() == set()
+        assert shared.get_ensembl_ids("GRCh38", 0, 1, 2, 3) == ensembl_ids
+        assert len(shared.get_data()["genes"]) == nb_genes
+
+    def test_failures_raise(self, server, cache):
+        with pytest.raises(api.PanelappError):
+            Panel.get(999)
+
+        assert Panel(999, lazy=True).get_latest_version() is None
+
+        assert cache.get_stats()["panels"] == 0
+
+    def test_no_cache_by_default(self, server):
+        assert get_panel_cache() is None
+        assert Panel.get(3) is not Panel.get(3)
+        assert not Panel.get(3).read_only
+
+    def test_no_cache(self, server, monkeypatch):
+        monkeypatch.setattr(Panel, "panel_cache", None)
+
+        assert Panel.get(3) is not Panel.get(3)
+        assert server.nb_requests == 2
+
+
+class TestPickling:
+    def test_round_trip(self, server):
+        panel = Panel(3)
+        copy = pickle.loads(pickle.dumps(panel))
+
+        assert "gene_index" not in panel.__getstate__()
+        assert copy.get_hgnc_ids(0, 1, 2, 3) == panel.get_hgnc_ids(0, 1, 2, 3)
+        assert copy.get_strs() == panel.get_strs()
+        assert copy.get_cnvs() == panel.get_cnvs()
+        assert copy.contains_symbol(panel.get_gene_symbols()[0])
+        assert copy.get_data() == panel.get_data()
+
+    def test_lazy_panel_stays_lazy(self, server):
+        copy = pickle.loads(pickle.dumps(Panel(3, lazy=True)))
+
+        assert not copy.is_loaded()
+        assert copy.get_hgnc_ids(0, 1, 2, 3)
+        assert server.nb_requests == 1
+
+
+class TestSuperpanels:
+    @pytest.fixture
+    def server(self, monkeypatch):
+        with MockPanelapp(nb_panels=12, nb_superpanels=2) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            yield server
+
+    def test_subpanels(self, server):
+        panel = Panel(13)
+        data = panel.get_data()
+
+        assert panel.is_superpanel()
+        assert panel.get_subpanels() == {
+            (panel_id, "Synthetic panel {}".format(panel_id), "1.0")
+            for panel_id in range(1, 11)
+        }
+        assert {
+            str_entity["panel"]["id"] for str_entity in data["strs"]
+        } <= {subpanel[0] for subpanel in panel.get_subpanels()}
+
+    def test_subpanel_panels_are_built_without_calls(self, server):
+        panels, failures = queries.load_panels([13, 14])
+        subpanels = queries.expand_superpanels(panels)
+        subpanel = subpanels[1]
+
+        assert server.nb_requests == 2
+        assert sorted(subpanels) == list(range(1, 11))
+        assert panels[14].get_subpanel_panels()[1] is subpanel
+        assert subpanel.get_name() == "Synthetic panel 1"
+        assert subpanel.get_hash_id() == "{:024x}".format(1)
+        assert subpanel.is_loaded() and not subpanel.is_superpanel()
+        assert set(subpanel.get_hgnc_ids(0, 1, 2, 3)) == {
+            gene["hgnc_id"]
+            for gene in panels[13].get_genes(0, 1, 2, 3)
+            if gene["panel"]["id"] == 1
+        }
+        assert all(
+            str_entity["panel"]["id"] == 1 for str_entity in subpanel.get_strs()
+        )
+        assert server.nb_requests == 2
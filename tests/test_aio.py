@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import aio, api
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockPanelapp(nb_panels=250, nb_genes=20, latency=0.05) as server:
+        monkeypatch.setattr(api, "BASE_URL", server.url)
+        yield server
+
+
+class TestAsyncClient:
+    def test_panels_load_concurrently(self, server):
+        async def main():
+            async with aio.AsyncClient(max_connections=20) as client:
+                start = time.perf_counter()
+                panels, failures = await client.load_panels(range(1, 41))
+                return panels, failures, time.perf_counter() - start
+
+        panels, failures, elapsed = asyncio.run(main())
+
+        assert failures == {}
+        assert list(panels) == list(range(1, 41))
+        # 40 calls of 50 ms each, 20 at a time
+        assert elapsed < 40 * 0.05 / 2
+
+    def test_queries(self, server):
+        async def main():
+            async with aio.AsyncClient() as client:
+                listing = await client.get_all_panels(lazy=True)
+                signedoff = await client.get_signedoff_panel(3)
+                panel = await client.get_panel(3)
+                matches, differences = await client.compare_versions(panel, "0.1")
+                missing = await client.load_panels([999])
+                return listing, signedoff, panel, matches, differences, missing
+
+        listing, signedoff, panel, matches, differences, missing = asyncio.run(main())
+
+        assert list(listing) == list(range(1, 251))
+        assert signedoff["results"][0]["id"] == 3
+        assert panel.get_name() == "Synthetic panel 3"
+        assert matches | differences >= panel.get_hgnc_id_set(1, 2, 3)
+        assert isinstance(missing[1][999], api.PanelappError)
+
+    def test_default_client_across_event_loops(self, server):
+        aio.set_client(None)
+
+        try:
+            for i in range(2):
+                panel = asyncio.run(aio.create_panel(1))
+                assert panel.get_id() == "1"
+        finally:
+            aio.get_client().close()
+            aio.set_client(None)
+
+    def test_session_given_is_left_open(self):
+        session = api.create_session()
+        session.close = lambda: pytest.fail("session of the caller closed")
+
+        with_session = aio.AsyncClient(session=session)
+        with_session.close()
+
+        closed = []
+        own_session = aio.AsyncClient()
+        own_session.session.close = lambda: closed.append(True)
+        own_session.close()
+
+        assert closed == [True]
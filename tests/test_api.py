@@ -0,0 +1,130 @@
+import pytest
+import requests
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api
+from panelapp.cache import FileCache, SQLiteCache, is_immutable_url
+from tests.fakes import FakeResponse, FakeSession
+
+
+class TestBuildUrl:
+    def test_empty_params_are_dropped(self):
+        assert api.build_url(["panels", "3"], {"version": None}) == "panels/3"
+        assert api.build_url(["panels", "3"], {"version": "1.2"}) == "panels/3?version=1.2"
+
+
+class TestGetPanelappResponse:
+    def test_transient_errors_are_retried(self, sleeps):
+        session = FakeSession(
+            requests.ConnectionError("reset"),
+            FakeResponse(503),
+            FakeResponse(200, b'{"id": 3}'),
+        )
+
+        assert api.get_panelapp_response("panels/3", session=session) == {"id": 3}
+        assert len(session.urls) == 3
+        assert len(sleeps) == 2
+
+    def test_permanent_errors_are_not_retried(self, sleeps):
+        session = FakeSession(FakeResponse(404), FakeResponse(200))
+
+        assert api.get_panelapp_response("panels/x", session=session) is None
+        assert len(session.urls) == 1
+        assert sleeps == []
+
+    def test_retry_after_is_honoured(self, sleeps):
+        session = FakeSession(
+            FakeResponse(429, headers={"Retry-After": "7"}),
+            FakeResponse(200, b"[]"),
+        )
+
+        assert api.get_panelapp_response("panels", session=session) == []
+        assert sleeps == [7.0]
+
+    def test_raise_errors_after_last_attempt(self, sleeps):
+        session = FakeSession(*[FakeResponse(500) for i in range(3)])
+
+        with pytest.raises(api.PanelappError):
+            api.get_panelapp_response(
+                "panels", session=session, raise_errors=True, retries=3
+            )
+
+        assert len(sleeps) == 2
+
+    def test_backoff_grows_with_attempts(self):
+        for attempt in range(5):
+            delay = api.get_retry_delay(attempt)
+            assert 0 <= delay <= api.BACKOFF_FACTOR * 2 ** attempt
+
+
+class TestPagination:
+    @pytest.mark.parametrize("prefetch", [True, False])
+    def test_results_of_every_page_are_yielded(self, monkeypatch, prefetch):
+        with MockPanelapp(nb_panels=250, nb_genes=1) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            data = api.get_panelapp_response("panels")
+            results = api.iter_full_results_from_API(data, prefetch=prefetch)
+
+            assert [panel["id"] for panel in results] == list(range(1, 251))
+            assert server.nb_requests == 3
+
+    def test_full_results_are_flattened(self):
+        data = {"next": None, "results": [{"id": 1}, {"id": 2}]}
+
+        assert api.get_full_results_from_API(data) == [{"id": 1}, {"id": 2}]
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def cache(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        cache = SQLiteCache(tmp_path / "cache.sqlite", ttl=60, max_size=100)
+    else:
+        cache = FileCache(tmp_path / "cache", ttl=60, max_size=100)
+
+    monkeypatch.setattr(api, "_cache", cache)
+    yield cache
+    cache.close()
+
+
+class TestCache:
+    def test_immutable_urls(self):
+        assert is_immutable_url(api.BASE_URL + "panels/3?version=1.2")
+        assert not is_immutable_url(api.BASE_URL + "panels/3")
+        assert not is_immutable_url(api.BASE_URL + "panels/signedoff?version=1.2")
+
+    def test_versioned_panels_are_fetched_once(self, cache):
+        session = FakeSession(FakeResponse(200, b'{"id": 3}'))
+
+        for i in range(3):
+            data = api.get_panelapp_response("panels/3?version=1.2", session=session)
+            assert data == {"id": 3}
+
+        assert len(session.urls) == 1
+
+    def test_stale_entries_are_revalidated(self, cache):
+        session = FakeSession(
+            FakeResponse(200, b'{"id": 3}', headers={"ETag": '"abc"'}),
+            FakeResponse(304),
+        )
+
+        api.get_panelapp_response("panels/3", session=session)
+        assert api.get_panelapp_response("panels/3", session=session) == {"id": 3}
+        assert len(session.urls) == 1
+
+        cache.ttl = 0
+        assert api.get_panelapp_response("panels/3", session=session) == {"id": 3}
+        assert session.headers[-1] == {"If-None-Match": '"abc"'}
+
+    def test_least_recently_used_entries_are_evicted(self, cache):
+        body = b'"' + b"x" * 38 + b'"'
+        session = FakeSession(*[FakeResponse(200, body) for i in range(3)])
+
+        for panel_id in (1, 2):
+            api.get_panelapp_response("panels/{}?version=1.0".format(panel_id), session=session)
+
+        # panel 1 becomes the most recently used
+        cache.get(api.BASE_URL + "panels/1?version=1.0")
+        api.get_panelapp_response("panels/3?version=1.0", session=session)
+
+        assert cache.get(api.BASE_URL + "panels/1?version=1.0") is not None
+        assert cache.get(api.BASE_URL + "panels/2?version=1.0") is None
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+from benchmarks import run
+from benchmarks.mock_server import MockPanelapp, load_recording
+from panelapp import api
+from panelapp.Panelapp import Panel
+
+
+class TestMockPanelapp:
+    def test_superpanels(self, monkeypatch):
+        with MockPanelapp(nb_panels=12, nb_superpanels=1) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            panel = Panel(13)
+
+        assert panel.is_superpanel()
+        assert len(panel.get_subpanels()) == 10
+
+    def test_injected_errors(self, monkeypatch):
+        monkeypatch.setattr(api.time, "sleep", lambda delay: None)
+
+        with MockPanelapp(nb_panels=2, error_rate=0.5) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            responses = [
+                api.get_panelapp_response("panels/1", retries=1)
+                for i in range(40)
+            ]
+
+        assert 0 < responses.count(None) < 40
+
+    def test_recording(self, tmp_path, monkeypatch):
+        path = tmp_path / "recording.json.gz"
+
+        with gzip.open(path, "wt") as f:
+            json.dump({"7": {"id": 7, "name": "Recorded"}}, f)
+
+        with MockPanelapp(panels=load_recording(path)) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+
+            assert api.get_panelapp_response("panels/7")["name"] == "Recorded"
+            assert api.get_panelapp_response("panels")["count"] == 1
+
+
+class TestRun:
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        assert run.percentile(values, 50) == 50
+        assert run.percentile(values, 99) == 99
+        assert run.percentile([3], 95) == 3
+
+    def test_compare(self):
+        baseline = {"p50_ms": 10, "peak_mib": 1}
+
+        assert run.compare({"a": {"p50_ms": 19, "peak_mib": 1}}, {"a": baseline}) == []
+        assert run.compare({"a": {"p50_ms": 21, "peak_mib": 1}}, {"a": baseline}) == [
+            "a p50_ms: 21 > 10 (baseline)"
+        ]
+        assert run.compare({"b": {"p50_ms": 16, "peak_mib": 1}}, {"a": baseline}) == []
@@ -0,0 +1,67 @@
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api, queries
+
+np = pytest.importorskip("numpy")
+columnar = pytest.importorskip("panelapp.columnar")
+
+
+@pytest.fixture(scope="module")
+def panels():
+    with MockPanelapp(nb_panels=4) as server:
+        base_url = api.BASE_URL
+        api.BASE_URL = server.url
+
+        try:
+            yield queries.get_all_panels(max_workers=4)
+        finally:
+            api.BASE_URL = base_url
+
+
+class TestEntityTable:
+    def test_rows_match_the_panels(self, panels):
+        table = columnar.build_table(panels)
+        panel = panels[2]
+        rows = table.filter(panel_ids=(2,))
+
+        assert len(table) == sum(
+            len(panel.get_genes(0, 1, 2, 3)) + len(panel.get_strs()) + len(panel.get_cnvs())
+            for panel in panels.values()
+        )
+        assert list(rows.filter(entity_types=("gene",))["hgnc_id"]) == panel.get_hgnc_ids(3, 2, 1, 0)
+        assert list(rows.filter(entity_types=("str",))["grch38_start"]) == [
+            str_entity.grch38_start for str_entity in panel.get_strs()
+        ]
+        assert (rows.filter(entity_types=("gene",))["grch37_start"] == columnar.MISSING).all()
+        assert rows.filter(entity_types=("cnv",))["hgnc_id"][0] is None
+
+    def test_filter_by_confidence_level(self, panels):
+        table = columnar.build_table(panels).filter(
+            confidence_levels=(3,), entity_types=("gene",)
+        )
+
+        assert set(table["confidence_level"]) == {3}
+        assert len(table) == sum(
+            len(panel.get_genes(3)) for panel in panels.values()
+        )
+
+    def test_set_operations(self, panels):
+        table = columnar.build_table(panels).filter(entity_types=("gene",))
+        gene_sets = {
+            panel_id: panel.get_hgnc_id_set(0, 1, 2, 3)
+            for panel_id, panel in panels.items()
+        }
+
+        assert set(table.intersection(panel_ids=(1, 2))) == gene_sets[1] & gene_sets[2]
+        assert set(table.union()) == frozenset.union(*gene_sets.values())
+        assert set(table.difference(1, 2)) == gene_sets[1] - gene_sets[2]
+        assert table.count_panels()[next(iter(gene_sets[3]))] >= 1
+
+    def test_dataframe(self, panels):
+        pytest.importorskip("pandas")
+        df = columnar.build_table(panels).to_dataframe()
+
+        assert list(df.columns) == list(columnar.COLUMNS)
+        assert df["panel_id"].dtype == "category"
+        assert df["grch37_start"].isna().sum() == (df["entity_type"] == "gene").sum()
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from benchmarks.mock_server import make_panel
+from panelapp import api, decode
+from panelapp.Panelapp import Panel
+from tests.fakes import FakeResponse, FakeSession
+
+
+@pytest.fixture
+def content():
+    subpanels = [make_panel(panel_id, nb_genes=0) for panel_id in (1, 2)]
+    panel = make_panel(10, nb_genes=20, subpanels=subpanels)
+
+    return json.dumps(panel).encode("utf-8")
+
+
+@pytest.fixture
+def decoder():
+    yield
+    api.set_decoder()
+
+
+class TestDecoders:
+    @pytest.mark.parametrize("name", sorted(decode.DECODERS))
+    def test_decoders_parse_bytes(self, name, content):
+        assert decode.get_decoder(name)(content) == json.loads(content)
+
+    def test_missing_decoder(self):
+        with pytest.raises(ValueError):
+            decode.get_decoder("simdjson")
+
+    def test_typed_panel_keeps_used_fields(self, content):
+        data = decode.decode_panel(content)
+
+        assert "disease_group" not in data
+        assert "hgnc_symbol" in data["genes"][0]["gene_data"]
+        assert "panel" in data["strs"][0]
+
+        full = Panel(10, data=json.loads(content))
+        typed = Panel(10, data=data)
+
+        assert typed.get_hgnc_ids(0, 1, 2, 3) == full.get_hgnc_ids(0, 1, 2, 3)
+        assert typed.get_strs() == full.get_strs()
+        assert typed.get_cnvs() == full.get_cnvs()
+        assert typed.get_subpanels() == full.get_subpanels()
+        assert typed.get_info() == full.get_info()
+
+
+class TestApiDecoding:
+    def test_raw_response(self, content):
+        session = FakeSession(FakeResponse(200, content))
+
+        assert api.get_panelapp_response(
+            "panels/10", session=session, raw=True
+        ) is content
+
+    def test_typed_panels(self, content, decoder):
+        api.set_decoder("json", typed_panels=True)
+        session = FakeSession(
+            FakeResponse(200, content), FakeResponse(200, b'{"next": null}')
+        )
+
+        assert "types" not in api.get_panelapp_response(
+            "panels/10/?version=1.0", session=session
+        )
+        assert api.get_panelapp_response("panels", session=session) == {
+            "next": None
+        }
@@ -0,0 +1,43 @@
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api
+from panelapp.diff import PanelHistory, compare_version_history
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockPanelapp(nb_panels=2, nb_genes=200) as server:
+        monkeypatch.setattr(api, "BASE_URL", server.url)
+        yield server
+
+
+class TestPanelHistory:
+    def test_every_version_is_fetched_once(self, server):
+        history = PanelHistory(1)
+        diffs = history.diff()
+
+        assert [(diff.old_version, diff.new_version) for diff in diffs] == [
+            ("0.1", "0.2"), ("0.2", "0.10"), ("0.10", "1.0")
+        ]
+        assert server.nb_requests == 5
+
+        history.diff(start="0.2")
+        assert server.nb_requests == 5
+
+    def test_gene_changes_match_sets(self, server):
+        diff, = compare_version_history(1, versions=["1.0", "0.2"])
+        history = PanelHistory(1)
+        old, new = history.get_snapshots(["0.2", "1.0"])
+
+        old_genes = old.get_hgnc_id_set(0, 1, 2, 3)
+        new_genes = new.get_hgnc_id_set(0, 1, 2, 3)
+        added = {change.entity_name for change in diff.get_changes("gene", "added")}
+        removed = {change.entity_name for change in diff.get_changes("gene", "removed")}
+
+        assert added == new_genes - old_genes
+        assert removed == old_genes - new_genes
+        assert diff.get_changes("gene", "promoted") or diff.get_changes("gene", "demoted")
+
+        for change in diff.get_changes(change="promoted"):
+            assert change.new_level > change.old_level
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import gzip
+
+import pytest
+
+from benchmarks.mock_server import make_panel
+from panelapp import export
+from panelapp.export import (
+    COLUMNS, bounded_map, write_panel_files, write_panels
+)
+from panelapp.Panelapp import Panel
+
+
+def get_panels():
+    return {
+        panel_id: Panel(panel_id, data=make_panel(panel_id, nb_genes=30))
+        for panel_id in range(1, 6)
+    }
+
+
+def count_rows(panels, levels=("3",)):
+    return sum(
+        len(panel.get_genes(*[int(level) for level in levels])) +
+        len([entity for entity in panel.get_strs() + panel.get_cnvs() if entity.confidence_level in levels])
+        for panel in panels.values()
+    )
+
+
+class TestWritePanels:
+    @pytest.mark.parametrize("file_name", ["panels.tsv", "panels.tsv.gz"])
+    def test_tsv(self, tmp_path, file_name):
+        panels = get_panels()
+        path = tmp_path / file_name
+        write_panels(panels, path, max_workers=3)
+
+        opener = gzip.open if file_name.endswith(".gz") else open
+
+        with opener(path, "rt") as f:
+            rows = list(csv.DictReader(f, delimiter="\t"))
+
+        assert tuple(rows[0]) == COLUMNS
+        assert len(rows) == count_rows(panels)
+        assert [row["panel_id"] for row in rows] == sorted(row["panel_id"] for row in rows)
+        assert {row["entity_type"] for row in rows} <= {"gene", "str", "cnv"}
+
+    def test_confidence_levels(self, tmp_path):
+        panels = get_panels()
+        path = tmp_path / "panels.tsv"
+        write_panels(panels, path, confidence_levels=(3, 2))
+
+        with open(path) as f:
+            assert len(f.readlines()) == count_rows(panels, ("3", "2")) + 1
+
+    @pytest.mark.parametrize("file_name", ["panels.parquet", "panels.arrow"])
+    def test_columnar(self, tmp_path, file_name):
+        pyarrow = pytest.importorskip("pyarrow")
+        import pyarrow.feather
+        import pyarrow.parquet
+
+        panels = get_panels()
+        path = tmp_path / file_name
+        write_panels(panels, path)
+
+        if file_name.endswith(".parquet"):
+            table = pyarrow.parquet.read_table(path)
+        else:
+            table = pyarrow.feather.read_table(path)
+
+        assert table.column_names == list(COLUMNS)
+        assert table.num_rows == count_rows(panels)
+        assert table.schema.field("grch37_start").type == pyarrow.int64()
+
+    @pytest.mark.parametrize("file_name", ["panels.parquet", "panels.arrow"])
+    def test_columnar_empty_panels(self, tmp_path, monkeypatch, file_name):
+        """
+        Panels without rows at the levels exported don't write empty batches
+        """
+        pyarrow = pytest.importorskip("pyarrow")
+        import pyarrow.feather
+        import pyarrow.parquet
+
+        monkeypatch.setattr(export, "BATCH_SIZE", 7)
+        panels = get_panels()
+        empty = Panel(
+            99, data=dict(make_panel(99, nb_genes=0), strs=[], regions=[])
+        )
+        path = tmp_path / file_name
+        write_panels([empty] * 60 + list(panels.values()), path)
+
+        if file_name.endswith(".parquet"):
+            table = pyarrow.parquet.read_table(path)
+        else:
+            table = pyarrow.feather.read_table(path)
+
+        assert table.num_rows == count_rows(panels)
+
+    def test_panel_files(self, tmp_path):
+        panels = get_panels()
+        write_panel_files(panels, tmp_path, max_workers=3)
+
+        assert len(list(tmp_path.iterdir())) == 5
+
+    def test_rendering_stays_close_to_writing(self):
+        submitted = []
+
+        def items():
+            for item in range(20):
+                submitted.append(item)
+                yield item
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for result in bounded_map(executor, lambda item: item * 2, items(), 4):
+                # the item yielded and at most 4 submitted after it
+                assert len(submitted) <= result // 2 + 1 + 4
+
+        assert len(submitted) == 20
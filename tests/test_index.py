@@ -0,0 +1,50 @@
+from benchmarks.mock_server import make_panel
+from panelapp.index import GeneIndex
+from panelapp.Panelapp import Panel
+
+
+def get_panels():
+    return [
+        Panel(panel_id, data=make_panel(panel_id, nb_genes=100))
+        for panel_id in range(1, 21)
+    ]
+
+
+class TestGeneIndex:
+    def test_lookups_match_panels(self):
+        panels = get_panels()
+        index = GeneIndex.build(panels)
+        hgnc_id = panels[0].get_hgnc_ids(0, 1, 2, 3)[0]
+
+        assert index.get_panel_ids(hgnc_id) == {
+            panel.get_id() for panel in panels if panel.contains_hgnc(hgnc_id, levels=(0, 1, 2, 3))
+        }
+        assert {hit[0] for hit in index.lookup(hgnc_id, levels=(3,))} == {
+            panel.get_id() for panel in panels if panel.contains_hgnc(hgnc_id, levels=(3,))
+        }
+
+        symbol = panels[0].get_gene(hgnc_id=hgnc_id)["symbol"]
+        assert index.lookup(symbol, "symbol") == index.lookup(hgnc_id)
+
+    def test_set_algebra(self):
+        panels = get_panels()
+        index = GeneIndex.build(panels)
+        genes = panels[3].get_hgnc_ids(0, 1, 2, 3)[:5]
+
+        assert "4" in index.panels_with_all(genes)
+        assert index.panels_with_any(genes) >= index.panels_with_all(genes)
+        assert index.count_panels(genes)["4"] == len(set(genes))
+        assert index.genes_missing(genes + ["HGNC:0"]) == {"HGNC:0"}
+
+    def test_replace_and_save(self, tmp_path):
+        panels = get_panels()
+        index = GeneIndex.build(panels)
+        index.add_panel(Panel(1, data=make_panel(1, version="2.0", nb_genes=10)))
+
+        path = tmp_path / "index.json.gz"
+        index.save(path)
+        loaded = GeneIndex.load(path)
+
+        assert len(loaded) == 20
+        assert loaded.panels["1"][0] == "2.0"
+        assert loaded.index == index.index
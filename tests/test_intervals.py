@@ -0,0 +1,118 @@
+import pytest
+
+from benchmarks.mock_server import make_panel
+from panelapp.Panelapp import Panel
+
+np = pytest.importorskip("numpy")
+intervals = pytest.importorskip("panelapp.intervals")
+
+
+@pytest.fixture(scope="module")
+def panels():
+    return {
+        panel_id: Panel(panel_id, data=make_panel(panel_id, nb_genes=0, nb_strs=30, nb_regions=30))
+        for panel_id in range(1, 6)
+    }
+
+
+def scan(panels, chromosome, start, end):
+    """ Linear scan used as reference """
+
+    return sorted(
+        (panel.get_id(), entity.entity_name, entity.confidence_level)
+        for panel in panels.values()
+        for entity in panel.get_strs() + panel.get_cnvs()
+        if entity.chromosome == chromosome and
+        entity.grch38_start <= end and entity.grch38_end >= start
+    )
+
+
+class TestIntervalIndex:
+    def test_points_match_linear_scan(self, panels):
+        index = intervals.IntervalIndex.build(panels)
+        rng = np.random.default_rng(0)
+        chromosomes = rng.choice([str(i) for i in range(1, 23)], 2000).astype(object)
+        positions = rng.integers(1000000, 60000000, 2000)
+        # positions inside the entities to get overlaps
+        entity = panels[1].get_cnvs()[0]
+        chromosomes[:10] = "chr" + entity.chromosome
+        positions[:10] = entity.grch38_start + np.arange(10)
+
+        query_ids, entity_ids = index.query_points(chromosomes, positions)
+        hits = {}
+
+        for query_id, entity_id in zip(query_ids, entity_ids):
+            hits.setdefault(query_id, []).append(index.get_entity(entity_id))
+
+        assert len(hits) >= 10
+
+        for query_id in range(len(positions)):
+            chromosome = chromosomes[query_id].replace("chr", "")
+            assert sorted(hits.get(query_id, [])) == scan(
+                panels, chromosome, positions[query_id], positions[query_id]
+            )
+
+    def test_ranges(self, panels):
+        index = intervals.IntervalIndex.build(panels, entity_types=("str",))
+        str_entity = panels[2].get_strs()[0]
+        start, end = str_entity.grch38_end, str_entity.grch38_end + 10
+
+        assert ("2", str_entity.entity_name, str_entity.confidence_level) in index.overlaps(
+            str_entity.chromosome, start, end
+        )
+        assert index.overlaps(str_entity.chromosome, start, end) == [
+            hit for hit in scan(panels, str_entity.chromosome, start, end)
+            if "_" in hit[1]
+        ]
+        assert index.overlaps("Y", 1) == []
+
+    def test_build_and_levels(self, panels):
+        index = intervals.IntervalIndex.build(
+            panels, build="GRCh37", confidence_levels=(3,)
+        )
+        entity = next(
+            entity for entity in panels[1].get_cnvs() if entity.confidence_level != "3"
+        )
+
+        assert ("1", entity.entity_name, entity.confidence_level) not in index.overlaps(
+            entity.chromosome, entity.grch37_start
+        )
+        assert len(index) == sum(
+            entity.confidence_level == "3"
+            for panel in panels.values()
+            for entity in panel.get_strs() + panel.get_cnvs()
+        )
+
+    def test_long_region_and_chunks(self, panels, monkeypatch):
+        """
+        A chromosome-length region doesn't change the candidates of the other entities
+        """
+        long_panel = Panel(9, data=make_panel(9, nb_genes=0, nb_strs=0, nb_regions=1))
+        region = long_panel.get_cnvs()[0]
+        region.chromosome = "1"
+        region.grch38_start, region.grch38_end = 1, 250000000
+        region.confidence_level = "3"
+        all_panels = dict(panels)
+        all_panels[9] = long_panel
+        index = intervals.IntervalIndex.build(all_panels)
+        rng = np.random.default_rng(1)
+        positions = rng.integers(1000000, 60000000, 500)
+        monkeypatch.setattr(intervals, "QUERY_CHUNK", 64)
+
+        query_ids, entity_ids = index.query_points("1", positions)
+
+        assert np.all(np.diff(query_ids) >= 0)
+
+        for query_id, position in enumerate(positions):
+            hits = sorted(
+                index.get_entity(entity_id)
+                for entity_id in entity_ids[query_ids == query_id]
+            )
+
+            assert hits == scan(all_panels, "1", position, position)
+            assert ("9", region.entity_name, "3") in hits
+
+        # the long region has its own group, the other groups stay short
+        chromosome = index.get_chromosomes()["1"]
+        assert max(group[3] for group in chromosome.groups) == 250000000
+        assert sorted(group[3] for group in chromosome.groups)[-2] < 1000000
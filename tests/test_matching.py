@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from benchmarks.mock_server import make_panel
+from panelapp.Panelapp import Panel
+
+np = pytest.importorskip("numpy")
+matching = pytest.importorskip("panelapp.matching")
+
+
+@pytest.fixture(scope="module")
+def panels():
+    return {
+        panel_id: Panel(panel_id, data=make_panel(panel_id, nb_genes=200))
+        for panel_id in range(1, 21)
+    }
+
+
+@pytest.fixture(scope="module")
+def queries(panels):
+    rng = random.Random(0)
+    hgnc_ids = sorted({
+        gene.hgnc_id
+        for panel in panels.values()
+        for gene in panel.get_genes(0, 1, 2, 3)
+    })
+
+    return [
+        rng.sample(hgnc_ids, rng.randint(1, 40)) + ["HGNC:unknown"]
+        for i in range(50)
+    ] + [[]]
+
+
+def reference(panels, genes, method, levels=(3,)):
+    """ Scores computed with sets, used as reference """
+
+    genes = set(genes)
+    scores = []
+
+    for panel in panels.values():
+        panel_genes = set(panel.get_hgnc_ids(*levels))
+        overlap = len(genes & panel_genes)
+
+        if method == "coverage":
+            scores.append(overlap / len(genes) if genes else 0)
+        elif method == "jaccard":
+            union = len(genes | panel_genes)
+            scores.append(overlap / union if union else 0)
+        elif method == "weighted":
+            weighted = sum(
+                matching.WEIGHTS[int(panel.genes_by_hgnc_id[gene].confidence_level)]
+                for gene in genes & set(panel.get_hgnc_ids(0, 1, 2, 3))
+            )
+            scores.append(weighted / len(genes) if genes else 0)
+        else:
+            scores.append(overlap)
+
+    return scores
+
+
+class TestGeneMatcher:
+    @pytest.mark.parametrize("method", matching.METHODS)
+    def test_scores_match_sets(self, panels, queries, method):
+        matcher = matching.GeneMatcher.build(panels)
+        scores = matcher.score(queries, method=method)
+
+        assert scores.shape == (len(queries), len(panels))
+
+        for query_id, genes in enumerate(queries):
+            np.testing.assert_allclose(
+                scores[query_id], reference(panels, genes, method), rtol=1e-5
+            )
+
+    def test_confidence_levels_and_symbols(self, panels, queries):
+        matcher = matching.GeneMatcher.build(panels)
+        symbols = [
+            [matcher.symbols[matcher.columns["hgnc_id"][gene]] for gene in genes if gene in matcher.columns["hgnc_id"]]
+            for genes in queries
+        ]
+
+        np.testing.assert_array_equal(
+            matcher.score(symbols, "overlap", (3, 2), id_type="symbol"),
+            [reference(panels, genes, "overlap", (3, 2)) for genes in queries]
+        )
+
+    def test_top_k(self, panels, queries):
+        matcher = matching.GeneMatcher.build(panels)
+        scores = matcher.score(queries, method="jaccard")
+        results = matcher.top_k(queries, k=3, method="jaccard")
+
+        assert len(results) == len(queries)
+        assert results[-1] == []
+
+        for query_scores, result in zip(scores, results):
+            assert [score for panel_id, score in result] == pytest.approx(
+                sorted(query_scores[query_scores > 0], reverse=True)[:3]
+            )
+
+        everything = matcher.top_k(queries[:1], k=100, method="overlap")[0]
+
+        assert len(everything) == np.count_nonzero(scores[0])
+
+    def test_highest_level_is_kept(self):
+        data = make_panel(1, nb_genes=1)
+        data["genes"].append(dict(data["genes"][0], confidence_level="1"))
+        data["genes"][0]["confidence_level"] = "3"
+        matcher = matching.GeneMatcher.build([Panel(1, data=data)])
+
+        assert matcher.levels.tolist() == [[3]]
+
+    def test_save_and_load(self, panels, queries, tmp_path):
+        matcher = matching.GeneMatcher.build(panels)
+        matcher.save(tmp_path / "matcher.npz")
+        loaded = matching.GeneMatcher.load(tmp_path / "matcher.npz")
+
+        assert loaded.panel_ids == matcher.panel_ids
+        assert loaded.versions == matcher.versions
+        np.testing.assert_array_equal(
+            loaded.score(queries, "weighted"), matcher.score(queries, "weighted")
+        )
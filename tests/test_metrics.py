@@ -0,0 +1,105 @@
+import pytest
+import requests
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api, metrics, queries
+from panelapp.cache import SQLiteCache
+from tests.fakes import FakeResponse, FakeSession
+
+
+@pytest.fixture
+def events():
+    events = []
+    hook = lambda event, fields: events.append((event, fields))
+    metrics.add_hook(hook)
+    yield events
+    metrics.remove_hook(hook)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockPanelapp(nb_panels=5) as server:
+        monkeypatch.setattr(api, "BASE_URL", server.url)
+        yield server
+
+
+class TestHooks:
+    def test_request_events(self, events, sleeps):
+        session = FakeSession(
+            requests.ConnectionError("reset"), FakeResponse(200, b'{"id": 3}')
+        )
+        api.get_panelapp_response("panels/3", session=session)
+        requests_events = [fields for event, fields in events if event == "request"]
+
+        assert [fields["attempt"] for fields in requests_events] == [0, 1]
+        assert requests_events[0]["status"] is None
+        assert requests_events[0]["error"]
+        assert requests_events[1]["status"] == 200
+        assert requests_events[1]["bytes"] == 9
+        assert requests_events[1]["error"] is None
+        assert [
+            fields["stage"] for event, fields in events if event == "parse"
+        ] == ["decode"]
+
+    def test_cache_events(self, events, tmp_path):
+        api.set_cache(SQLiteCache(str(tmp_path / "cache.sqlite")))
+
+        try:
+            for i in range(2):
+                api.get_panelapp_response(
+                    "panels/3?version=1.0",
+                    session=FakeSession(FakeResponse(200, b"{}"))
+                )
+        finally:
+            api.get_cache().close()
+            api.set_cache()
+
+        assert [
+            fields["result"] for event, fields in events if event == "cache"
+        ] == ["miss", "hit"]
+
+    def test_no_event_once_removed(self, events):
+        metrics.remove_hook(metrics.hooks[-1])
+        api.get_panelapp_response(
+            "panels/3", session=FakeSession(FakeResponse(200))
+        )
+
+        assert events == []
+        assert metrics.hooks == ()
+
+
+class TestRegistry:
+    def test_render(self, server):
+        registry = metrics.Registry()
+        metrics.add_hook(registry)
+
+        try:
+            queries.get_all_panels(max_workers=2)
+            api.get_panelapp_response("panels/999")
+        finally:
+            metrics.remove_hook(registry)
+
+        assert registry.get("requests_total", status="200") == 6
+        assert registry.get("requests_total", status="404") == 1
+        assert registry.get("parse_duration_seconds", stage="set_genes") == 5
+
+        text = registry.render()
+
+        assert "# TYPE panelapp_requests counter" in text
+        assert 'panelapp_requests_total{status="200"} 6' in text
+        assert 'panelapp_parse_duration_seconds_count{stage="set_genes"} 5' in text
+        assert text.endswith("# EOF\n")
+
+
+class TestProfiler:
+    def test_breakdown(self, server):
+        with metrics.Profiler() as profiler:
+            queries.get_all_panels(max_workers=2)
+
+        breakdown = profiler.get_breakdown()
+
+        assert breakdown["requests"] == 6
+        assert breakdown["stages"]["set_genes"][0] == 5
+        assert breakdown["stages"]["decode"][0] == 6
+        assert "set_genes" in profiler.report()
+        assert metrics.hooks == ()
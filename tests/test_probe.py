@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api, probe
+from panelapp.Panelapp import Panel
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockPanelapp(nb_panels=150) as server:
+        monkeypatch.setattr(api, "BASE_URL", server.url)
+        monkeypatch.setattr(probe, "_probe", probe.PanelProbe())
+        yield server
+
+
+class TestPanelProbe:
+    def test_probe_reads_the_listings_once(self, server):
+        entries = probe.probe_panels([3, "150", 999])
+
+        # 2 pages of each listing, no panel body
+        assert server.nb_requests == 4
+        assert list(entries) == [3, "150", 999]
+        assert entries[3]["version"] == server.panels["3"]["version"]
+        assert entries[3]["hash_id"] == server.panels["3"]["hash_id"]
+        assert entries[3]["signed_off"] == server.panels["3"]["signed_off"]
+        assert entries["150"]["name"] == "Synthetic panel 150"
+        assert entries[999] is None
+
+        assert probe.get_latest_version(3) == server.panels["3"]["version"]
+        assert Panel(3, lazy=True).get_latest_version() == server.panels["3"]["version"]
+        assert server.nb_requests == 4
+
+    def test_panel_not_signedoff(self, server):
+        server.panels["2"]["signed_off"] = None
+
+        assert probe.get_signedoff(2) == (None, None)
+        assert probe.get_signedoff(1) == (
+            server.panels["1"]["signed_off"], server.panels["1"]["version"]
+        )
+        assert probe.get_signedoff(999) == (None, None)
+
+    def test_stale_listings_are_read_again(self, server):
+        probe.probe_panels([1])
+        server.panels["1"]["version"] = "2.0"
+
+        assert probe.get_latest_version(1) != "2.0"
+
+        probe.get_probe().ttl = 0
+
+        assert probe.get_latest_version(1) == "2.0"
+        assert server.nb_requests == 8
+
+    def test_concurrent_probes_share_one_refresh(self, server):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            versions = list(executor.map(probe.get_latest_version, range(1, 17)))
+
+        assert versions == [
+            server.panels[str(panel_id)]["version"] for panel_id in range(1, 17)
+        ]
+        assert server.nb_requests == 4
+
+    def test_failed_listing_raises(self, server, monkeypatch, sleeps):
+        monkeypatch.setattr(api, "BASE_URL", server.url + "missing/")
+
+        with pytest.raises(api.PanelappError):
+            probe.probe_panels([1])
+
+    def test_latest_version_of_a_panel_reads_the_listings(self, server):
+        assert Panel(5, lazy=True).get_latest_version() == server.panels["5"]["version"]
+        # the listings only, the panel isn't fetched
+        assert server.nb_requests == 4
+        assert Panel(999, lazy=True).get_latest_version() is None
+
+    def test_lookups_dont_wait_for_a_refresh(self, server, monkeypatch):
+        started = threading.Event()
+        release = threading.Event()
+        panel_probe = probe.get_probe()
+        refresh = panel_probe.refresh
+
+        def slow_refresh():
+            started.set()
+            release.wait(5)
+            return refresh()
+
+        monkeypatch.setattr(panel_probe, "refresh", slow_refresh)
+        panel_probe.set_latest_version(1, "0.1")
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(probe.get_latest_version, 2)
+            started.wait(5)
+
+            # answered while the listings are being read
+            assert probe.get_known_version(1) == "0.1"
+            probe.set_latest_version(3, "0.3")
+            assert not future.done()
+
+            release.set()
+
+            assert future.result() == server.panels["2"]["version"]
@@ -1,4 +1,11 @@
-from panelapp.queries import get_signedoff_panel
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api, queries
+from panelapp.Panelapp import DERIVED_ATTRIBUTES, Panel
+from panelapp.queries import (
+    get_all_panels, get_signedoff_panel, load_panels, prefetch_panels
+)
 
 
 class TestGetSignedOffPanel:
@@ -71,3 +78,118 @@ class TestGetSignedOffPanel:
 
         assert get_signedoff_panel(panel_id) == None
 
+
+class TestLoadPanels:
+    """
+    These tests use the local stand-in server from the benchmarks instead of the real API.
+    """
+    def test_loads_panels_concurrently(self, monkeypatch):
+        """
+        All panels of the listing are returned in the listing order
+        """
+        with MockPanelapp(nb_panels=20) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            panels = get_all_panels(max_workers=4)
+
+        assert list(panels) == list(range(1, 21))
+        assert panels[5].get_name() == "Synthetic panel 5"
+
+    def test_failures_are_collected(self, monkeypatch):
+        """
+        Panels that can't be retrieved are returned as failures
+        """
+        with MockPanelapp(nb_panels=2) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            panels, failures = load_panels([1, (2, "1.0"), 999])
+
+        assert list(panels) == [1, 2]
+        assert list(failures) == [999]
+        assert isinstance(failures[999], api.PanelappError)
+
+    def test_skipped_panels_are_reported(self, monkeypatch):
+        """
+        Panels that get_all_panels skips are listed in a warning
+        """
+        fetch_panel = queries.fetch_panel
+
+        def fail_on_panel_3(panel_id, *args):
+            if panel_id == 3:
+                raise api.PanelappError("panel 3 failed")
+
+            return fetch_panel(panel_id, *args)
+
+        with MockPanelapp(nb_panels=4) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            monkeypatch.setattr(queries, "fetch_panel", fail_on_panel_3)
+
+            with pytest.warns(UserWarning, match=r"3 \(panel 3 failed\)"):
+                panels = get_all_panels(max_workers=2)
+
+        assert list(panels) == [1, 2, 4]
+
+    def test_parsing_in_processes(self, monkeypatch):
+        """
+        Panels parsed in processes match the ones parsed in the threads
+        """
+        with MockPanelapp(nb_panels=6, nb_superpanels=1) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            expected, failures = load_panels(range(1, 8), max_workers=4)
+            panels, failures = load_panels(
+                [*range(1, 8), 999], max_workers=4, processes=2
+            )
+
+        assert list(panels) == list(range(1, 8))
+        assert list(failures) == [999]
+        assert isinstance(failures[999], api.PanelappError)
+
+        for panel_id, panel in panels.items():
+            assert panel.get_genes(0, 1, 2, 3) == expected[panel_id].get_genes(0, 1, 2, 3)
+            assert panel.get_strs() == expected[panel_id].get_strs()
+            assert panel.get_subpanels() == expected[panel_id].get_subpanels()
+            assert panel.get_data() == expected[panel_id].get_data()
+
+    def test_workers_return_records_only(self, monkeypatch):
+        """
+        Parsing in a process returns the records without the API data
+        """
+        with MockPanelapp(nb_panels=2) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            url, content = queries.fetch_panel_content(1)
+
+        state = queries.parse_panel(url, content, 1)
+
+        assert "data" not in state
+        assert "keep_data" not in state
+        assert not set(state) & set(DERIVED_ATTRIBUTES)
+
+        panel = queries.build_parsed_panel(state, url, content)
+
+        expected = Panel(1, data=api.decode_content(url, content))
+
+        assert panel.get_genes(0, 1, 2, 3) == expected.get_genes(0, 1, 2, 3)
+        assert panel.data is None
+        assert panel.get_data()["id"] == 1
+        assert panel.response is None
+
+        monkeypatch.setattr(Panel, "keep_data", False)
+
+        assert queries.build_parsed_panel(state, url, content).__dict__.get("response") is None
+
+
+class TestLazyPanels:
+    def test_listing_only_makes_no_panel_calls(self, monkeypatch):
+        """
+        Lazy panels are built from the listing and loaded on demand
+        """
+        with MockPanelapp(nb_panels=10) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            panels = get_all_panels(lazy=True)
+
+            assert server.nb_requests == 1
+            assert panels[4].get_name() == "Synthetic panel 4"
+
+            failures = prefetch_panels(list(panels.values())[:5], max_workers=4)
+
+            assert failures == {}
+            assert server.nb_requests == 6
+            assert [panel.is_loaded() for panel in panels.values()] == [True] * 5 + [False] * 5
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from panelapp import api
+from panelapp.ratelimit import (
+    ConcurrencyLimiter, RateLimiter, SUCCESS, THROTTLED, TokenBucket
+)
+from tests.fakes import FakeResponse, FakeSession
+
+
+class TestTokenBucket:
+    def test_rate_is_respected(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+
+        for i in range(11):
+            bucket.acquire()
+
+        assert time.monotonic() - start >= 10 / 50 * 0.9
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=1000)
+        bucket.pause(0.1)
+
+        assert bucket.reserve() > 0.05
+
+
+class TestConcurrencyLimiter:
+    def test_limit_is_never_exceeded(self):
+        limiter = ConcurrencyLimiter(limit=3)
+        in_flight = []
+        lock = threading.Lock()
+
+        def call(i):
+            limiter.acquire()
+
+            with lock:
+                in_flight.append(limiter.in_flight)
+
+            time.sleep(0.01)
+            limiter.release()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            list(executor.map(call, range(30)))
+
+        assert max(in_flight) == 3
+
+    def test_aimd(self):
+        limiter = ConcurrencyLimiter(limit=4, adaptive=True, max_limit=6)
+
+        for i in range(4):
+            limiter.acquire()
+            limiter.release(SUCCESS, 0.1)
+
+        assert int(limiter.limit) == 5
+
+        for i in range(50):
+            limiter.acquire()
+            limiter.release(SUCCESS, 0.1)
+
+        assert limiter.limit == 6
+
+        for i in range(3):
+            limiter.acquire()
+            limiter.release(THROTTLED, 0.1)
+
+        # one decrease per burst of failures
+        assert limiter.limit == 3
+
+
+class TestApiRateLimiter:
+    def test_throttled_calls_reduce_concurrency(self, monkeypatch):
+        monkeypatch.setattr(api.time, "sleep", lambda delay: None)
+        limiter = RateLimiter(rate=1000, max_concurrency=8, adaptive=True)
+        monkeypatch.setattr(api, "_rate_limiter", limiter)
+        session = FakeSession(
+            FakeResponse(429, headers={"Retry-After": "0"}),
+            FakeResponse(200, b"{}"),
+        )
+
+        assert api.get_panelapp_response("panels", session=session) == {}
+        assert limiter.get_limit() == 4
+        assert limiter.concurrency.in_flight == 0
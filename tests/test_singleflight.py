@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import aio, api
+from panelapp.Panelapp import Panel
+from panelapp.singleflight import SingleFlight
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockPanelapp(nb_panels=5, latency=0.2) as server:
+        monkeypatch.setattr(api, "BASE_URL", server.url)
+        api.set_single_flight(True)
+        yield server
+        api.set_single_flight(False)
+
+
+class TestSingleFlight:
+    def test_errors_are_shared(self):
+        group = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            group.do("key", fail)
+
+        assert group.calls == {}
+
+    def test_threads_share_one_call(self, server):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            panels = list(executor.map(lambda i: Panel(3, version="1.0"), range(10)))
+
+        assert {panel.get_hash_id() for panel in panels} == {"{:024x}".format(3)}
+        assert server.nb_requests == 1
+        assert api.get_single_flight().nb_coalesced == 9
+
+    def test_tasks_share_one_call(self, server):
+        async def main():
+            async with aio.AsyncClient() as client:
+                return await asyncio.gather(
+                    *[client.get_panel(2) for i in range(10)],
+                    client.get_panelapp_response("panels/999"),
+                )
+
+        results = asyncio.run(main())
+
+        assert results[-1] is None
+        assert len({panel.get_hash_id() for panel in results[:-1]}) == 1
+        assert server.nb_requests == 2
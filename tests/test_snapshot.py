@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api
+from panelapp.snapshot import Snapshot, dump_snapshot
+
+
+class TestSnapshot:
+    def test_dump_and_load_without_api(self, monkeypatch, tmp_path):
+        path = tmp_path / "panelapp.snap"
+
+        with MockPanelapp(nb_panels=10) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            assert dump_snapshot(path, max_workers=4) == {}
+            expected = api.get_panelapp_response("panels/7")
+
+        # the server is closed, any API call would fail
+        with Snapshot(path) as snapshot:
+            assert len(snapshot) == 10
+            assert snapshot.get_data(7) == expected
+
+            panels = snapshot.get_all_panels()
+            assert sorted(panels) == list(range(1, 11))
+            assert panels[7].get_hgnc_ids() == snapshot.get_panel("7").get_hgnc_ids()
+
+            with pytest.raises(KeyError):
+                snapshot.get_panel(7, "0.1")
+
+    def test_all_versions(self, monkeypatch, tmp_path):
+        path = tmp_path / "panelapp.snap"
+
+        with MockPanelapp(nb_panels=3) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            dump_snapshot(path, all_versions=True)
+
+        with Snapshot(path) as snapshot:
+            assert len(snapshot) == 12
+            assert snapshot.get_versions(2) == ["0.1", "0.2", "0.10", "1.0"]
+            assert snapshot.get_panel(2, "0.2").get_version() == "0.2"
+            assert (2, "0.10") in snapshot
+
+    def test_decoder_set_is_used(self, monkeypatch, tmp_path):
+        path = tmp_path / "panelapp.snap"
+        decoded = []
+
+        def decoder(content):
+            decoded.append(len(content))
+            return json.loads(content)
+
+        with MockPanelapp(nb_panels=3) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+            dump_snapshot(path)
+
+        monkeypatch.setattr(api, "_decoder", decoder)
+
+        with Snapshot(path) as snapshot:
+            # the index
+            assert len(decoded) == 1
+            assert snapshot.get_data(2)["id"] == 2
+            assert len(decoded) == 2
+
+    def test_not_a_snapshot(self, tmp_path):
+        path = tmp_path / "other"
+        path.write_bytes(b"x" * 100)
+
+        with pytest.raises(ValueError):
+            Snapshot(path)
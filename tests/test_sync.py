@@ -0,0 +1,31 @@
+from benchmarks.mock_server import MockPanelapp
+from panelapp import api
+from panelapp.sync import load_manifest, sync_signedoff_panels
+
+
+class TestSyncSignedoffPanels:
+    def test_only_changed_panels_are_downloaded(self, monkeypatch, tmp_path):
+        manifest = tmp_path / "manifest.json"
+
+        with MockPanelapp(nb_panels=5) as server:
+            monkeypatch.setattr(api, "BASE_URL", server.url)
+
+            changes = sync_signedoff_panels(manifest)
+            assert sorted(changes.added) == [1, 2, 3, 4, 5]
+            assert server.nb_requests == 6
+            assert load_manifest(manifest)[2]["version"] == "1.0"
+
+            changes = sync_signedoff_panels(manifest)
+            assert not changes.has_changes()
+            assert sorted(changes.unchanged) == [1, 2, 3, 4, 5]
+            assert server.nb_requests == 7
+
+            server.panels["2"]["version"] = "1.1"
+            del server.panels["5"]
+
+            changes = sync_signedoff_panels(manifest)
+            assert list(changes.updated) == [2]
+            assert changes.updated[2].get_version() == "1.1"
+            assert list(changes.removed) == [5]
+            assert server.nb_requests == 9
+            assert sorted(load_manifest(manifest)) == [1, 2, 3, 4]